@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+"""Measures memory used by parsed EpisodeInfo instances, as held when
+auditing a large library (Python 3.4+, uses tracemalloc)
+
+Usage: python benchmarks/bench_episode_memory.py [files] [series]
+"""
+
+import os
+import sys
+import gc
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tvnamer.utils import FileParser
+
+from bench_series_names import makeCorpus
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    series = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    corpus = makeCorpus(files, series)
+
+    # Compile the filename patterns before measuring
+    FileParser(corpus[0]).parse()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    episodes = [FileParser(path).parse() for path in corpus]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    used = after - before
+    print("%d episodes, %d series: %.1f MB, %d bytes per episode" % (
+        len(episodes), series, used / 1024.0 / 1024.0, used // len(episodes)))
+
+
+if __name__ == '__main__':
+    main()
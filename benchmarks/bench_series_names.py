@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+
+"""Benchmarks resolving series names from filenames, on a corpus where
+each series name is repeated for many files (as in season folders)
+
+Usage: python benchmarks/bench_series_names.py [files] [series] [replacements]
+"""
+
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tvnamer.config import Config
+from tvnamer.utils import FileParser, cleanRegexedSeriesName, resolveSeriesName
+
+
+def makeCorpus(files, series):
+    """Returns list of filenames, files // series episodes of each series
+    """
+    names = []
+    for i in range(files):
+        show = i % series
+        names.append("/library/Show.Number.%d/Season 1/show.number.%d.s%02de%02d.720p.hdtv.mkv" % (
+            show, show, (i // series) // 25 + 1, (i // series) % 25 + 1))
+    return names
+
+
+def unmemoised(seriesname):
+    """How series names were resolved before resolveSeriesName"""
+    seriesname = cleanRegexedSeriesName(seriesname)
+    for pat, replacement in Config['input_series_replacements'].items():
+        if re.match(pat, seriesname, re.IGNORECASE|re.UNICODE):
+            return replacement
+    return seriesname
+
+
+def timeCalls(func, values):
+    start = time.time()
+    for value in values:
+        func(value)
+    return time.time() - start
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    series = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    replacements = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    Config['input_series_replacements'] = dict(
+        ("^no match %d$" % i, "Replacement %d" % i) for i in range(replacements))
+
+    corpus = makeCorpus(files, series)
+    raw = [re.match(r".*/(.+)\.s\d+e\d+", path).group(1) for path in corpus]
+
+    print("%d files, %d series, %d input_series_replacements" % (files, series, replacements))
+
+    before = timeCalls(unmemoised, raw)
+    after = timeCalls(resolveSeriesName, raw)
+    print("resolve series name: %.3fs unmemoised, %.3fs memoised (%.1fx)" % (
+        before, after, before / max(after, 1e-9)))
+
+    parse_time = timeCalls(lambda path: FileParser(path).parse(), corpus)
+    print("FileParser.parse: %.3fs (%.0f files/s)" % (parse_time, files / max(parse_time, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""Generates synthetic, realistic episode filenames, covering each family
+of the default filename_patterns
+
+Usage: python benchmarks/corpus.py [files] [series] [family ...]
+
+Prints the filenames, one per line
+"""
+
+import os
+import sys
+import random
+import datetime
+
+
+WORDS = [
+    "the", "last", "house", "on", "street", "doctor", "night", "city",
+    "blue", "mountain", "kings", "of", "code", "river", "black", "sky",
+    "station", "little", "lies", "brothers", "a", "game", "thrones",
+    "office", "parks", "and", "recreation", "wire", "lost", "heroes"]
+
+QUALITIES = ["720p.HDTV.x264", "1080p.WEB-DL", "HDTV.XviD", "DVDRip", "WEBRip.x264-GRP"]
+
+GROUPS = ["Eclipse", "Shinsen-Subs", "Lunar", "BSS", "HorribleSubs"]
+
+EXTENSIONS = [".avi", ".mkv", ".mp4"]
+
+
+def seriesNames(count, rng):
+    """Returns count distinct series names of two to four words
+    """
+    names = []
+    seen = set()
+    while len(names) < count:
+        name = " ".join(w.capitalize() for w in rng.sample(WORDS, rng.randint(2, 4)))
+        if name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def _crc(rng):
+    return "%08X" % rng.getrandbits(32)
+
+
+# Each family takes (rng, series name, season, episode) and returns a
+# filename without directory
+FAMILIES = {
+    'sxxexx': lambda rng, name, season, episode: "%s.S%02dE%02d.%s%s" % (
+        name.replace(" ", "."), season, episode, rng.choice(QUALITIES), rng.choice(EXTENSIONS)),
+
+    'nxnn': lambda rng, name, season, episode: "%s - [%02dx%02d] - Episode Title%s" % (
+        name, season, episode, rng.choice(EXTENSIONS)),
+
+    'anime': lambda rng, name, season, episode: "[%s] %s - %02d [%s]%s" % (
+        rng.choice(GROUPS), name, (season - 1) * 26 + episode, _crc(rng), rng.choice(EXTENSIONS)),
+
+    'dated': lambda rng, name, season, episode: "%s.%s.%s%s" % (
+        name.replace(" ", "."),
+        (datetime.date(2000 + season, 1, 1) + datetime.timedelta(days = episode * 7)).isoformat(),
+        rng.choice(QUALITIES), rng.choice(EXTENSIONS)),
+
+    'part': lambda rng, name, season, episode: "%s part %d%s" % (
+        name, episode, rng.choice(EXTENSIONS)),
+
+    'multi': lambda rng, name, season, episode: "%s.S%02dE%02dE%02d.%s%s" % (
+        name.replace(" ", "."), season, episode, episode + 1, rng.choice(QUALITIES), rng.choice(EXTENSIONS)),
+}
+
+
+def makeCorpus(files, series = 50, families = None, seed = 0):
+    """Returns a list of files relative paths, as "Series/Season N/file",
+    spread evenly over the families (all of FAMILIES by default) and the
+    given number of series. The same arguments always give the same list
+    """
+    rng = random.Random(seed)
+    if families is None:
+        families = sorted(FAMILIES)
+    names = seriesNames(series, rng)
+
+    corpus = []
+    for i in range(files):
+        family = families[i % len(families)]
+        name = names[(i // len(families)) % series]
+        number = i // (len(families) * series)
+        season, episode = number // 24 + 1, number % 24 + 1
+        filename = FAMILIES[family](rng, name, season, episode)
+        corpus.append(os.path.join(name, "Season %d" % season, filename))
+    return corpus
+
+
+def main():
+    files = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    series = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    families = sys.argv[3:] or None
+
+    for path in makeCorpus(files, series, families = families):
+        print(path)
+
+
+if __name__ == '__main__':
+    main()
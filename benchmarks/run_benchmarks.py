@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+
+"""Times discovery, parsing, name generation and filename sanitisation
+on a synthetic corpus (see corpus.py), writing the results as JSON so
+runs on different commits can be compared
+
+Usage: python benchmarks/run_benchmarks.py [options]
+
+    python benchmarks/run_benchmarks.py --output before.json
+    git checkout other-branch
+    python benchmarks/run_benchmarks.py --compare before.json
+
+With --max-regression, the comparison exits with status 1 when the
+throughput of a gated benchmark (parse and naming by default) drops by
+more than the given percentage against the baseline, for use as a check
+before merging:
+
+    python benchmarks/run_benchmarks.py --compare baseline.json --max-regression 10
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import subprocess
+from optparse import OptionParser
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from tvnamer.utils import FileFinder, FileParser, makeValidFilename
+from tvnamer.tvnamer_exceptions import InvalidFilename
+
+from corpus import FAMILIES, makeCorpus
+
+
+def gitRevision():
+    """Returns the commit being benchmarked, or None outside a checkout
+    """
+    try:
+        out = subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd = os.path.dirname(os.path.abspath(__file__)),
+            stderr = open(os.devnull, "w"))
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode("ascii").strip()
+
+
+def timeRuns(func, repeat):
+    """Calls func repeat times, returns list of the seconds each took
+    """
+    runs = []
+    for _ in range(repeat):
+        start = time.time()
+        func()
+        runs.append(time.time() - start)
+    return runs
+
+
+def makeTree(corpus):
+    """Creates empty files for the corpus in a temporary directory,
+    returns the directory
+    """
+    root = tempfile.mkdtemp(prefix = "tvnamer-bench-")
+    for path in corpus:
+        fullpath = os.path.join(root, path)
+        if not os.path.isdir(os.path.dirname(fullpath)):
+            os.makedirs(os.path.dirname(fullpath))
+        open(fullpath, "w").close()
+    return root
+
+
+def parseAll(paths):
+    episodes = []
+    for path in paths:
+        try:
+            episodes.append(FileParser(path).parse())
+        except InvalidFilename:
+            pass
+    return episodes
+
+
+def runBenchmarks(files, series, families, repeat, seed):
+    """Returns dict of benchmark name to results
+    """
+    corpus = makeCorpus(files, series, families = families, seed = seed)
+    root = makeTree(corpus)
+    try:
+        paths = [os.path.join(root, x) for x in corpus]
+
+        finder = FileFinder(root, recursive = True)
+        discovery = timeRuns(finder.findFiles, repeat)
+
+        parse = timeRuns(lambda: parseAll(paths), repeat)
+
+        episodes = parseAll(paths)
+        for i, episode in enumerate(episodes):
+            if hasattr(episode, 'episodenumbers'):
+                episode.episodename = ["Episode Title %d" % i] * len(episode.episodenumbers)
+            else:
+                episode.episodename = ["Episode Title %d" % i]
+        naming = timeRuns(lambda: [x.generateFilename() for x in episodes], repeat)
+
+        names = [x.generateFilename() for x in episodes]
+        sanitise = timeRuns(
+            lambda: [makeValidFilename(x, windows_safe = True) for x in names],
+            repeat)
+    finally:
+        shutil.rmtree(root)
+
+    results = {}
+    for name, items, runs in [
+            ('discovery', len(paths), discovery),
+            ('parse', len(paths), parse),
+            ('naming', len(episodes), naming),
+            ('sanitise', len(names), sanitise)]:
+        results[name] = {
+            'items': items,
+            'runs': runs,
+            'best': min(runs),
+            'per_second': items / max(min(runs), 1e-9)}
+    return results
+
+
+def compareResults(old, new):
+    """Returns lines comparing the best times of two result files
+    """
+    lines = ["%-10s %10s %10s %8s" % ("benchmark", old['revision'] or "old", new['revision'] or "new", "change")]
+    for name in sorted(new['results']):
+        if name not in old['results']:
+            continue
+        before = old['results'][name]['best']
+        after = new['results'][name]['best']
+        lines.append("%-10s %9.3fs %9.3fs %+7.1f%%" % (
+            name, before, after, 100.0 * (after - before) / max(before, 1e-9)))
+    return lines
+
+
+def findRegressions(old, new, benchmarks, max_regression):
+    """Returns lines describing each of benchmarks whose throughput in
+    new is more than max_regression percent below that in old
+    """
+    regressions = []
+    for name in benchmarks:
+        if name not in old['results'] or name not in new['results']:
+            continue
+        before = old['results'][name]['per_second']
+        after = new['results'][name]['per_second']
+        drop = 100.0 * (before - after) / max(before, 1e-9)
+        if drop > max_regression:
+            regressions.append("%s: %.0f/s, down %.1f%% from %.0f/s (limit %.1f%%)" % (
+                name, after, drop, before, max_regression))
+    return regressions
+
+
+def main():
+    parser = OptionParser(usage = "%prog [options]")
+    parser.add_option("--files", type = "int", default = 5000, help = "Number of files in the corpus")
+    parser.add_option("--series", type = "int", default = 50, help = "Number of series the files are spread over")
+    parser.add_option("--family", action = "append", dest = "families", choices = sorted(FAMILIES),
+        help = "Only generate filenames of this family (repeatable), one of: %s" % ", ".join(sorted(FAMILIES)))
+    parser.add_option("--repeat", type = "int", default = 3, help = "Number of times each benchmark is run")
+    parser.add_option("--seed", type = "int", default = 0, help = "Seed for the corpus generator")
+    parser.add_option("--output", help = "Write results as JSON to this file ('-' for stdout)")
+    parser.add_option("--compare", help = "Compare against the results in this JSON file")
+    parser.add_option("--max-regression", type = "float",
+        help = "With --compare, exit with status 1 if throughput of a gated benchmark drops by more than this percentage")
+    parser.add_option("--gate", action = "append", dest = "gated",
+        help = "Benchmark checked by --max-regression (repeatable, default: parse and naming)")
+    opts, args = parser.parse_args()
+
+    results = {
+        'revision': gitRevision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'corpus': {
+            'files': opts.files,
+            'series': opts.series,
+            'families': opts.families or sorted(FAMILIES),
+            'seed': opts.seed},
+        'repeat': opts.repeat,
+        'results': runBenchmarks(opts.files, opts.series, opts.families, opts.repeat, opts.seed)}
+
+    if opts.output == "-":
+        json.dump(results, sys.stdout, sort_keys = True, indent = 2)
+        print("")
+    elif opts.output is not None:
+        f = open(opts.output, "w")
+        try:
+            json.dump(results, f, sort_keys = True, indent = 2)
+        finally:
+            f.close()
+
+    if opts.output != "-":
+        for name in sorted(results['results']):
+            cur = results['results'][name]
+            print("%-10s %7d items %9.3fs best of %d (%.0f/s)" % (
+                name, cur['items'], cur['best'], opts.repeat, cur['per_second']))
+
+    if opts.compare is not None:
+        old = json.load(open(opts.compare))
+        if old['corpus'] != results['corpus']:
+            sys.stderr.write("Warning: corpus differs from %s, times are not comparable\n" % opts.compare)
+        for line in compareResults(old, results):
+            print(line)
+
+        if opts.max_regression is not None:
+            regressions = findRegressions(old, results, opts.gated or ['parse', 'naming'], opts.max_regression)
+            if len(regressions) > 0:
+                sys.stderr.write("Performance regression against %s:\n" % opts.compare)
+                for line in regressions:
+                    sys.stderr.write("  %s\n" % line)
+                sys.exit(1)
+    elif opts.max_regression is not None:
+        parser.error("--max-regression requires --compare")
+
+
+if __name__ == '__main__':
+    main()
@@ -63,6 +63,7 @@ packages = ['tvnamer'],
 entry_points = {
     'console_scripts': [
         'tvnamer = tvnamer.main:main',
+        'tvnamer-client = tvnamer.client:main',
     ],
 },
 
@@ -19,17 +19,34 @@ This runs tvnamer with no custom config (can be a string). It then
 sends "1[return]y[return]" to the console UI, and verifies the file was
 created correctly, in a way that nosetest displays useful info when an
 expected file is not found.
+
+run_tvnamer_inprocess takes the same arguments, but calls
+tvnamer.main.main() in the test process with episode names from
+FAKE_SERIES (or with_series) instead of thetvdb.com, so it is much
+faster and needs no network:
+
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi'],
+        with_input = "1\ny\n")
 """
 
 import os
 import sys
+import json
 import shutil
+import logging
 import tempfile
+import traceback
 import subprocess
 
 from tvnamer.unicode_helper import p
 from tvnamer.compat import PY2, string_type
 
+if PY2:
+    from StringIO import StringIO
+else:
+    from io import StringIO
+
 try:
     # os.path.relpath was added in 2.6, use custom implimentation if not found
     relpath = os.path.relpath
@@ -113,6 +130,41 @@ def make_dummy_files(files, location):
     return dummies
 
 
+# Series known to run_tvnamer_inprocess by default, in the format of
+# tvnamer.providers.FixtureProvider. As on thetvdb.com, searching for
+# "scrubs" finds more than one series, so unless the first is selected
+# automatically the series is chosen with "1"
+FAKE_SERIES = [
+    {"id": 76156,
+     "seriesname": "Scrubs",
+     "episodes": [
+        {"seasonnumber": 1, "episodenumber": 1, "absolute_number": 1,
+         "episodename": "My First Day", "firstaired": "2001-10-02"},
+        {"seasonnumber": 1, "episodenumber": 2, "absolute_number": 2,
+         "episodename": "My Mentor", "firstaired": "2001-10-04"},
+        {"seasonnumber": 1, "episodenumber": 3, "absolute_number": 3,
+         "episodename": "My Best Friend's Mistake", "firstaired": "2001-10-09"},
+        {"seasonnumber": 2, "episodenumber": 1, "absolute_number": 25,
+         "episodename": "My Overkill", "firstaired": "2002-09-26"},
+        {"seasonnumber": 2, "episodenumber": 2, "absolute_number": 26,
+         "episodename": "My Nightingale", "firstaired": "2002-10-03"}]},
+    {"id": 75397,
+     "seriesname": "My Name Is Earl",
+     "episodes": [
+        {"seasonnumber": 1, "episodenumber": 1, "absolute_number": 1,
+         "episodename": "Pilot", "firstaired": "2005-09-20"}]},
+    {"id": 79681,
+     "seriesname": "Total Access 24/7",
+     "aliases": ["Total Access"],
+     "episodes": [
+        {"seasonnumber": 1, "episodenumber": 1, "absolute_number": 1,
+         "episodename": "Episode #1", "firstaired": "2007-11-12"}]},
+    {"id": 900001,
+     "seriesname": "Scrubs (2026)",
+     "aliases": ["Scrubs"],
+     "episodes": []}]
+
+
 def clear_temp_dir(location):
     """Removes file or directory at specified location
     """
@@ -177,25 +229,168 @@ def run_tvnamer(with_files, with_flags = None, with_input = "", with_config = No
         output = unicodify(output)
 
 
+    created_files = list_created_files(episodes_location)
+
+    # Clean up dummy files and config
+    clear_temp_dir(episodes_location)
+    if with_config is not None:
+        os.unlink(configfname)
+
+    return {
+        'output': output,
+        'files': created_files,
+        'returncode': proc.returncode}
+
+
+def list_created_files(location):
+    """Returns paths, relative to location, of all files under location
+    """
     created_files = []
 
-    for walkroot, walkdirs, walkfiles in os.walk(string_type(episodes_location)):
+    for walkroot, walkdirs, walkfiles in os.walk(string_type(location)):
         curlist = [os.path.join(walkroot, name) for name in walkfiles]
 
-        # Remove episodes_location from start of path
-        curlist = [relpath(x, episodes_location) for x in curlist]
+        # Remove location from start of path
+        curlist = [relpath(x, location) for x in curlist]
 
         created_files.extend(curlist)
 
-    # Clean up dummy files and config
+    return created_files
+
+
+class _StderrToStdout(object):
+    """Stands in for sys.stderr, writing to the same stream as stdout while
+    still being a different object (as tvnamer treats them differently)
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+    def isatty(self):
+        return False
+
+
+def run_tvnamer_inprocess(with_files, with_flags = None, with_input = "", with_config = None, run_on_directory = False, with_series = None):
+    """Runs tvnamer.main.main() in this process, taking the same arguments
+    as run_tvnamer and returning the same dict.
+
+    Episode names come from with_series (a list of series as taken by
+    tvnamer.providers.FixtureProvider, FAKE_SERIES by default). Config,
+    sys.argv, the standard streams and the logging handlers are restored
+    afterwards, and the run statistics and memoised names are cleared
+    beforehand, so each run starts as a new process would
+    """
+    from tvnamer import main as tvnamer_main
+    from tvnamer import utils as tvnamer_utils
+    from tvnamer.unicode_helper import setQuiet, redirectOutput
+    from tvnamer.events import disableEvents
+    from tvnamer.runstats import Stats
+    from tvnamer.config import Config
+    from tvnamer.config_defaults import defaults
+
+    if with_series is None:
+        with_series = FAKE_SERIES
+
+    episodes_location = make_temp_dir()
+    dummy_files = make_dummy_files(with_files, episodes_location)
+
+    (fhandle, fixturefname) = tempfile.mkstemp(suffix = ".json")
+    os.close(fhandle)
+    f = open(fixturefname, "w")
+    json.dump({'series': with_series}, f)
+    f.close()
+
+    if with_config is not None:
+        configfname = make_temp_config(with_config)
+        conf_args = ['-c', configfname]
+    else:
+        conf_args = []
+
+    if with_flags is None:
+        with_flags = []
+
+    if run_on_directory:
+        files = [episodes_location]
+    else:
+        files = dummy_files
+
+    argv = ["tvnamer"] + conf_args + ['--metadata-fixture', fixturefname] + with_flags + files
+    p("Running in process:")
+    p(" ".join(argv))
+
+    # main() updates both Config and (when loading a config file) the
+    # defaults, so both are restored
+    saved_config = dict(Config)
+    saved_defaults = dict(defaults)
+    saved_streams = (sys.argv, sys.stdin, sys.stdout, sys.stderr)
+
+    # main() calls logging.basicConfig, which adds a handler writing to
+    # this run's sys.stderr, and only does so when there is none
+    root_logger = logging.getLogger()
+    saved_handlers = list(root_logger.handlers)
+    saved_level = root_logger.level
+    for handler in saved_handlers:
+        root_logger.removeHandler(handler)
+
+    Stats.reset()
+    tvnamer_utils._series_name_memo.clear()
+    tvnamer_utils._interned.clear()
+
+    output = StringIO()
+    sys.argv = argv
+    sys.stdin = StringIO(with_input)
+    sys.stdout = output
+    sys.stderr = _StderrToStdout(output) # All stderr to stdout
+    try:
+        try:
+            tvnamer_main.main()
+        except SystemExit as e:
+            if e.code is None:
+                returncode = 0
+            elif isinstance(e.code, int):
+                returncode = e.code
+            else:
+                p(e.code)
+                returncode = 1
+        except Exception:
+            # As an uncaught exception would end the tvnamer process
+            traceback.print_exc(file = output)
+            returncode = 1
+        else:
+            returncode = 0
+    finally:
+        sys.argv, sys.stdin, sys.stdout, sys.stderr = saved_streams
+        Config.clear()
+        Config.update(saved_config)
+        defaults.clear()
+        defaults.update(saved_defaults)
+        setQuiet(Config['quiet'])
+        redirectOutput(None)
+        disableEvents()
+        for handler in list(root_logger.handlers):
+            root_logger.removeHandler(handler)
+        for handler in saved_handlers:
+            root_logger.addHandler(handler)
+        root_logger.setLevel(saved_level)
+
+    created_files = list_created_files(episodes_location)
+
+    # Clean up dummy files, fixture and config
     clear_temp_dir(episodes_location)
+    os.unlink(fixturefname)
     if with_config is not None:
         os.unlink(configfname)
 
     return {
-        'output': output,
+        'output': output.getvalue(),
         'files': created_files,
-        'returncode': proc.returncode}
+        'returncode': returncode}
 
 
 def verify_out_data(out_data, expected_files, expected_returncode = 0):
@@ -3,15 +3,13 @@
 """Tests anime filename output
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
 
 
-@attr("functional")
 def test_group():
     """Anime filename [#100]
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['[Some Group] Scrubs - 01 [A1B2C3].avi'],
         with_config = """
 {
@@ -27,11 +25,10 @@ def test_group():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_group_no_epname():
     """Anime filename, on episode with no name [#100]
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['[Some Group] Somefakeseries - 01 [A1B2C3].avi'],
         with_config = """
 {
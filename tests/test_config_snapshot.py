@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""Tests read-only config snapshots, and parsing and naming files with
+snapshots instead of the global Config
+"""
+
+from helpers import assertEquals
+
+from tvnamer.config import Config, ConfigSnapshot, configSnapshot
+from tvnamer.config_defaults import defaults
+from tvnamer.utils import FileParser, Renamer
+from tvnamer.main import getMoveDestination
+from tvnamer.tvnamer_exceptions import ConfigValueError
+
+
+def test_snapshot_rebuilt_on_change():
+    """configSnapshot is only made again when Config changes, and is not
+    affected by later changes
+    """
+    saved = Config['episode_single']
+    try:
+        first = configSnapshot()
+        assertEquals(configSnapshot() is first, True)
+
+        Config['episode_single'] = "%03d"
+        second = configSnapshot()
+        assertEquals(second is first, False)
+        assertEquals(second['episode_single'], "%03d")
+        assertEquals(first['episode_single'], saved)
+    finally:
+        Config['episode_single'] = saved
+
+
+def test_snapshot_read_only():
+    snapshot = ConfigSnapshot(defaults)
+    try:
+        snapshot['episode_single'] = "%d"
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("Snapshot was changed")
+
+
+def test_derived_values():
+    """Derived values are built once per snapshot
+    """
+    calls = []
+
+    def build(config):
+        calls.append(config)
+        return config['episode_single'] * 2
+
+    snapshot = ConfigSnapshot(defaults)
+    assertEquals(snapshot.derived(build), "%02d%02d")
+    assertEquals(snapshot.derived(build), "%02d%02d")
+    assertEquals(len(calls), 1)
+
+
+def test_validation():
+    for key, value in [
+            ('filename_patterns', "not a list"),
+            ('filename_with_episode', 1),
+            ('output_filename_replacements', [{'match': "a"}]),
+            ('input_series_replacements', ["a"])]:
+        try:
+            ConfigSnapshot(dict(defaults, **{key: value}))
+        except ConfigValueError:
+            pass
+        else:
+            raise AssertionError("%s of %r accepted" % (key, value))
+
+
+def test_two_pipelines():
+    """Files parsed with a snapshot are named with it, regardless of the
+    global Config
+    """
+    plain = ConfigSnapshot(defaults)
+    custom = ConfigSnapshot(dict(defaults,
+        filename_with_episode = "%(seriesname)s S%(seasonnumber)02dE%(episode)s%(ext)s",
+        output_filename_replacements = [{'match': "Scrubs", 'replacement': "Scrubs (2001)"}],
+        move_files_fullpath_replacements = [{'match': "/tv/", 'replacement': "/shows/"}]))
+
+    names = []
+    for config in [plain, custom]:
+        episode = FileParser("/tv/scrubs.s01e02.avi", config = config).parse()
+        episode.seriesname = "Scrubs"
+        episode.episodename = ["My Mentor"]
+        names.append(episode.generateFilename())
+
+    assertEquals(names, ["Scrubs - [01x02] - My Mentor.avi", "Scrubs (2001) S01E02.avi"])
+    assertEquals(Config['output_filename_replacements'], defaults['output_filename_replacements'])
+
+    assertEquals(
+        Renamer("/tv/a.avi", config = custom).resolvePath(new_fullpath = "/tv/b.avi"),
+        "/shows/b.avi")
+
+
+def test_move_destination_from_snapshot():
+    """The move destination comes from the episode's snapshot, not the
+    global Config
+    """
+    config = ConfigSnapshot(dict(defaults,
+        move_files_destination = "/shows/%(seriesname)s/",
+        move_files_destination_date = "/dated/%(seriesname)s/%(year)s/",
+        move_files_lowercase_destination = True,
+        windows_safe_filenames = True))
+
+    episode = FileParser("/tv/scrubs.s01e02.avi", config = config).parse()
+    episode.seriesname = "Scrubs"
+    assertEquals(getMoveDestination(episode), "/shows/scrubs/")
+
+    episode = FileParser("/tv/the.colbert.report.2010.01.02.avi", config = config).parse()
+    episode.seriesname = "The Colbert Report: Live"
+    assertEquals(getMoveDestination(episode), "/dated/The Colbert Report_ Live/2010/")
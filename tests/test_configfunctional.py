@@ -3,12 +3,11 @@
 """Tests various configs load correctly
 """
 
-from functional_runner import run_tvnamer, verify_out_data
+from functional_runner import run_tvnamer, run_tvnamer_inprocess, verify_out_data
 from helpers import attr
 import pytest
 
 
-@attr("functional")
 def test_batchconfig():
     """Test configured batch mode works
     """
@@ -18,7 +17,7 @@ def test_batchconfig():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -28,7 +27,6 @@ def test_batchconfig():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_skip_file_on_error():
     """Test the "skip file on error" config option works
     """
@@ -38,7 +36,7 @@ def test_skip_file_on_error():
     "always_rename": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['a.fake.episode.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -48,7 +46,6 @@ def test_skip_file_on_error():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_do_not_skip_file_on_error():
     """Test setting "skip file on error" config option to False
     """
@@ -58,7 +55,7 @@ def test_do_not_skip_file_on_error():
     "always_rename": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['a.fake.episode.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -68,7 +65,6 @@ def test_do_not_skip_file_on_error():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_skip_behaviour_warn():
     """skip_behaivour:warn should keep renaming other files
     """
@@ -79,7 +75,7 @@ def test_skip_behaviour_warn():
     "skip_behaviour": "warn"}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'a.fake.episode.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "")
@@ -89,7 +85,6 @@ def test_skip_behaviour_warn():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_skip_behaviour_error():
     """With skip_behaviour:error, should end process
     """
@@ -100,7 +95,7 @@ def test_skip_behaviour_error():
     "skip_behaviour": "warn"}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'a.fake.episode.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "")
@@ -110,7 +105,6 @@ def test_skip_behaviour_error():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_lowercase_names():
     """Test setting "lowercase_filename" config option
     """
@@ -121,7 +115,7 @@ def test_lowercase_names():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -131,7 +125,6 @@ def test_lowercase_names():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replace_with_underscore():
     """Test custom blacklist to replace " " with "_"
     """
@@ -143,7 +136,7 @@ def test_replace_with_underscore():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -207,7 +200,6 @@ def test_resolve_absoloute_episode():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_valid_extension_recursive():
     """When using valid_extensions in a custom config file, recursive search doesn't work. Github issue #36
     """
@@ -219,7 +211,7 @@ def test_valid_extension_recursive():
     "recursive": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['nested/dir/scrubs.s01e01.avi'],
         with_config = conf,
         with_input = "",
@@ -289,7 +281,6 @@ def test_replace_ands_in_output_also():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_force_overwrite_enabled():
     """Tests forcefully overwritting existing filenames
     """
@@ -301,7 +292,7 @@ def test_force_overwrite_enabled():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'Scrubs - [01x01] - My First Day.avi'],
         with_config = conf,
         with_input = "",
@@ -312,7 +303,6 @@ def test_force_overwrite_enabled():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_force_overwrite_disabled():
     """Explicitly disabling forceful-overwrite
     """
@@ -324,7 +314,7 @@ def test_force_overwrite_disabled():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [01x01] - My First Day.avi', 'scrubs - [01x01].avi'],
         with_config = conf,
         with_input = "",
@@ -335,7 +325,6 @@ def test_force_overwrite_disabled():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_force_overwrite_default():
     """Forceful-overwrite should be disabled by default
     """
@@ -346,7 +335,7 @@ def test_force_overwrite_default():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [01x01] - My First Day.avi', 'scrubs - [01x01].avi'],
         with_config = conf,
         with_input = "",
@@ -357,7 +346,6 @@ def test_force_overwrite_default():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_titlecase():
     """Tests Title Case Option To Make Episodes Like This
     """
@@ -370,7 +358,7 @@ def test_titlecase():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['this.is.a.fake.episode.s01e01.avi'],
         with_config = conf,
         with_input = "",
@@ -3,15 +3,14 @@
 """Tests custom replacements on input/output files
 """
 
-from functional_runner import run_tvnamer, verify_out_data
+from functional_runner import run_tvnamer, run_tvnamer_inprocess, verify_out_data
 from helpers import attr
 
 
-@attr("functional")
 def test_simple_input_replacements():
     """Tests replacing strings in input files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scruuuuuubs.s01e01.avi'],
         with_config = """
 {
@@ -30,11 +29,10 @@ def test_simple_input_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_simple_output_replacements():
     """Tests replacing strings in input files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = """
 {
@@ -53,11 +51,10 @@ def test_simple_output_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_regex_input_replacements():
     """Tests regex replacement in input files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scruuuuuubs.s01e01.avi'],
         with_config = """
 {
@@ -76,11 +73,10 @@ def test_regex_input_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_regex_output_replacements():
     """Tests regex replacement in output files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = """
 {
@@ -99,11 +95,10 @@ def test_regex_output_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replacing_spaces():
     """Tests more practical use of replacements, removing spaces
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = """
 {
@@ -150,11 +145,10 @@ def test_replacing_ands():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_multiple_replacements():
     """Tests multiple replacements on one file
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
     with_files = ['scrubs.s01e01.avi'],
     with_config = """
 {
@@ -176,11 +170,10 @@ def test_multiple_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_fullpath_replacements():
     """Tests replacing strings in output path
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
     with_files = ['scrubs.s01e01.avi'],
     with_config = """
 {
@@ -247,11 +240,10 @@ def test_replacement_order():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replacement_preserve_extension():
     """Ensure with_extension replacement option defaults to preserving extension
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = """
 {
@@ -270,11 +262,10 @@ def test_replacement_preserve_extension():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replacement_including_extension():
     """Option to allow replacement search/replace to include file extension
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = """
 {
@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""Tests the JSON Lines event stream, --output-format jsonl
+"""
+
+import os
+import json
+import tempfile
+
+from functional_runner import run_tvnamer_inprocess, verify_out_data
+from helpers import assertEquals
+
+from tvnamer.events import emit, emitSkipped, enableEvents, disableEvents
+
+
+class _Stream(object):
+    def __init__(self):
+        self.writes = []
+        self.flushes = 0
+
+    def write(self, text):
+        self.writes.append(text)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def _events(output):
+    """Parses the event lines from the output of a run. Other lines (the
+    command run, warnings and the report, all from stderr) are ignored
+    """
+    return [json.loads(x) for x in output.splitlines() if x.startswith("{")]
+
+
+def test_emit():
+    """Each event is one line, flushed when written, and nothing is
+    written when disabled
+    """
+    stream = _Stream()
+    emit("discovered", path = "a.avi")
+    enableEvents(stream)
+    try:
+        emit("discovered", path = "a.avi")
+        emitSkipped("b.avi", OSError("No space left"))
+    finally:
+        disableEvents()
+    emit("discovered", path = "c.avi")
+
+    assertEquals(len(stream.writes), 2)
+    assertEquals(stream.flushes, 2)
+    assertEquals([x.endswith("\n") and x.count("\n") for x in stream.writes], [1, 1])
+
+    first, second = [json.loads(x) for x in stream.writes]
+    assertEquals(sorted(first.keys()), ["event", "path", "time"])
+    assertEquals(first['event'], "discovered")
+    assertEquals(second['event'], "skipped")
+    assertEquals((second['error'], second['message']), ("OSError", "No space left"))
+
+
+def test_jsonl_run():
+    """A run with --output-format jsonl writes events in place of the
+    usual output
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi', 'notanepisode.avi'],
+        with_flags = ['--batch', '--output-format', 'jsonl'])
+
+    verify_out_data(out_data, [
+        'Scrubs - [01x01] - My First Day.avi',
+        'Scrubs - [01x02] - My Mentor.avi',
+        'notanepisode.avi'])
+    assertEquals("New filename" in out_data['output'], False)
+
+    events = _events(out_data['output'])
+    names = [x['event'] for x in events]
+    assertEquals(names.count("discovered"), 3)
+    assertEquals(names.count("parsed"), 2)
+    assertEquals(names.count("resolved"), 2)
+    assertEquals(names.count("renamed"), 2)
+    assertEquals(names[-1], "summary")
+
+    skipped = [x for x in events if x['event'] == "skipped"]
+    assertEquals(len(skipped), 1)
+    assertEquals(skipped[0]['path'].endswith("notanepisode.avi"), True)
+    assertEquals(skipped[0]['error'], "InvalidFilename")
+
+    renamed = [x for x in events if x['event'] == "renamed"][0]
+    assertEquals(renamed['path'].endswith("scrubs.s01e01.avi"), True)
+    assertEquals(renamed['new_path'].endswith("Scrubs - [01x01] - My First Day.avi"), True)
+
+    resolved = [x for x in events if x['event'] == "resolved"][0]
+    assertEquals((resolved['seriesname'], resolved['episodename']), ("Scrubs", ["My First Day"]))
+
+    summary = events[-1]['report']
+    assertEquals(summary['counters']['renames'], 2)
+
+
+def test_jsonl_requires_batch():
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi'],
+        with_flags = ['--output-format', 'jsonl'])
+
+    verify_out_data(out_data, ['scrubs.s01e01.avi'], expected_returncode = 2)
+    assertEquals(_events(out_data['output']), [])
+
+
+def test_jsonl_plan_run():
+    """Files renamed from a journaled plan, and files skipped because of
+    a collision, are reported too
+    """
+    (fhandle, journal) = tempfile.mkstemp(suffix = ".jsonl")
+    os.close(fhandle)
+    try:
+        out_data = run_tvnamer_inprocess(
+            with_files = ['scrubs.s01e01.avi', 'Scrubs.1x01.avi'],
+            with_flags = ['--batch', '--output-format', 'jsonl', '--journal', journal])
+    finally:
+        os.unlink(journal)
+
+    verify_out_data(out_data, ['Scrubs - [01x01] - My First Day.avi', 'scrubs.s01e01.avi'])
+
+    events = _events(out_data['output'])
+    renamed = [x for x in events if x['event'] == "renamed"]
+    assertEquals(len(renamed), 1)
+    assertEquals(renamed[0]['path'].endswith("Scrubs.1x01.avi"), True)
+
+    skipped = [x for x in events if x['event'] == "skipped"]
+    assertEquals([(x['path'].endswith("scrubs.s01e01.avi"), x['error']) for x in skipped], [(True, "PathCollision")])
+    assertEquals(events[-1]['report']['skipped'], {'PathCollision': 1})
@@ -3,11 +3,9 @@
 """Tests multi-episode filename generation
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
 
 
-@attr("functional")
 def test_extension_pattern_default():
     """Test default extension handling, no language codes
     """
@@ -31,14 +29,13 @@ def test_extension_pattern_default():
         "My Name Is Earl - [01x01] - Pilot.srt",
     ]
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_config = conf,
         with_input = "")
 
     verify_out_data(out_data, expected_files)
 
-@attr("functional")
 def test_extension_pattern_custom():
     """Test custom extension pattern, multiple language codes
     """
@@ -68,7 +65,7 @@ def test_extension_pattern_custom():
         "My Name Is Earl - [01x01] - Pilot.cze.srt",
     ]
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_config = conf,
         with_input = "")
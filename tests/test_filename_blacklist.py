@@ -3,11 +3,9 @@
 """Tests ignoreing files by regexp (e.g. all files with "sample" in the name)
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
 
 
-@attr("functional")
 def test_no_blacklist():
     """Tests empty list of filename regexps is parsed as expected
     """
@@ -18,7 +16,7 @@ def test_no_blacklist():
     "filename_blacklist": []}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf)
 
@@ -29,7 +27,6 @@ def test_no_blacklist():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_partial_blacklist_using_simple_match():
     """Tests single match of filename blacklist using a simple match
     """
@@ -44,7 +41,7 @@ def test_partial_blacklist_using_simple_match():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -56,7 +53,6 @@ def test_partial_blacklist_using_simple_match():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_partial_blacklist_using_regex():
     """Tests single match of filename blacklist using a regex match
     """
@@ -71,7 +67,7 @@ def test_partial_blacklist_using_regex():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -83,7 +79,6 @@ def test_partial_blacklist_using_regex():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_partial_blacklist_using_mix():
     """Tests single match of filename blacklist using a mix of regex and simple match
     """
@@ -100,7 +95,7 @@ def test_partial_blacklist_using_mix():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -112,7 +107,6 @@ def test_partial_blacklist_using_mix():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_full_blacklist():
     """Tests complete blacklist of all filenames with a regex
     """
@@ -127,7 +121,7 @@ def test_full_blacklist():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -136,7 +130,6 @@ def test_full_blacklist():
     verify_out_data(out_data, expected_files, expected_returncode = 2)
 
 
-@attr("functional")
 def test_dotfiles():
     """Tests blacklisting filename beginning with "."
     """
@@ -151,7 +144,7 @@ def test_dotfiles():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['.scrubs.s01e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -160,7 +153,6 @@ def test_dotfiles():
     verify_out_data(out_data, expected_files, expected_returncode = 0)
 
 
-@attr("functional")
 def test_blacklist_fullpath():
     """Blacklist against full path
     """
@@ -176,7 +168,7 @@ def test_blacklist_fullpath():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['subdir/scrubs.s01e01.avi'],
         with_config = conf)
 
@@ -185,7 +177,6 @@ def test_blacklist_fullpath():
     verify_out_data(out_data, expected_files, expected_returncode = 2)
 
 
-@attr("functional")
 def test_blacklist_exclude_extension():
     """Blacklist against full path
     """
@@ -202,7 +193,7 @@ def test_blacklist_exclude_extension():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf)
 
@@ -211,7 +202,6 @@ def test_blacklist_exclude_extension():
     verify_out_data(out_data, expected_files, expected_returncode = 0)
 
 
-@attr("functional")
 def test_simple_blacklist():
     """Blacklist with simple strings
     """
@@ -225,7 +215,7 @@ def test_simple_blacklist():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
@@ -237,7 +227,6 @@ def test_simple_blacklist():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_simple_blacklist_mixed():
     """Blacklist with simple strings, mixed with the more complex dict
     option (which allows regexs and matching against extension)
@@ -254,7 +243,7 @@ def test_simple_blacklist_mixed():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s02e01.avi', 'scrubs.s02e02.avi'],
         with_config = conf)
 
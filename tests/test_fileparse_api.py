@@ -3,7 +3,10 @@
 """Tests the FileParser API
 """
 
-from tvnamer.utils import FileParser, EpisodeInfo, DatedEpisodeInfo, NoSeasonEpisodeInfo
+import tvnamer.utils
+from tvnamer.config import ConfigSnapshot
+from tvnamer.config_defaults import defaults
+from tvnamer.utils import FileParser, EpisodeInfo, DatedEpisodeInfo, NoSeasonEpisodeInfo, internString
 from helpers import assertType, assertEquals
 
 
@@ -50,3 +53,59 @@ def test_noseasonepisodeinfo_naming():
     p = FileParser("scrubs - e23.avi").parse()
     assertType(p, NoSeasonEpisodeInfo)
     assertEquals(p.generateFilename(), "scrubs - [23].avi")
+
+
+def test_episodeinfo_compact():
+    """Episodes have no __dict__, share repeated strings, and keep
+    the public path attributes
+    """
+    a = FileParser("/tv/Scrubs/scrubs.s01e01.avi").parse()
+    b = FileParser("/tv/Scrubs/scrubs.s01e02.avi").parse()
+
+    assertEquals(hasattr(a, "__dict__"), False)
+    assertEquals(a.seriesname is b.seriesname, True)
+    assertEquals(a.filepath is b.filepath, True)
+    assertEquals(a.extension is b.extension, True)
+
+    assertEquals(a.fullpath, "/tv/Scrubs/scrubs.s01e01.avi")
+    assertEquals(a.filename, "scrubs.s01e01")
+    assertEquals(a.originalfilename, "scrubs.s01e01.avi")
+
+    a.fullpath = "/tv/Scrubs/Scrubs - [01x01].avi"
+    assertEquals(a.fullpath, "/tv/Scrubs/Scrubs - [01x01].avi")
+    assertEquals(a.originalfilename, "scrubs.s01e01.avi")
+
+
+def test_episodeinfo_extra_without_none():
+    """Only regex groups which matched are kept in extra
+    """
+    ep = EpisodeInfo("Scrubs", 1, [1], extra = {'group': None, 'crc': 'ABCD1234'})
+    assertEquals(ep.extra, {'crc': 'ABCD1234'})
+
+
+def test_unmatched_group_in_template():
+    """Optional pattern groups which did not match render as None in
+    output templates
+    """
+    config = ConfigSnapshot(dict(defaults,
+        filename_patterns = [r"^(?P<seriesname>.+?)\.s(?P<seasonnumber>\d+)e(?P<episodenumber>\d+)(\.(?P<quality>\d+p))?\.\w+$"],
+        filename_with_episode = "%(seriesname)s %(seasonnumber)dx%(episode)s %(quality)s%(ext)s"))
+
+    names = []
+    for path in ["/tv/scrubs.s01e01.720p.avi", "/tv/scrubs.s01e02.avi"]:
+        episode = FileParser(path, config = config).parse()
+        episode.episodename = "Name"
+        names.append(episode.generateFilename())
+    assertEquals(names, ["scrubs 1x01 720p.avi", "scrubs 1x02 None.avi"])
+
+
+def test_intern_table_bounded():
+    """The intern table is cleared once full, so long running processes
+    do not keep every string seen
+    """
+    for i in range(tvnamer.utils.INTERN_TABLE_SIZE + 10):
+        internString("/tv/show %d" % i)
+    assertEquals(len(tvnamer.utils._interned) <= tvnamer.utils.INTERN_TABLE_SIZE, True)
+
+    value = "/tv/Scrubs"
+    assertEquals(internString("/tv/" + "Scrubs") is internString(value), True)
@@ -3,11 +3,9 @@
 """Test ability to set the series name by series id
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
 
 
-@attr("functional")
 def test_series_id():
     """Test --series-id argument
     """
@@ -17,7 +15,7 @@ def test_series_id():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['whatever.s01e01.avi'],
         with_config = conf,
         with_flags = ["--series-id", '76156'],
@@ -28,7 +26,6 @@ def test_series_id():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_series_id_with_nameless_series():
     """Test --series-id argument with '6x17.etc.avi' type filename
     """
@@ -38,7 +35,7 @@ def test_series_id_with_nameless_series():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['s01e01.avi'],
         with_config = conf,
         with_flags = ["--series-id", '76156'],
@@ -4,17 +4,16 @@
 """
 
 import os
-from functional_runner import run_tvnamer, verify_out_data
+from functional_runner import run_tvnamer, run_tvnamer_inprocess, verify_out_data
 from helpers import attr
 import pytest
 
 
-@attr("functional")
 def test_simple_single_file():
     """Test most simple usage
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_input = "1\ny\n")
 
@@ -23,7 +22,6 @@ def test_simple_single_file():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_simple_multiple_files():
     """Tests simple interactive usage with multiple files
     """
@@ -40,14 +38,13 @@ def test_simple_multiple_files():
         'a fake show - [12x24].avi',
          'Total Access 24_7 - [01x01] - Episode #1.avi']
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_input = "y\n1\ny\n1\ny\n1\ny\ny\n")
 
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_simple_batch_functionality():
     """Tests renaming single files at a time, in batch mode
     """
@@ -67,14 +64,13 @@ def test_simple_batch_functionality():
 
         print("Expecting %r to turn into %r" % (
             curtest['in'], curtest['expected']))
-        out_data = run_tvnamer(
+        out_data = run_tvnamer_inprocess(
             with_files = [curtest['in'], ],
             with_flags = ['--batch'],
         )
         verify_out_data(out_data, [curtest['expected'], ])
 
 
-@attr("functional")
 def test_interactive_always_option():
     """Tests the "a" always rename option in interactive UI
     """
@@ -91,7 +87,7 @@ def test_interactive_always_option():
         'a fake show - [12x24].avi',
          'Total Access 24_7 - [01x01] - Episode #1.avi']
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_flags = ["--selectfirst"],
         with_input = "a\n")
@@ -141,7 +137,6 @@ def test_unicode_in_search_results():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_renaming_always_doesnt_overwrite():
     """If trying to rename a file that exists, should not create new file
     """
@@ -153,7 +148,7 @@ def test_renaming_always_doesnt_overwrite():
         'Scrubs.s01e01.avi',
         'Scrubs - [01x01] - My First Day.avi']
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_flags = ['--batch'])
 
@@ -180,7 +175,6 @@ def test_not_overwritting_unicode_filename():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_not_recursive():
     """Tests the nested files aren't found when not recursive
     """
@@ -192,7 +186,7 @@ def test_not_recursive():
         'Scrubs - [01x01] - My First Day.avi',
         'nested/subdir/Scrubs.s01e02.avi']
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = input_files,
         with_flags = ['--not-recursive', '--batch'],
         run_on_directory = True)
@@ -200,12 +194,11 @@ def test_not_recursive():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_correct_filename():
     """If the filename is already correct, don't prompt
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [01x01] - My First Day.avi'],
         with_input = "1\ny\n")
 
@@ -214,12 +207,11 @@ def test_correct_filename():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_filename_already_exists():
     """If the filename is already correct, don't prompt
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [01x01] - My First Day.avi', 'scrubs.s01e01.avi'],
         with_input = "1\ny\n")
 
@@ -228,12 +220,11 @@ def test_filename_already_exists():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_no_seasonnumber():
     """Test episode with no series number
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.e01.avi'],
         with_flags = ['--batch'])
 
@@ -242,7 +233,6 @@ def test_no_seasonnumber():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_skipping_after_replacements():
     """When custom-replacement is specified, should still skip file if name is correct
     """
@@ -262,7 +252,7 @@ def test_skipping_after_replacements():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrvbs - [01x01] - My First Day.avi'],
         with_config = conf,
         with_input = "")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Functional tests run in process, with episode names from
+functional_runner.FAKE_SERIES instead of thetvdb.com
+"""
+
+from functional_runner import run_tvnamer_inprocess, verify_out_data
+from helpers import assertEquals
+
+from tvnamer.config import Config
+from tvnamer.config_defaults import defaults
+
+
+def test_simple_single_file():
+    """Test most simple usage
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi'],
+        with_input = "1\ny\n")
+
+    verify_out_data(out_data, ['Scrubs - [01x01] - My First Day.avi'])
+
+
+def test_batch_multiple_files():
+    """Series missing from the metadata are skipped in batch mode
+    """
+    input_files = [
+        'scrubs.s01e01.hdtv.fake.avi',
+        'my.name.is.earl.s01e01.fake.avi',
+        'a.fake.show.s12e24.fake.avi',
+        'total.access.s01e01.avi']
+
+    expected_files = [
+        'Scrubs - [01x01] - My First Day.avi',
+        'My Name Is Earl - [01x01] - Pilot.avi',
+        'a.fake.show.s12e24.fake.avi',
+        'Total Access 24_7 - [01x01] - Episode #1.avi']
+
+    out_data = run_tvnamer_inprocess(
+        with_files = input_files,
+        with_flags = ['--batch'])
+
+    verify_out_data(out_data, expected_files)
+
+
+def test_interactive_always_option():
+    """Tests the "a" always rename option in interactive UI
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi'],
+        with_input = "1\na\n")
+
+    verify_out_data(out_data, [
+        'Scrubs - [01x01] - My First Day.avi',
+        'Scrubs - [01x02] - My Mentor.avi'])
+
+
+def test_move_with_config():
+    """Config files are loaded, and the config restored afterwards
+    """
+    conf = """
+    {"move_files_enable": true,
+    "move_files_destination": "%(seriesname)s/season %(seasonnumber)d",
+    "batch": true}
+    """
+
+    before = (dict(Config), dict(defaults))
+
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s02e01.avi'],
+        with_config = conf)
+
+    verify_out_data(out_data, ['Scrubs/season 2/Scrubs - [02x01] - My Overkill.avi'])
+    assertEquals((dict(Config), dict(defaults)), before)
+
+
+def test_exit_code_on_error():
+    """Errors from the option parser give its exit code and message
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['not an episode.avi'],
+        with_flags = ['--batch'])
+
+    verify_out_data(out_data, ['not an episode.avi'], expected_returncode = 2)
+    assertEquals("No valid files were supplied" in out_data['output'], True)
+
+
+def test_batch_collision_skipped():
+    """Files which would be renamed to the same name are found before
+    any file is renamed, and skipped
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi', 'Scrubs.1x01.avi'],
+        with_flags = ['--batch'])
+
+    verify_out_data(out_data, ['Scrubs - [01x01] - My First Day.avi', 'scrubs.s01e01.avi'])
+    assertEquals("Skipping 1 colliding file" in out_data['output'], True)
+
+
+def test_batch_collision_resolved():
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi', 'Scrubs.1x01.avi'],
+        with_flags = ['--batch', '--resolve-collisions'])
+
+    verify_out_data(out_data, [
+        'Scrubs - [01x01] - My First Day.avi',
+        'Scrubs - [01x01] - My First Day (2).avi'])
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""Tests the stage hooks
+"""
+
+from helpers import assertEquals
+
+from tvnamer import hooks
+from tvnamer.utils import FileParser
+from tvnamer.tvnamer_exceptions import InvalidFilename
+
+
+def test_start_and_end_called():
+    """Start and end callbacks get the stage name and file path
+    """
+    calls = []
+    hook = hooks.addHook(
+        start = lambda name, path: calls.append(('start', name, path)),
+        end = lambda name, path, seconds: calls.append(('end', name, path)))
+    try:
+        episode = FileParser("/tv/scrubs.s01e01.avi").parse()
+        episode.generateFilename()
+    finally:
+        hooks.removeHook(hook)
+
+    assertEquals(calls, [
+        ('start', 'parsing', "/tv/scrubs.s01e01.avi"),
+        ('end', 'parsing', "/tv/scrubs.s01e01.avi"),
+        ('start', 'naming', "/tv/scrubs.s01e01.avi"),
+        ('end', 'naming', "/tv/scrubs.s01e01.avi")])
+
+    # Removed hooks are not called again
+    FileParser("/tv/scrubs.s01e02.avi").parse()
+    assertEquals(len(calls), 4)
+
+
+def test_end_called_on_error():
+    """The end callback is called when the stage raises
+    """
+    ended = []
+    hook = hooks.addHook(end = lambda name, path, seconds: ended.append(name))
+    try:
+        try:
+            FileParser("/tv/not an episode.avi").parse()
+        except InvalidFilename:
+            pass
+        else:
+            raise AssertionError("InvalidFilename not raised")
+    finally:
+        hooks.removeHook(hook)
+
+    assertEquals(ended, ['parsing'])
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""Tests the pooled, coalescing session against a local HTTP server
+"""
+
+import sys
+import time
+import threading
+
+from helpers import assertEquals
+
+from tvnamer.httpsession import CoalescingSession
+
+if sys.version_info[0] == 2:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+else:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+
+
+class _StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.2)
+        with server.lock:
+            server.active -= 1
+
+        body = ("<Data>%s</Data>" % self.path).encode("ascii")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _startServer():
+    server = _StubServer(("127.0.0.1", 0), _StubHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.active = 0
+    server.max_active = 0
+    thread = threading.Thread(target = server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server, "http://127.0.0.1:%d" % server.server_address[1]
+
+
+def _getAll(session, urls):
+    results = {}
+
+    def get(i, url):
+        results[i] = session.get(url).content
+
+    threads = [threading.Thread(target = get, args = (i, url)) for i, url in enumerate(urls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [results[i] for i in range(len(urls))]
+
+
+def test_identical_requests_coalesced():
+    """Concurrent requests for the same URL share one request
+    """
+    session = CoalescingSession(max_in_flight = 4)
+    server, base = _startServer()
+    try:
+        results = _getAll(session, [base + "/series/scrubs"] * 5)
+    finally:
+        server.shutdown()
+
+    assertEquals(server.requests, ["/series/scrubs"])
+    assertEquals(set(results), set([b"<Data>/series/scrubs</Data>"]))
+    assertEquals(session.requests_made, 1)
+    assertEquals(session.requests_coalesced, 4)
+
+
+def test_in_flight_limit():
+    """No more than max_in_flight requests are made at once
+    """
+    session = CoalescingSession(max_in_flight = 2)
+    server, base = _startServer()
+    try:
+        results = _getAll(session, [base + "/series/%d" % i for i in range(6)])
+    finally:
+        server.shutdown()
+
+    assertEquals(len(server.requests), 6)
+    assertEquals(server.max_active <= 2, True)
+    assertEquals(results[3], b"<Data>/series/3</Data>")
@@ -3,11 +3,10 @@
 """Tests the valid_extensions config option
 """
 
-from functional_runner import run_tvnamer, verify_out_data
+from functional_runner import run_tvnamer, run_tvnamer_inprocess, verify_out_data
 from helpers import attr
 
 
-@attr("functional")
 def test_no_extensions():
     """Tests empty list of extensions is parsed as expected
     """
@@ -18,7 +17,7 @@ def test_no_extensions():
     "valid_extensions": []}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.mkv'],
         with_config = conf)
 
@@ -29,7 +28,6 @@ def test_no_extensions():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_single_extensions():
     """Tests one valid extension with multiple files
     """
@@ -40,7 +38,7 @@ def test_single_extensions():
     "valid_extensions": ["mkv"]}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.mkv'],
         with_config = conf)
 
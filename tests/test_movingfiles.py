@@ -3,11 +3,10 @@
 """Tests moving renamed files
 """
 
-from functional_runner import run_tvnamer, verify_out_data
+from functional_runner import run_tvnamer, run_tvnamer_inprocess, verify_out_data
 from helpers import attr
 
 
-@attr("functional")
 def test_simple_realtive_move():
     """Move file to simple relative static dir
     """
@@ -18,7 +17,7 @@ def test_simple_realtive_move():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf,
         with_input = "")
@@ -28,7 +27,6 @@ def test_simple_realtive_move():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_dynamic_destination():
     """Move file to simple relative static dir
     """
@@ -39,7 +37,7 @@ def test_dynamic_destination():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf)
 
@@ -48,12 +46,11 @@ def test_dynamic_destination():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_cli_destination():
     """Tests specifying the destination via command line argument
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_flags = ['--batch', '--move', '--movedestination=season %(seasonnumber)d/'])
 
@@ -62,7 +59,6 @@ def test_cli_destination():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_interactive_allyes():
     """Tests interactive UI for moving all files
     """
@@ -73,7 +69,7 @@ def test_move_interactive_allyes():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "y\ny\ny\ny\n")
@@ -84,7 +80,6 @@ def test_move_interactive_allyes():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_interactive_allno():
     """Tests interactive UI allows not moving any files
     """
@@ -95,7 +90,7 @@ def test_move_interactive_allno():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "y\nn\ny\nn\n")
@@ -106,7 +101,6 @@ def test_move_interactive_allno():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_interactive_somefiles():
     """Tests interactive UI allows not renaming some files, renaming/moving others
 
@@ -120,7 +114,7 @@ def test_move_interactive_somefiles():
     "select_first": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi', 'scrubs.s01e03.avi'],
         with_config = conf,
         with_input = "y\ny\nn\ny\nn\n")
@@ -178,7 +172,6 @@ def test_with_invalid_seriesname_test2():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_files_lowercase_destination():
     """Test move_files_lowercase_destination configuration option.
     """
@@ -190,7 +183,7 @@ def test_move_files_lowercase_destination():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.This.Is.a.Test.avi'],
         with_config = conf,
         with_input = "")
@@ -222,7 +215,6 @@ def test_move_date_based_episode():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_files_full_filepath_simple():
     """Moving file destination including a fixed filename
     """
@@ -234,7 +226,7 @@ def test_move_files_full_filepath_simple():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "")
@@ -244,7 +236,6 @@ def test_move_files_full_filepath_simple():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_files_full_filepath_with_origfilename():
     """Moving file destination including a filename
     """
@@ -256,7 +247,7 @@ def test_move_files_full_filepath_with_origfilename():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs.s01e02.avi'],
         with_config = conf,
         with_input = "")
@@ -268,7 +259,6 @@ def test_move_files_full_filepath_with_origfilename():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_with_correct_name():
     """Files with correct name should still be moved
     """
@@ -279,7 +269,7 @@ def test_move_with_correct_name():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [01x02] - My Mentor.avi'],
         with_config = conf,
         with_input = "y\n")
@@ -289,7 +279,6 @@ def test_move_with_correct_name():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_no_season():
     """Files with no season number should moveable [#94]
     """
@@ -300,7 +289,7 @@ def test_move_no_season():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs - [02] - My Mentor.avi'],
         with_config = conf,
         with_input = "y\n")
@@ -310,7 +299,6 @@ def test_move_no_season():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_move_files_only():
     """With parameter move_files_only set to true files should be moved and not renamed
     """
@@ -322,7 +310,7 @@ def test_move_files_only():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi'],
         with_config = conf)
 
@@ -331,7 +319,6 @@ def test_move_files_only():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_forcefully_moving_enabled():
     """Forcefully moving files, overwriting destination
     """
@@ -343,7 +330,7 @@ def test_forcefully_moving_enabled():
     "overwrite_destination_on_move": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'Scrubs - [01x01] - My First Day.avi'],
         with_config = conf)
 
@@ -352,7 +339,6 @@ def test_forcefully_moving_enabled():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_forcefully_moving_disabled():
     """Explicitly disable forcefully moving files
     """
@@ -364,7 +350,7 @@ def test_forcefully_moving_disabled():
     "overwrite_destination_on_move": false}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs - [01x01].avi'],
         with_config = conf)
 
@@ -375,7 +361,6 @@ def test_forcefully_moving_disabled():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_forcefully_moving_default():
     """Ensure default is not overwrite destination
     """
@@ -386,7 +371,7 @@ def test_forcefully_moving_default():
     "batch": true}
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scrubs.s01e01.avi', 'scrubs - [01x01].avi'],
         with_config = conf)
 
@@ -3,16 +3,14 @@
 """Ensure that invalid files (non-episodes) are not renamed
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
 
 
-@attr("functional")
 def test_simple_single_file():
     """Files without series name should be skipped, unless --name=MySeries is specified
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['S01E02 - Some File.avi'],
         with_flags = ["--batch"])
 
@@ -21,12 +19,11 @@ def test_simple_single_file():
     verify_out_data(out_data, expected_files, expected_returncode = 2)
 
 
-@attr("functional")
 def test_simple_single_file_with_forced_seriesnames():
     """Specifying 's01e01.avi' should parse when --name=SeriesName arg is specified
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['S01E02 - Some File.avi'],
         with_flags = ["--batch", '--name', 'Scrubs'])
 
@@ -35,7 +32,6 @@ def test_simple_single_file_with_forced_seriesnames():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_name_arg_skips_replacements():
     """Should not apply input_filename_replacements to --name=SeriesName arg value
     """
@@ -54,7 +50,7 @@ def test_name_arg_skips_replacements():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['S01E02 - Some File.avi'],
         with_config = conf)
 
@@ -63,7 +59,6 @@ def test_name_arg_skips_replacements():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replacements_applied_before_force_name():
     """input_filename_replacements apply to filename, before --name=SeriesName takes effect
     """
@@ -82,7 +77,7 @@ def test_replacements_applied_before_force_name():
     }
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['S01E02 - Some File.avi'],
         with_config = conf)
 
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+
+"""Tests buffered and quiet console output, and the progress line
+"""
+
+import sys
+
+from functional_runner import run_tvnamer_inprocess, verify_out_data
+from helpers import assertEquals
+
+from tvnamer.unicode_helper import p, setQuiet, redirectOutput, bufferedOutput, ProgressLine
+
+
+class _Stream(object):
+    """Records each write, shared between several streams to check order
+    """
+
+    def __init__(self, writes, name, tty = False):
+        self.writes = writes
+        self.name = name
+        self.tty = tty
+
+    def write(self, text):
+        self.writes.append((self.name, text))
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return self.tty
+
+
+def _capture(func):
+    writes = []
+    saved = sys.stdout, sys.stderr
+    sys.stdout = _Stream(writes, "out")
+    sys.stderr = _Stream(writes, "err")
+    try:
+        func()
+    finally:
+        sys.stdout, sys.stderr = saved
+    return writes
+
+
+def test_buffered_block():
+    """Lines in a block are written in one call, before anything written
+    to stderr
+    """
+    def run():
+        with bufferedOutput():
+            p("Old filename: a")
+            p("New filename: b")
+            p("error", file = sys.stderr)
+            p("Renamed")
+        p("after")
+
+    assertEquals(_capture(run), [
+        ("out", "Old filename: a\nNew filename: b\n"),
+        ("err", "error\n"),
+        ("out", "Renamed\n"),
+        ("out", "after\n")])
+
+
+def test_buffering_disabled():
+    def run():
+        with bufferedOutput(enabled = False):
+            p("one")
+            p("two")
+
+    assertEquals(_capture(run), [("out", "one\n"), ("out", "two\n")])
+
+
+def test_quiet():
+    """Only summary lines and stderr are shown in quiet mode
+    """
+    def run():
+        setQuiet(True)
+        try:
+            p("detail")
+            p("# Summary", summary = True)
+            p("error", file = sys.stderr)
+        finally:
+            setQuiet(False)
+
+    assertEquals(_capture(run), [("out", "# Summary\n"), ("err", "error\n")])
+
+
+def test_redirect_output():
+    """Lines for stdout go to the redirected stream, including buffered
+    blocks, leaving stdout for other output
+    """
+    def run():
+        redirectOutput(sys.stderr)
+        try:
+            with bufferedOutput():
+                p("Old filename: a")
+            p("detail")
+            sys.stdout.write("{}\n")
+        finally:
+            redirectOutput(None)
+
+    assertEquals(_capture(run), [
+        ("err", "Old filename: a\n"),
+        ("err", "detail\n"),
+        ("out", "{}\n")])
+
+
+def test_progress_line():
+    """The progress line is only drawn on terminals, and cleared before
+    other output
+    """
+    writes = []
+    clock = [0.0]
+    with ProgressLine(4, stream = _Stream(writes, "tty", tty = True), clock = lambda: clock[0]) as progress:
+        progress.update(1, "a.avi")
+        clock[0] += 1
+        progress.update(2, "b.avi")
+    text = "".join(x[1] for x in writes)
+    assertEquals("[1/4]  25% a.avi" in text, True)
+    assertEquals("[2/4]  50% b.avi" in text, True)
+    assertEquals(text.endswith("\n"), True)
+
+    writes = []
+    with ProgressLine(4, stream = _Stream(writes, "pipe")) as progress:
+        progress.update(1, "a.avi")
+    assertEquals(writes, [])
+
+
+def test_quiet_run():
+    """A quiet batch run renames files, showing only the report
+    """
+    out_data = run_tvnamer_inprocess(
+        with_files = ['scrubs.s01e01.avi'],
+        with_flags = ['--batch', '--quiet'])
+
+    verify_out_data(out_data, ['Scrubs - [01x01] - My First Day.avi'])
+    assertEquals("New filename" in out_data['output'], False)
+    assertEquals("# Run report" in out_data['output'], True)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""Checks each default filename pattern fails (or matches) quickly on
+long adversarial filenames, so a pattern prone to catastrophic
+backtracking cannot hang a batch run
+"""
+
+import re
+import time
+import signal
+import warnings
+
+from tvnamer.config_defaults import defaults
+from tvnamer.utils import FileParser
+
+
+# Seconds all the adversarial filenames may take against one pattern
+PATTERN_BUDGET = 1.0
+
+# Length of the adversarial filenames
+LENGTH = 5000
+
+# Repeated to make up the adversarial filenames, chosen to partially
+# match the separators, numbers and brackets the patterns look for
+UNITS = [
+    ".", "-", "_", " ", "1", "a", "x", "[", "]",
+    "a.", "1.", "a-", "1-", "1x", "01.", ". 1", "a - ",
+    "s01e01", "s1e1-", "e01", "e1-e", "[01x01]", "2001-01-",
+    "part 1 and ", "1 to "]
+
+
+def adversarialFilenames():
+    """Returns list of (description, filename)
+    """
+    filenames = []
+    for unit in UNITS:
+        body = unit * (LENGTH // len(unit))
+        filenames.append(("%r repeated" % unit, body))
+        filenames.append(("%r repeated, with extension" % unit, body + ".avi"))
+        filenames.append(("%r repeated, after a series name" % unit, "show." + body))
+    return filenames
+
+
+class _OverBudget(Exception):
+    pass
+
+
+def _raiseOverBudget(signum, frame):
+    raise _OverBudget()
+
+
+def timeMatches(regex, filenames, budget):
+    """Returns seconds taken matching regex against all filenames, or
+    None with the description of the filename being matched when the
+    budget ran out. Where signals are available, a match still running
+    when the budget runs out is interrupted
+    """
+    use_alarm = hasattr(signal, 'setitimer')
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raiseOverBudget)
+        signal.setitimer(signal.ITIMER_REAL, budget)
+    start = time.time()
+    try:
+        for description, filename in filenames:
+            try:
+                regex.match(filename)
+            except _OverBudget:
+                return None, description
+            if time.time() - start > budget:
+                return None, description
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+    return time.time() - start, None
+
+
+def test_default_patterns_on_adversarial_filenames():
+    """Each default pattern handles all adversarial filenames within
+    PATTERN_BUDGET
+    """
+    filenames = adversarialFilenames()
+    slow = []
+    for i, pattern in enumerate(defaults['filename_patterns']):
+        try:
+            regex = re.compile(pattern, re.VERBOSE)
+        except re.error as e:
+            # FileParser warns about, and skips, invalid patterns
+            warnings.warn("Not checking pattern %d, it does not compile: %s" % (i, e))
+            continue
+        seconds, description = timeMatches(regex, filenames, PATTERN_BUDGET)
+        if seconds is None:
+            first_line = [x.strip() for x in pattern.splitlines() if x.strip()][0][:60]
+            slow.append("pattern %d (%s) over %.1fs budget on %s" % (
+                i, first_line, PATTERN_BUDGET, description))
+
+    if len(slow) > 0:
+        raise AssertionError("Slow filename patterns:\n" + "\n".join(slow))
+
+
+def test_parse_adversarial_filenames():
+    """FileParser.parse gives up quickly on adversarial filenames
+    """
+    start = time.time()
+    for description, filename in adversarialFilenames():
+        try:
+            FileParser(filename).parse()
+        except Exception:
+            # Only the time taken matters here
+            pass
+    seconds = time.time() - start
+
+    budget = PATTERN_BUDGET * len(defaults['filename_patterns'])
+    assert seconds < budget, "Parsing adversarial filenames took %.1fs, budget %.1fs" % (seconds, budget)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+
+"""Tests looking up names with the fixture metadata provider
+"""
+
+import os
+import sys
+import json
+import datetime
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.compat import PY2
+
+if PY2:
+    from StringIO import StringIO
+else:
+    from io import StringIO
+
+from tvnamer.utils import EpisodeInfo, DatedEpisodeInfo, NoSeasonEpisodeInfo
+from tvnamer.providers import FixtureProvider
+from tvnamer.tvnamer_exceptions import ShowNotFound, SeasonNotFound, EpisodeNotFound
+
+
+SERIES = [
+    {"id": 76156,
+     "seriesname": "Scrubs",
+     "aliases": ["Scrubs (2001)"],
+     "episodes": [
+        {"seasonnumber": 1, "episodenumber": 1, "absolute_number": 1,
+         "episodename": "My First Day", "firstaired": "2001-10-02"},
+        {"seasonnumber": 1, "episodenumber": 2, "absolute_number": 2,
+         "episodename": "My Mentor", "firstaired": "2001-10-04"},
+        {"seasonnumber": 2, "episodenumber": 1, "absolute_number": 25,
+         "episodename": "My Overkill", "firstaired": "2002-09-26"},
+        {"seasonnumber": 0, "episodenumber": 1,
+         "episodename": "Special", "firstaired": "2001-10-04"}]}]
+
+
+def test_season_episode():
+    """Names are found by season and episode number, series by alias
+    """
+    ep = EpisodeInfo("scrubs (2001)", 1, [1, 2])
+    ep.populateFromTvdb(FixtureProvider(SERIES))
+    assertEquals(ep.seriesname, "Scrubs")
+    assertEquals(ep.episodename, ["My First Day", "My Mentor"])
+
+
+def test_series_id_as_name():
+    """Series ids given in place of a name are looked up by id
+    """
+    ep = EpisodeInfo(76156, 1, [1])
+    ep.populateFromTvdb(FixtureProvider(SERIES))
+    assertEquals(ep.seriesname, "Scrubs")
+
+
+def test_select_series():
+    """When several series have the name, the first is used, or the one
+    chosen when interactive (only asked once per name)
+    """
+    other = {"id": 1, "seriesname": "Scrubs (2026)", "aliases": ["Scrubs"], "episodes": []}
+    assertEquals(FixtureProvider(SERIES + [other]).getSeries(name = "scrubs")['id'], 76156)
+
+    provider = FixtureProvider(SERIES + [other], interactive = True)
+    saved = sys.stdin, sys.stdout
+    sys.stdin, sys.stdout = StringIO("x\n2\n"), StringIO()
+    try:
+        assertEquals(provider.getSeries(name = "scrubs")['id'], 1)
+        assertEquals(provider.getSeries(name = "Scrubs")['id'], 1)
+    finally:
+        sys.stdin, sys.stdout = saved
+
+
+def test_absolute_number():
+    """Episodes missing from season 1 are searched by absolute number
+    """
+    ep = NoSeasonEpisodeInfo("Scrubs", [25])
+    ep.populateFromTvdb(FixtureProvider(SERIES))
+    assertEquals(ep.episodename, ["My Overkill"])
+
+
+def test_air_date():
+    """Specials are ignored when another episode aired the same day
+    """
+    ep = DatedEpisodeInfo("Scrubs", [datetime.date(2001, 10, 4)])
+    ep.populateFromTvdb(FixtureProvider(SERIES))
+    assertEquals(ep.episodename, ["My Mentor"])
+
+
+def test_series_id():
+    """Series can be selected by id instead of name
+    """
+    ep = EpisodeInfo("Wrong", 2, [1])
+    ep.populateFromTvdb(FixtureProvider(SERIES), series_id = "76156")
+    assertEquals(ep.episodename, ["My Overkill"])
+
+
+def test_not_found():
+    """Missing series, seasons and episodes raise tvnamer's exceptions
+    """
+    provider = FixtureProvider(SERIES)
+    for ep, expected in [
+            (EpisodeInfo("Nothing", 1, [1]), ShowNotFound),
+            (EpisodeInfo("Scrubs", 9, [1]), SeasonNotFound),
+            (EpisodeInfo("Scrubs", 1, [99]), EpisodeNotFound)]:
+        try:
+            ep.populateFromTvdb(provider)
+        except expected:
+            pass
+        else:
+            raise AssertionError("Expected %s for %r" % (expected.__name__, ep))
+
+
+def test_from_file():
+    """Fixtures are loaded from JSON files
+    """
+    fd, path = tempfile.mkstemp(suffix = ".json")
+    try:
+        os.write(fd, json.dumps({"series": SERIES}).encode("utf-8"))
+        os.close(fd)
+        provider = FixtureProvider.fromFile(path)
+        assertEquals(provider.seriesName(provider.getSeries(name = "SCRUBS")), "Scrubs")
+    finally:
+        os.unlink(path)
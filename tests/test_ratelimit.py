@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""Tests rate limiting and retrying of series lookups
+"""
+
+from helpers import assertEquals
+
+from tvnamer.ratelimit import TokenBucket, backoffDelay
+from tvnamer.providers import FixtureProvider, ThrottledProvider
+from tvnamer.tvnamer_exceptions import DataRetrievalError
+
+
+class _FakeClock(object):
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class _FlakyProvider(FixtureProvider):
+    """Fails the first failures lookups
+    """
+
+    def __init__(self, failures):
+        FixtureProvider.__init__(self, [{"seriesname": "Scrubs", "episodes": []}])
+        self.failures = failures
+        self.calls = 0
+
+    def getSeries(self, name = None, series_id = None):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise DataRetrievalError("Error with www.thetvdb.com: 503")
+        return FixtureProvider.getSeries(self, name = name, series_id = series_id)
+
+
+def test_token_bucket():
+    """Bursts are allowed, then calls are spaced out at the rate
+    """
+    clock = _FakeClock()
+    bucket = TokenBucket(2, burst = 3, clock = clock, sleep = clock.sleep)
+
+    waits = [bucket.acquire() for x in range(5)]
+    assertEquals(waits[:3], [0.0, 0.0, 0.0])
+    assertEquals(waits[3], 0.5)
+    assertEquals(clock.now, 1.0)
+    assertEquals(bucket.waits, 2)
+    assertEquals(bucket.waited, 1.0)
+
+    # Tokens refill while idle, up to burst
+    clock.now += 10
+    assertEquals([bucket.acquire() for x in range(3)], [0.0, 0.0, 0.0])
+
+
+def test_backoff_delay():
+    """Delays double per attempt up to the maximum, scaled by jitter
+    """
+    assertEquals([backoffDelay(x, 1, 5, rand = lambda: 1.0) for x in range(5)], [1, 2, 4, 5, 5])
+    assertEquals(backoffDelay(2, 1, 5, rand = lambda: 0.5), 2.0)
+
+
+def test_retry_transient_errors():
+    """Failed lookups are retried, and loaded series reused
+    """
+    clock = _FakeClock()
+    flaky = _FlakyProvider(failures = 2)
+    provider = ThrottledProvider(flaky, retries = 2, sleep = clock.sleep)
+
+    series = provider.getSeries(name = "scrubs")
+    assertEquals(provider.seriesName(series), "Scrubs")
+    assertEquals(provider.retried, 2)
+    assertEquals(flaky.calls, 3)
+
+    provider.getSeries(name = "Scrubs")
+    assertEquals(flaky.calls, 3)
+    assertEquals(provider.lookups, 1)
+
+
+def test_retries_exhausted():
+    """The error is raised once retries are used up
+    """
+    clock = _FakeClock()
+    flaky = _FlakyProvider(failures = 5)
+    provider = ThrottledProvider(flaky, retries = 1, sleep = clock.sleep)
+    try:
+        provider.getSeries(name = "Scrubs")
+    except DataRetrievalError:
+        pass
+    else:
+        raise AssertionError("Expected DataRetrievalError")
+    assertEquals(flaky.calls, 2)
+
+
+def test_series_id_as_name():
+    """Series ids given in place of a name are looked up and reused
+    """
+    fixture = FixtureProvider([{"id": 76156, "seriesname": "Scrubs", "episodes": []}])
+    provider = ThrottledProvider(fixture)
+
+    series = provider.getSeries(name = 76156)
+    assertEquals(provider.seriesName(series), "Scrubs")
+    provider.getSeries(name = 76156)
+    assertEquals(provider.lookups, 1)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Tests finding patterns prone to catastrophic backtracking, and
+aborting slow matches
+"""
+
+import time
+
+from helpers import assertEquals
+
+from tvnamer.config import Config
+from tvnamer.config_defaults import defaults
+from tvnamer.utils import FileParser
+from tvnamer.regexcheck import backtrackingRisks, checkConfigPatterns, canTimeMatches
+from tvnamer.tvnamer_exceptions import InvalidFilename, PatternTimeoutError
+
+
+def test_nested_quantifiers():
+    """Quantified groups containing quantifiers over the same characters
+    are flagged, unless a required separator cannot be matched by the
+    inner quantifier
+    """
+    for pattern in [r"^(a+)+$", r"^(\w+\s?)*$", r"(.+\.)+x", r"(.*a){20}", r"(a+|b)*c"]:
+        assertEquals((pattern, backtrackingRisks(pattern)), (pattern, ["nested quantifiers"]))
+
+    for pattern in [r"([-_]\d+)*", r"(\d+\.){3}\d+", r".*sample.*", r"(\d{1,3}\.)*"]:
+        assertEquals((pattern, backtrackingRisks(pattern)), (pattern, []))
+
+
+def test_overlapping_alternatives():
+    """Repeated alternatives which can match the same text are flagged
+    """
+    assertEquals(backtrackingRisks(r"(a|a)*b"), ["repeated alternatives which can match the same text"])
+    assertEquals(backtrackingRisks(r"(?:and|&|to)+"), [])
+
+
+def test_config_patterns():
+    """Defaults are not flagged, regex replacements and patterns are
+    """
+    assertEquals(checkConfigPatterns(defaults), [])
+
+    config = dict(defaults)
+    config['filename_patterns'] = [r"^(?P<seriesname>(\w+[ .]?)+)\.s(?P<seasonnumber>\d+)e(?P<episodenumber>\d+)"]
+    config['input_filename_replacements'] = [
+        {'is_regex': True, 'match': r"(x+x+)+y", 'replacement': ""},
+        {'is_regex': False, 'match': r"(x+x+)+y", 'replacement': ""}]
+    config['filename_blacklist'] = ["scrubs.s02e01.avi"]
+    flagged = checkConfigPatterns(config)
+    assertEquals([(key, risks) for key, pattern, risks in flagged], [
+        ("filename_patterns[0]", ["nested quantifiers"]),
+        ("input_filename_replacements[0]", ["nested quantifiers"])])
+
+
+def test_match_timeout():
+    """A match over pattern_match_timeout skips the file, naming it and
+    the pattern
+    """
+    if not canTimeMatches():
+        return
+
+    saved = Config['filename_patterns'], Config['pattern_match_timeout']
+    Config['filename_patterns'] = [r"^(?P<seriesname>(\w+\s?)*)\.s(?P<seasonnumber>\d+)e(?P<episodenumber>\d+)$"]
+    Config['pattern_match_timeout'] = 0.2
+    try:
+        start = time.time()
+        try:
+            FileParser("/tv/" + "a" * 40 + "!").parse()
+        except PatternTimeoutError as e:
+            message = str(e)
+        else:
+            raise AssertionError("PatternTimeoutError not raised")
+        assert time.time() - start < 2
+        assertEquals("aaaa!" in message and "(\\w+\\s?)*" in message, True)
+        assertEquals(issubclass(PatternTimeoutError, InvalidFilename), True)
+
+        # Quick matches are unaffected
+        assertEquals(FileParser("/tv/scrubs.s01e02").parse().episodenumbers, [2])
+    finally:
+        Config['filename_patterns'], Config['pattern_match_timeout'] = saved
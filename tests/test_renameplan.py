@@ -0,0 +1,295 @@
+#!/usr/bin/env python
+
+"""Tests executing, resuming and undoing journaled rename plans
+"""
+
+import os
+import shutil
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.renameplan import (PlannedOperation, Journal, NullJournal, executePlan,
+resumeJournal, undoJournal, findCollisions,
+resolveCollisions)
+
+
+def _setup():
+    tmp = tempfile.mkdtemp()
+    for name in ['scrubs.s01e01.avi', 'scrubs.s01e02.avi']:
+        open(os.path.join(tmp, name), "w").close()
+    return tmp
+
+
+def _files(location):
+    found = []
+    for walkroot, walkdirs, walkfiles in os.walk(location):
+        found.extend(os.path.relpath(os.path.join(walkroot, f), location) for f in walkfiles)
+    return sorted(found)
+
+
+def _plan(tmp):
+    return [
+        PlannedOperation.fromPaths(
+            os.path.join(tmp, 'scrubs.s01e01.avi'),
+            os.path.join(tmp, 'Scrubs - [01x01].avi'),
+            os.path.join(tmp, 'tv', 'Scrubs - [01x01].avi')),
+        PlannedOperation.fromPaths(
+            os.path.join(tmp, 'scrubs.s01e02.avi'),
+            os.path.join(tmp, 'Scrubs - [01x02].avi'),
+            os.path.join(tmp, 'Scrubs - [01x02].avi')),
+    ]
+
+
+def test_execute_and_undo():
+    """Executing a plan then undoing it restores the original files
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        plan = _plan(tmp)
+        assertEquals([op.operation for op in plan], ['move', 'rename'])
+
+        executePlan(plan, journal)
+        assertEquals(_files(tmp), ['Scrubs - [01x02].avi', 'journal.jsonl', 'tv/Scrubs - [01x01].avi'])
+        assertEquals([state for op, state in journal.operations()], ['done', 'done'])
+
+        undoJournal(journal)
+        assertEquals(_files(tmp), ['journal.jsonl', 'scrubs.s01e01.avi', 'scrubs.s01e02.avi'])
+        assertEquals([state for op, state in journal.operations()], ['undone', 'undone'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_resume_interrupted():
+    """Resuming a journal finishes operations interrupted after the rename
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        plan = _plan(tmp)
+        journal.recordPlan(plan)
+
+        # Simulate dying after the first file was renamed, before it was moved
+        os.rename(plan[0].source, plan[0].intermediate)
+        journal.record(plan[0], 'renamed')
+
+        resumeJournal(journal)
+        assertEquals(_files(tmp), ['Scrubs - [01x02].avi', 'journal.jsonl', 'tv/Scrubs - [01x01].avi'])
+        assertEquals([state for op, state in journal.operations()], ['done', 'done'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_truncated_journal():
+    """An incomplete final line (crash while writing) is ignored
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        journal.recordPlan(_plan(tmp))
+        f = open(journal.path, "a")
+        f.write('{"id": 0, "sta')
+        f.close()
+
+        assertEquals([state for op, state in journal.operations()], ['planned', 'planned'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_resume_truncated_journal():
+    """Entries written after a crash while writing do not continue the
+    incomplete line, so the journal can be resumed again, and undone
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        plan = _plan(tmp)
+        journal.recordPlan(plan)
+        os.rename(plan[0].source, plan[0].intermediate)
+        journal.record(plan[0], 'renamed')
+        f = open(journal.path, "a")
+        f.write('{"id": 0, "sta')
+        f.close()
+
+        resumeJournal(Journal(journal.path))
+        resumeJournal(Journal(journal.path))
+        assertEquals(_files(tmp), ['Scrubs - [01x02].avi', 'journal.jsonl', 'tv/Scrubs - [01x01].avi'])
+        assertEquals([state for op, state in journal.operations()], ['done', 'done'])
+
+        undoJournal(Journal(journal.path))
+        assertEquals(_files(tmp), ['journal.jsonl', 'scrubs.s01e01.avi', 'scrubs.s01e02.avi'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_undo_leaves_existing_destination():
+    """A move which failed because its destination already existed is
+    undone by reversing the rename only, leaving that file alone
+    """
+    tmp = _setup()
+    try:
+        os.mkdir(os.path.join(tmp, 'tv'))
+        f = open(os.path.join(tmp, 'tv', 'Scrubs - [01x01].avi'), "w")
+        f.write("someone else's")
+        f.close()
+
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        plan = _plan(tmp)[:1]
+        executePlan(plan, journal)
+        assertEquals([state for op, state in journal.operations()], ['failed'])
+
+        undoJournal(journal)
+        assertEquals(_files(tmp), ['journal.jsonl', 'scrubs.s01e01.avi', 'scrubs.s01e02.avi', 'tv/Scrubs - [01x01].avi'])
+        assertEquals(open(os.path.join(tmp, 'tv', 'Scrubs - [01x01].avi')).read(), "someone else's")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_schedule_by_device():
+    """Operations crossing devices are grouped by device pair, others
+    are kept for the serial path
+    """
+    import tvnamer.renameplan
+
+    devices = {'/a/src': 1, '/a/dst': 1, '/b/src': 2, '/c/dst': 3}
+
+    orig = tvnamer.renameplan._deviceOf, tvnamer.renameplan._existingParent
+    tvnamer.renameplan._deviceOf = lambda path: devices[path if path in devices else os.path.dirname(path)]
+    tvnamer.renameplan._existingParent = os.path.dirname
+    try:
+        plan = [
+            PlannedOperation('/a/src/1.avi', '/a/src/1.avi', '/a/dst/1.avi', 'move'),
+            PlannedOperation('/b/src/2.avi', '/b/src/2.avi', '/c/dst/2.avi', 'copy'),
+            PlannedOperation('/a/src/3.avi', '/a/src/3.avi', '/c/dst/3.avi', 'copy'),
+            PlannedOperation('/b/src/4.avi', '/b/src/4.avi', '/c/dst/4.avi', 'copy'),
+        ]
+        serial, groups = tvnamer.renameplan.scheduleByDevice(plan, NullJournal())
+    finally:
+        tvnamer.renameplan._deviceOf, tvnamer.renameplan._existingParent = orig
+
+    assertEquals([op.source for op in serial], ['/a/src/1.avi'])
+    assertEquals(sorted(groups.keys()), [(1, 3), (2, 3)])
+    assertEquals([op.source for op in groups[(2, 3)]], ['/b/src/2.avi', '/b/src/4.avi'])
+
+
+def test_execute_with_workers():
+    """Executing with per-device workers produces the same result
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        executePlan(_plan(tmp), journal, workers_per_device = 2)
+        assertEquals(_files(tmp), ['Scrubs - [01x02].avi', 'journal.jsonl', 'tv/Scrubs - [01x01].avi'])
+        assertEquals([state for op, state in journal.operations()], ['done', 'done'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_execute_with_workers_missing_file():
+    """A file removed after the plan was made is recorded as failed,
+    and the other operations still run
+    """
+    tmp = _setup()
+    try:
+        journal = Journal(os.path.join(tmp, 'journal.jsonl'))
+        plan = _plan(tmp)
+        os.unlink(plan[0].source)
+        executePlan(plan, journal, workers_per_device = 2)
+        assertEquals(_files(tmp), ['Scrubs - [01x02].avi', 'journal.jsonl'])
+        assertEquals([state for op, state in journal.operations()], ['failed', 'done'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_find_and_resolve_collisions():
+    """Existing targets and duplicate targets are found before executing,
+    and can be resolved by adding a suffix
+    """
+    tmp = _setup()
+    try:
+        open(os.path.join(tmp, 'Scrubs - [01x01].avi'), "w").close()
+        open(os.path.join(tmp, 'scrubs.s01e03.avi'), "w").close()
+        plan = [
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'scrubs.s01e01.avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi')),
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'scrubs.s01e02.avi'),
+                os.path.join(tmp, 'Scrubs - [01x02].avi'),
+                os.path.join(tmp, 'Scrubs - [01x02].avi')),
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'scrubs.s01e03.avi'),
+                os.path.join(tmp, 'Scrubs - [01x02].avi'),
+                os.path.join(tmp, 'Scrubs - [01x02].avi')),
+        ]
+
+        collisions = findCollisions(plan)
+        assertEquals([(op.source, reason) for op, path, reason in collisions], [
+            (os.path.join(tmp, 'scrubs.s01e01.avi'), 'file already exists'),
+            (os.path.join(tmp, 'scrubs.s01e03.avi'), 'also the target of %s' % os.path.join(tmp, 'scrubs.s01e02.avi'))])
+
+        resolveCollisions(plan, collisions)
+        assertEquals(findCollisions(plan), [])
+        assertEquals([os.path.basename(op.destination) for op in plan], [
+            'Scrubs - [01x01] (2).avi', 'Scrubs - [01x02].avi', 'Scrubs - [01x02] (2).avi'])
+
+        executePlan(plan, Journal(os.path.join(tmp, 'journal.jsonl')))
+        assertEquals(_files(tmp), [
+            'Scrubs - [01x01] (2).avi', 'Scrubs - [01x01].avi', 'Scrubs - [01x02] (2).avi',
+            'Scrubs - [01x02].avi', 'journal.jsonl'])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_collisions_with_vacated_paths():
+    """Paths which earlier operations move files away from are free
+    """
+    tmp = _setup()
+    try:
+        open(os.path.join(tmp, 'Scrubs - [01x01].avi'), "w").close()
+        plan = [
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'Scrubs - [01x01].avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi'),
+                os.path.join(tmp, 'tv', 'Scrubs - [01x01].avi')),
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'scrubs.s01e01.avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi')),
+        ]
+        assertEquals(findCollisions(plan), [])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_resolve_collisions_stable():
+    """A file given a suffix by an earlier run keeps it, and a move
+    colliding once the rename has a suffix is resolved too
+    """
+    tmp = _setup()
+    try:
+        os.mkdir(os.path.join(tmp, 'tv'))
+        for name in ['Scrubs - [01x01].avi', 'Scrubs - [01x01] (2).avi', 'Scrubs - [01x02].avi',
+                     os.path.join('tv', 'Scrubs - [01x02].avi')]:
+            open(os.path.join(tmp, name), "w").close()
+        plan = [
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'Scrubs - [01x01] (2).avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi'),
+                os.path.join(tmp, 'Scrubs - [01x01].avi')),
+            PlannedOperation.fromPaths(
+                os.path.join(tmp, 'scrubs.s01e02.avi'),
+                os.path.join(tmp, 'Scrubs - [01x02].avi'),
+                os.path.join(tmp, 'tv', 'Scrubs - [01x02].avi')),
+        ]
+
+        resolveCollisions(plan, findCollisions(plan))
+        assertEquals(findCollisions(plan), [])
+        assertEquals(plan[0].operation, 'none')
+        assertEquals(plan[0].destination, os.path.join(tmp, 'Scrubs - [01x01] (2).avi'))
+        assertEquals(plan[1].intermediate, os.path.join(tmp, 'Scrubs - [01x02] (2).avi'))
+        assertEquals(plan[1].destination, os.path.join(tmp, 'tv', 'Scrubs - [01x02] (2).avi'))
+    finally:
+        shutil.rmtree(tmp)
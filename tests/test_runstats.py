@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""Tests the end of run report
+"""
+
+import os
+import shutil
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.utils import Renamer, FileFinder
+from tvnamer.runstats import RunStats, Stats, formatReport, formatSize, writePrometheus
+from tvnamer.tvnamer_exceptions import ShowNotFound
+
+
+class _FakeClock(object):
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_stage_times():
+    """Time is recorded per stage and per file
+    """
+    clock = _FakeClock()
+    stats = RunStats(clock = clock)
+
+    with stats.timed('parsing', path = "/a.avi"):
+        clock.now += 1
+    with stats.timed('lookup', path = "/a.avi"):
+        clock.now += 2
+    with stats.timed('lookup', path = "/b.avi"):
+        clock.now += 0.5
+    stats.cache('series', 1, 1)
+
+    report = stats.report(slowest = 1)
+    assertEquals(report['wall_time'], 3.5)
+    assertEquals(report['stages']['lookup'], {'calls': 2, 'seconds': 2.5})
+    assertEquals(report['slowest_files'], [{'path': "/a.avi", 'seconds': 3.0}])
+
+    lines = formatReport(report)
+    assertEquals(lines[0], "# Run report, 3.50s wall time")
+    assertEquals("#   series cache: 1/2 hits (50%)" in lines, True)
+
+
+def test_bytes_renamed():
+    """Renamed files and their size are counted
+    """
+    location = tempfile.mkdtemp()
+    try:
+        path = os.path.join(location, "a.avi")
+        f = open(path, "wb")
+        f.write(b"x" * 1536)
+        f.close()
+
+        Stats.reset()
+        Renamer(path).newPath(new_fullpath = os.path.join(location, "b.avi"))
+        report = Stats.report()
+        assertEquals(report['counters'], {'files_renamed': 1, 'bytes_renamed': 1536, 'renames': 1})
+        assertEquals(report['stages']['filesystem']['calls'], 1)
+        assertEquals(formatSize(1536), "1.5 KB")
+    finally:
+        shutil.rmtree(location)
+
+
+def test_discovery_not_per_file():
+    """Time listing directories is only recorded for the stage, not as a
+    file in the slowest files and histograms
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        open(os.path.join(tmp, "scrubs.s01e01.avi"), "w").close()
+        Stats.reset()
+        FileFinder(tmp).findFiles()
+        report = Stats.report()
+        assertEquals(report['stages']['discovery']['calls'], 1)
+        assertEquals(report['slowest_files'], [])
+        assertEquals(report['histograms'], {})
+    finally:
+        shutil.rmtree(tmp)
+        Stats.reset()
+
+
+def test_prometheus_textfile():
+    """Counters, skipped files and latency histograms are written in the
+    Prometheus text format, without leaving temporary files behind
+    """
+    stats = RunStats(clock = _FakeClock())
+    stats.count('files_found', 3)
+    stats.skip(ShowNotFound("no show"))
+    stats.skip(ShowNotFound("no show"))
+    stats.add('lookup', 0.002, path = "/a.avi")
+    stats.add('lookup', 45, path = "/b.avi")
+    stats.add('prefetch', 1)
+
+    location = tempfile.mkdtemp()
+    try:
+        path = os.path.join(location, "tvnamer.prom")
+        writePrometheus(stats.report(), path)
+        assertEquals(os.listdir(location), ["tvnamer.prom"])
+        lines = open(path).read().splitlines()
+    finally:
+        shutil.rmtree(location)
+
+    assertEquals("tvnamer_files_found_total 3" in lines, True)
+    assertEquals("tvnamer_files_renamed_total 0" in lines, True)
+    assertEquals('tvnamer_files_skipped_total{error="ShowNotFound"} 2' in lines, True)
+    assertEquals('tvnamer_stage_file_seconds_bucket{stage="lookup",le="0.001"} 0' in lines, True)
+    assertEquals('tvnamer_stage_file_seconds_bucket{stage="lookup",le="0.005"} 1' in lines, True)
+    assertEquals('tvnamer_stage_file_seconds_bucket{stage="lookup",le="30"} 1' in lines, True)
+    assertEquals('tvnamer_stage_file_seconds_bucket{stage="lookup",le="+Inf"} 2' in lines, True)
+    assertEquals('tvnamer_stage_file_seconds_count{stage="lookup"} 2' in lines, True)
+
+    # Stages not about a single file have no histogram
+    assertEquals([x for x in lines if 'prefetch' in x], [])
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""Tests the scan index used to skip unchanged directories and files
+"""
+
+import os
+import shutil
+import datetime
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.utils import (FileFinder, FileParser, EpisodeInfo, DatedEpisodeInfo,
+outputTemplateRegex, parseOutputFilename)
+from tvnamer.scanindex import ScanIndex, episodeToDict, episodeFromDict
+from tvnamer.main import useCachedNames
+
+
+def _touch(location, name):
+    path = os.path.join(location, name)
+    open(path, "w").close()
+    return path
+
+
+def _settle(*paths):
+    """Sets the mtime of each directory a minute back, so listings of it
+    are kept
+    """
+    for path in paths:
+        st = os.stat(path)
+        os.utime(path, (st.st_atime, st.st_mtime - 60))
+
+
+def _find(location, index):
+    return sorted(FileFinder(location, recursive = True, index = index).findFiles())
+
+
+def test_unchanged_directories_not_listed():
+    """A second scan reuses listings of directories with the same mtime
+    """
+    location = tempfile.mkdtemp()
+    # Kept outside the scanned directory, as saving it changes the mtime
+    index_dir = tempfile.mkdtemp()
+    try:
+        os.mkdir(os.path.join(location, "sub"))
+        _touch(location, "scrubs.s01e01.avi")
+        _touch(os.path.join(location, "sub"), "scrubs.s01e02.avi")
+        _settle(location, os.path.join(location, "sub"))
+        index_path = os.path.join(index_dir, "index.json")
+
+        index = ScanIndex(index_path)
+        first = _find(location, index)
+        assertEquals(index.dirs_listed, 2)
+        index.save()
+
+        index = ScanIndex(index_path)
+        assertEquals(_find(location, index), first)
+        assertEquals(index.dirs_listed, 0)
+        assertEquals(index.dirs_skipped, 2)
+    finally:
+        shutil.rmtree(location)
+        shutil.rmtree(index_dir)
+
+
+def test_recently_changed_directory_not_kept():
+    """Listings of directories modified within the timestamp resolution
+    are not kept, so a file added within it is not missed
+    """
+    location = tempfile.mkdtemp()
+    index_dir = tempfile.mkdtemp()
+    try:
+        _touch(location, "scrubs.s01e01.avi")
+        index = ScanIndex(os.path.join(index_dir, "index.json"))
+        _find(location, index)
+        assertEquals(os.path.abspath(location) in index.dirs, False)
+
+        _touch(location, "scrubs.s01e02.avi")
+        assertEquals(len(_find(location, index)), 2)
+        assertEquals(index.dirs_listed, 2)
+    finally:
+        shutil.rmtree(location)
+        shutil.rmtree(index_dir)
+
+
+def test_changed_directory_listed_again():
+    """New files are found, and parse results of removed files dropped
+    """
+    location = tempfile.mkdtemp()
+    try:
+        old = _touch(location, "scrubs.s01e01.avi")
+        _settle(location)
+        index = ScanIndex(os.path.join(location, "index.json"))
+        _find(location, index)
+        index.parse(FileParser(old))
+
+        os.rename(old, os.path.join(location, "scrubs.s01e03.avi"))
+        # Ensure the mtime differs on filesystems with coarse timestamps
+        st = os.stat(location)
+        os.utime(location, (st.st_atime, st.st_mtime + 10))
+
+        found = _find(location, index)
+        assertEquals([os.path.basename(x) for x in found], ["scrubs.s01e03.avi"])
+        assertEquals(os.path.abspath(old) in index.parsed, False)
+    finally:
+        shutil.rmtree(location)
+
+
+def test_parse_results_reused():
+    """Saved parse results are reused until the parsing config changes
+    """
+    location = tempfile.mkdtemp()
+    try:
+        path = _touch(location, "scrubs.s01e01.avi")
+        index_path = os.path.join(location, "index.json")
+
+        index = ScanIndex(index_path)
+        first = index.parse(FileParser(path))
+        index.save()
+
+        index = ScanIndex(index_path)
+        second = index.parse(FileParser(path))
+        assertEquals(index.files_parsed, 0)
+        assertEquals(index.files_skipped, 1)
+        assertEquals(second.seriesname, first.seriesname)
+        assertEquals(second.seasonnumber, 1)
+        assertEquals(second.episodenumbers, [1])
+        assertEquals(second.fullpath, first.fullpath)
+
+        index.fingerprint = "different"
+        index.save()
+        index = ScanIndex(index_path)
+        assertEquals(index.parsed, {})
+    finally:
+        shutil.rmtree(location)
+
+
+def test_dated_episode_round_trip():
+    """Dates survive serialisation
+    """
+    ep = DatedEpisodeInfo(
+        seriesname = "The Colbert Report",
+        episodenumbers = [datetime.date(2010, 1, 2)],
+        filename = "/tmp/colbert.report.2010.01.02.avi")
+    data = episodeToDict(ep)
+    restored = episodeFromDict(data, ep.fullpath)
+    assertEquals(type(restored), DatedEpisodeInfo)
+    assertEquals(restored.episodenumbers, [datetime.date(2010, 1, 2)])
+
+
+def test_output_template_regex():
+    """Output templates are turned back into regexes
+    """
+    regex = outputTemplateRegex("%(seriesname)s - [%(seasonnumber)02dx%(episode)s] - %(episodename)s%(ext)s")
+    match = regex.match("Scrubs - [01x02] - My Mentor.avi")
+    assertEquals(match.group("seriesname"), "Scrubs")
+    assertEquals(match.group("seasonnumber"), "01")
+    assertEquals(match.group("episode"), "02")
+    assertEquals(match.group("episodename"), "My Mentor")
+    assertEquals(regex.match("scrubs.s01e02.avi"), None)
+
+    ep = EpisodeInfo("Scrubs", 1, [2], filename = "/tmp/Scrubs - [01x02].avi")
+    assertEquals(parseOutputFilename(ep)["seriesname"], "Scrubs")
+
+
+def test_correct_filename_uses_stored_names():
+    """Files matching the output format and the names stored by an
+    earlier lookup are recognised as correct
+    """
+    index_dir = tempfile.mkdtemp()
+    try:
+        index = ScanIndex(os.path.join(index_dir, "index.json"))
+        found = EpisodeInfo("Scrubs", 1, [2], episodename = ["My Mentor"])
+        index.storeNames(found)
+
+        ep = FileParser("/tmp/Scrubs - [01x02] - My Mentor.avi").parse()
+        assertEquals(useCachedNames(index, ep), True)
+        assertEquals(ep.episodename, ["My Mentor"])
+
+        # Name differs from the stored one, so must be looked up
+        wrong = FileParser("/tmp/Scrubs - [01x02] - Wrong Name.avi").parse()
+        assertEquals(useCachedNames(index, wrong), False)
+        assertEquals(wrong.episodename, None)
+
+        # Not in the output format
+        other = FileParser("/tmp/scrubs.s01e02.avi").parse()
+        assertEquals(useCachedNames(index, other), False)
+    finally:
+        shutil.rmtree(index_dir)
@@ -3,15 +3,18 @@
 """Tests custom replacements on input/output files
 """
 
-from functional_runner import run_tvnamer, verify_out_data
-from helpers import attr
+from functional_runner import run_tvnamer_inprocess, verify_out_data
+from helpers import assertEquals
+
+from tvnamer.config import Config
+from tvnamer.utils import resolveSeriesName
+import tvnamer.utils
 
 
-@attr("functional")
 def test_replace_input():
     """Tests replacing strings in input files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['scruuuuuubs.s01e01.avi'],
         with_config = """
 {
@@ -27,12 +30,11 @@ def test_replace_input():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replace_input_with_id():
     """Map from a series name to a numberic TVDB ID
     """
 
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['seriesnamegoeshere.s01e01.avi'],
         with_config = """
 {
@@ -48,11 +50,10 @@ def test_replace_input_with_id():
     verify_out_data(out_data, expected_files)
 
 
-@attr("functional")
 def test_replace_output():
     """Tests replacing strings in input files
     """
-    out_data = run_tvnamer(
+    out_data = run_tvnamer_inprocess(
         with_files = ['Scrubs.s01e01.avi'],
         with_config = """
 {
@@ -66,3 +67,20 @@ def test_replace_output():
     expected_files = ['Replacement Series Name - [01x01] - My First Day.avi']
 
     verify_out_data(out_data, expected_files)
+
+
+def test_resolve_series_name_memo():
+    """Resolved series names are memoised until the replacements change
+    """
+    saved = Config['input_series_replacements']
+    try:
+        Config['input_series_replacements'] = {"scru*bs": "scrubs"}
+        assertEquals(resolveSeriesName("scruuubs"), "scrubs")
+        assertEquals(resolveSeriesName("the.wire"), "the wire")
+        assertEquals(tvnamer.utils._series_name_memo["scruuubs"], "scrubs")
+
+        Config['input_series_replacements'] = {"the wire": 79126}
+        assertEquals(resolveSeriesName("the.wire"), 79126)
+        assertEquals(resolveSeriesName("scruuubs"), "scruuubs")
+    finally:
+        Config['input_series_replacements'] = saved
@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+
+"""Tests the rename service (--serve) and its client
+"""
+
+import os
+import json
+import stat
+import shutil
+import tempfile
+import threading
+
+from helpers import assertEquals
+
+from tvnamer.config import Config
+from tvnamer.main import renameRequest, serveRequests
+from tvnamer.providers import FixtureProvider
+from tvnamer.server import serve, parseRequest
+from tvnamer.client import parseAddress, request, rename, UnixHTTPConnection
+
+from functional_runner import FAKE_SERIES
+
+
+class _Server(object):
+    """Runs serve in a thread, on a Unix socket in a temporary directory
+    """
+
+    def __init__(self, handler):
+        self.location = tempfile.mkdtemp()
+        self.address = os.path.join(self.location, "tvnamer.sock")
+        self.started = threading.Event()
+        self.thread = threading.Thread(target = serve, args = (self.address, handler), kwargs = {'ready': self._ready})
+        self.thread.start()
+        self.started.wait(10)
+
+    def _ready(self, server):
+        self.server = server
+        self.started.set()
+
+    def stop(self):
+        self.server.shutdown()
+        self.thread.join()
+        assertEquals(os.path.exists(self.address), False)
+        shutil.rmtree(self.location)
+
+
+def test_parse_address():
+    assertEquals(parseAddress("/run/tvnamer.sock"), "/run/tvnamer.sock")
+    assertEquals(parseAddress("8785"), ("127.0.0.1", 8785))
+    assertEquals(parseAddress("localhost:8785"), ("localhost", 8785))
+    assertEquals(parseAddress("~/tvnamer.sock"), os.path.expanduser("~/tvnamer.sock"))
+    try:
+        parseAddress("localhost")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("ValueError not raised")
+
+
+def test_parse_request():
+    assertEquals(
+        parseRequest(b'{"paths": ["/tv/a.avi"], "force_name": "Scrubs"}'),
+        (["/tv/a.avi"], {"force_name": "Scrubs"}))
+
+    for invalid in [b'[]', b'{"paths": []}', b'{"paths": ["a.avi"]}',
+                    b'{"paths": ["/tv/a.avi"], "move_files_destination": "/"}',
+                    b'{"paths": ["/tv/a.avi"], "series_id": 1}', b'{']:
+        try:
+            parseRequest(invalid)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("%r accepted" % invalid)
+
+
+def test_requests_queued():
+    """Requests are processed one at a time, in order, and a failing
+    request does not stop the service
+    """
+    running = []
+    seen = []
+
+    def handler(paths, overrides):
+        running.append(1)
+        assertEquals(len(running), 1)
+        seen.append(paths[0])
+        running.pop()
+        if paths[0] == "/fail":
+            raise RuntimeError("failed")
+        return {'events': [], 'error': None}
+
+    server = _Server(handler)
+    try:
+        threads = [threading.Thread(target = rename, args = (server.address, ["/%d" % i])) for i in range(5)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assertEquals(sorted(seen), ["/%d" % i for i in range(5)])
+
+        assertEquals(rename(server.address, ["/fail"]), (200, {'events': [], 'error': "RuntimeError: failed"}))
+        assertEquals(request(server.address, "GET", "/status"), (200, {'processed': 6, 'queued': 0}))
+        assertEquals(stat.S_IMODE(os.stat(server.address).st_mode), 0o600)
+        assertEquals(request(server.address, "POST", "/rename", {'paths': ["relative"]})[0], 400)
+        assertEquals(request(server.address, "GET", "/nothing")[0], 404)
+    finally:
+        server.stop()
+
+
+def _post(address, headers):
+    connection = UnixHTTPConnection(address)
+    try:
+        connection.request("POST", "/rename", json.dumps({'paths': ["/a.avi"]}), headers)
+        return connection.getresponse().status
+    finally:
+        connection.close()
+
+
+def test_rejected_requests():
+    """Requests which are not JSON, or come from a web page, are not
+    processed
+    """
+    seen = []
+
+    def handler(paths, overrides):
+        seen.append(paths)
+        return {'events': [], 'error': None}
+
+    server = _Server(handler)
+    try:
+        assertEquals(_post(server.address, {'Content-Type': "text/plain"}), 415)
+        assertEquals(_post(server.address, {}), 415)
+        assertEquals(_post(server.address, {'Content-Type': "application/json", 'Origin': "http://example.com"}), 403)
+        assertEquals(seen, [])
+        assertEquals(_post(server.address, {'Content-Type': "application/json; charset=utf-8"}), 200)
+        assertEquals(seen, [["/a.avi"]])
+    finally:
+        server.stop()
+
+
+def test_rename_request():
+    """Files are renamed, with the overrides only applying to their
+    request
+    """
+    location = tempfile.mkdtemp()
+    saved = dict(Config)
+    provider = FixtureProvider(FAKE_SERIES)
+    server = _Server(lambda paths, overrides: renameRequest(provider, paths, overrides))
+    try:
+        Config['batch'] = Config['always_rename'] = Config['select_first'] = True
+        Config['force_name'] = Config['series_id'] = None
+        for name in ["scrubs.s01e01.avi", "earl.s01e01.avi"]:
+            open(os.path.join(location, name), "w").close()
+
+        status, response = rename(server.address, [os.path.join(location, "earl.s01e01.avi")], force_name = "My Name Is Earl")
+        assertEquals((status, response['error']), (200, None))
+        assertEquals([x['event'] for x in response['events'] if x['event'] != "warning"], ["discovered", "parsed", "resolved", "renamed"])
+        assertEquals(Config['force_name'], None)
+
+        status, response = rename(server.address, [os.path.join(location, "scrubs.s01e01.avi")])
+        assertEquals(response['events'][-1]['new_path'], os.path.join(location, "Scrubs - [01x01] - My First Day.avi"))
+
+        assertEquals(sorted(os.listdir(location)), [
+            "My Name Is Earl - [01x01] - Pilot.avi",
+            "Scrubs - [01x01] - My First Day.avi"])
+
+        status, response = rename(server.address, [os.path.join(location, "missing.avi")])
+        assertEquals(response['error'], "No valid files were supplied")
+    finally:
+        server.stop()
+        Config.clear()
+        Config.update(saved)
+        shutil.rmtree(location)
+
+
+def test_status_per_request():
+    """/status reports the statistics of the last request only
+    """
+    location = tempfile.mkdtemp()
+    saved = dict(Config)
+    started = threading.Event()
+    servers = []
+
+    def ready(server):
+        servers.append(server)
+        started.set()
+
+    try:
+        fixture = os.path.join(location, "fixture.json")
+        json.dump({'series': FAKE_SERIES}, open(fixture, "w"))
+        Config['metadata_fixture'] = fixture
+        Config['batch'] = Config['always_rename'] = Config['select_first'] = True
+        Config['force_name'] = Config['series_id'] = None
+        for name in ["scrubs.s01e01.avi", "scrubs.s01e02.avi"]:
+            open(os.path.join(location, name), "w").close()
+
+        address = os.path.join(location, "tvnamer.sock")
+        thread = threading.Thread(target = serveRequests, args = (address, ready))
+        thread.start()
+        started.wait(10)
+        try:
+            for name in ["scrubs.s01e01.avi", "scrubs.s01e02.avi"]:
+                rename(address, [os.path.join(location, name)])
+                status, response = request(address, "GET", "/status")
+                report = response['last_request']
+                assertEquals(report['counters']['files_renamed'], 1)
+                assertEquals([x['path'] for x in report['slowest_files']], [os.path.join(location, name)])
+        finally:
+            servers[0].shutdown()
+            thread.join()
+    finally:
+        Config.clear()
+        Config.update(saved)
+        shutil.rmtree(location)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""Tests checking files against the CRC32 in anime filenames
+"""
+
+import os
+import shutil
+import zlib
+import tempfile
+
+from helpers import assertEquals
+
+import tvnamer.utils
+from tvnamer.utils import Renamer, copy_file
+from tvnamer.verify import parseCrc, crc32File, verifyFiles
+
+
+DATA = b"some episode data" * 1000
+DATA_CRC = zlib.crc32(DATA) & 0xffffffff
+
+
+def _make(location, name, data = DATA):
+    path = os.path.join(location, name)
+    f = open(path, "wb")
+    f.write(data)
+    f.close()
+    return path
+
+
+def test_parse_crc():
+    """Only 8 hex digit values are treated as a CRC
+    """
+    assertEquals(parseCrc("3811CBB5"), 0x3811CBB5)
+    assertEquals(parseCrc("3811cbb5"), 0x3811CBB5)
+    assertEquals(parseCrc("720p"), None)
+    assertEquals(parseCrc(None), None)
+
+
+def test_crc32file():
+    """crc32File matches zlib.crc32, including for empty files
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        assertEquals(crc32File(_make(tmp, "a.avi")), DATA_CRC)
+        assertEquals(crc32File(_make(tmp, "empty.avi", b"")), 0)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_verify_files():
+    """verifyFiles counts files not matching the CRC in their name
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = [
+            _make(tmp, "[Group] Show - 01 [%08X].mkv" % DATA_CRC),
+            _make(tmp, "[Group] Show - 02 [00000000].mkv"),
+            _make(tmp, "show.s01e01.avi")]
+        assertEquals(verifyFiles(paths, workers = 2), 1)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_verify_unreadable_file():
+    """Files which cannot be read are counted as failed, and the other
+    files still checked
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        paths = [
+            _make(tmp, "[Group] Show - 01 [%08X].mkv" % DATA_CRC),
+            os.path.join(tmp, "[Group] Show - 02 [%08X].mkv" % DATA_CRC)]
+        assertEquals(verifyFiles(paths, workers = 2), 1)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_copy_computes_crc():
+    """copy_file calculates the CRC while copying
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        src = _make(tmp, "a.avi")
+        assertEquals(copy_file(src, os.path.join(tmp, "b.avi"), compute_crc = True), DATA_CRC)
+        assertEquals(open(os.path.join(tmp, "b.avi"), "rb").read(), DATA)
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_crc_mismatch_keeps_original():
+    """A cross-partition move with a mismatching CRC does not delete the
+    original, and removes the bad copy
+    """
+    tmp = tempfile.mkdtemp()
+    orig_same_partition = tvnamer.utils.same_partition
+    tvnamer.utils.same_partition = lambda f1, f2: False
+    try:
+        src = _make(tmp, "a.avi")
+        try:
+            Renamer(src).newPath(new_path = "dest", always_move = True, verify_crc = True, expected_crc = 0x12345678)
+        except OSError:
+            pass
+        else:
+            raise AssertionError("Expected OSError")
+        assert os.path.isfile(src)
+        assert not os.path.exists(os.path.join(tmp, "dest", "a.avi"))
+
+        Renamer(src).newPath(new_path = "dest2", always_move = True, verify_crc = True, expected_crc = DATA_CRC)
+        assert not os.path.isfile(src)
+        assert os.path.isfile(os.path.join(tmp, "dest2", "a.avi"))
+    finally:
+        tvnamer.utils.same_partition = orig_same_partition
+        shutil.rmtree(tmp)
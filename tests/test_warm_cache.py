@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+
+"""Tests loading series into the cache with --warm-cache
+"""
+
+import os
+import json
+import shutil
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.config import Config
+from tvnamer.main import warmCache
+
+from test_providers import SERIES
+
+
+def test_warm_cache():
+    """Series are found from names, ids and filenames, and failures
+    counted
+    """
+    location = tempfile.mkdtemp()
+    saved = dict(Config)
+    try:
+        fixture = os.path.join(location, "fixture.json")
+        json.dump({"series": SERIES}, open(fixture, "w"))
+        os.mkdir(os.path.join(location, "files"))
+        open(os.path.join(location, "files", "scrubs.s01e01.avi"), "w").close()
+
+        Config['metadata_fixture'] = fixture
+        Config['force_name'] = None
+
+        failed = warmCache([os.path.join(location, "files"), "Scrubs", "76156", "Nothing"])
+        assertEquals(failed, 1)
+    finally:
+        Config.clear()
+        Config.update(saved)
+        shutil.rmtree(location)
+
+
+def test_warm_cache_series_id_replacement():
+    """Filenames whose series name is replaced by an id are loaded by id
+    """
+    location = tempfile.mkdtemp()
+    saved = dict(Config)
+    try:
+        fixture = os.path.join(location, "fixture.json")
+        json.dump({"series": SERIES}, open(fixture, "w"))
+        open(os.path.join(location, "scrubs.s01e01.avi"), "w").close()
+
+        Config['metadata_fixture'] = fixture
+        Config['force_name'] = None
+        Config['input_series_replacements'] = {'scrubs': 76156}
+
+        failed = warmCache([os.path.join(location, "scrubs.s01e01.avi")])
+        assertEquals(failed, 0)
+    finally:
+        Config.clear()
+        Config.update(saved)
+        shutil.rmtree(location)
@@ -0,0 +1,134 @@
+#!/usr/bin/env python
+
+"""Tests watching directories for new files
+"""
+
+import os
+import shutil
+import tempfile
+
+from helpers import assertEquals
+
+from tvnamer.watcher import Debouncer, PollingWatcher, InotifyWatcher, watch
+
+
+def _write(path, data):
+    f = open(path, "a")
+    f.write(data)
+    f.close()
+
+
+def test_debouncer():
+    """Files are only ready once they have stopped changing for the delay
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        now = [0]
+        path = os.path.join(tmp, "show.s01e01.avi")
+        _write(path, "abc")
+
+        debouncer = Debouncer(5, clock = lambda: now[0])
+        debouncer.add(path)
+        assertEquals(debouncer.ready(), [])
+
+        now[0] = 3
+        _write(path, "def")
+        os.utime(path, (100, 100))
+        assertEquals(debouncer.ready(), [])
+
+        now[0] = 7
+        assertEquals(debouncer.ready(), [])
+
+        now[0] = 8
+        assertEquals(debouncer.ready(), [path])
+        assertEquals(debouncer.pending, {})
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_debouncer_removed_file():
+    """Files removed while pending are dropped
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "show.s01e01.avi")
+        _write(path, "abc")
+        debouncer = Debouncer(0)
+        debouncer.add(path)
+        os.unlink(path)
+        assertEquals(debouncer.ready(), [])
+        assertEquals(debouncer.pending, {})
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_polling_watcher():
+    """Polling reports only files created after it started
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        _write(os.path.join(tmp, "existing.s01e01.avi"), "abc")
+        watcher = PollingWatcher([tmp], interval = 0)
+        assertEquals(watcher.read(timeout = 0), [])
+
+        _write(os.path.join(tmp, "new.s01e01.avi"), "abc")
+        assertEquals(watcher.read(timeout = 0), [os.path.join(tmp, "new.s01e01.avi")])
+    finally:
+        shutil.rmtree(tmp)
+
+
+def test_inotify_watcher():
+    """inotify reports files closed after writing, including in new
+    subdirectories when recursive
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        try:
+            watcher = InotifyWatcher([tmp], recursive = True)
+        except (OSError, AttributeError):
+            # Not on Linux
+            return
+
+        try:
+            _write(os.path.join(tmp, "new.s01e01.avi"), "abc")
+            os.mkdir(os.path.join(tmp, "sub"))
+            _write(os.path.join(tmp, "sub", "new.s01e02.avi"), "abc")
+
+            found = set()
+            for _ in range(5):
+                found.update(watcher.read(timeout = 0.2))
+            assertEquals(sorted(found), [
+                os.path.join(tmp, "new.s01e01.avi"),
+                os.path.join(tmp, "sub", "new.s01e02.avi")])
+        finally:
+            watcher.close()
+    finally:
+        shutil.rmtree(tmp)
+
+
+class _Stop(Exception):
+    pass
+
+
+def test_watch_existing():
+    """Files already in the directory are handled once they stop
+    changing, after the watcher has started
+    """
+    tmp = tempfile.mkdtemp()
+    try:
+        path = os.path.join(tmp, "existing.s01e01.avi")
+        _write(path, "abc")
+        watcher = PollingWatcher([tmp], interval = 0)
+        handled = []
+
+        def handler(files):
+            handled.append(files)
+            raise _Stop()
+
+        try:
+            watch([tmp], handler, delay = 0, watcher = watcher, existing = True)
+        except _Stop:
+            pass
+        assertEquals(handled, [[path]])
+    finally:
+        shutil.rmtree(tmp)
@@ -40,7 +40,14 @@ def getCommandlineParser(defaults):
     with Group(parser, "Console output") as g:
         g.add_option("-v", "--verbose", action="store_true", dest="verbose", help = "show debugging info")
         g.add_option("-q", "--not-verbose", action="store_false", dest="verbose", help = "no verbose output (useful to override 'verbose':true in config file)")
+        g.add_option("--quiet", action="store_true", dest="quiet", help = "Only show errors and the summary at the end of the run")
+        g.add_option("--progress", action="store_true", dest="progress", help = "Show a single line status on the terminal")
+        g.add_option("--output-format", action="store", type="choice", choices=["text", "jsonl"], dest="output_format", help = "'jsonl' writes one JSON object per file event to stdout instead of the usual output (requires --batch)")
         g.add_option("--dry-run", action="store_true", dest="dry_run", help = "Only tell what script is going to do")
+        g.add_option("--report", action="store", dest="report_path", help = "Write counts and timings of the run to this file as JSON")
+        g.add_option("--metrics-textfile", action="store", dest="metrics_textfile", help = "Write counters and timings of the run to this file for the Prometheus node_exporter textfile collector")
+        g.add_option("--profile", action="store", dest="profile_path", help = "Run under cProfile, writing the stats to this file (read with the pstats module)")
+        g.add_option("--plan-output", action="store", dest="plan_output", help = "Write the plan for all files as JSON lines to this file ('-' for stdout) without renaming anything, implies --batch")
 
     # Batch options
     with Group(parser, "Batch options") as g:
@@ -65,14 +72,37 @@ def getCommandlineParser(defaults):
         g.add_option("--series-id", action="store", dest = "series_id", help = "explicitly set the show id for TVdb to use (applies to all files)")
         g.add_option("--order", action = "store", dest = "order", help = "set the TvDB episode order ('aired' [default] or 'dvd')")
 
+    # Journal
+    with Group(parser, "Journal") as g:
+        g.add_option("--journal", action="store", dest = "journal_path", help = "Plan all renames/moves before starting, and record progress in this journal file")
+        g.add_option("--resume", action="store", dest = "resume_journal", help = "Finish the incomplete operations recorded in this journal file, then exit")
+        g.add_option("--undo", action="store", dest = "undo_journal", help = "Reverse the operations recorded in this journal file, then exit")
+
     # Misc
     with Group(parser, "Misc") as g:
         g.add_option("-r", "--recursive", action="store_true", dest = "recursive", help = "Descend more than one level directories supplied as arguments")
         g.add_option("--not-recursive", action="store_false", dest = "recursive", help = "Only descend one level into directories")
+        g.add_option("--scan-index", action="store", dest = "scan_index", help = "Cache directory listings and parsed filenames in this file, so later runs skip unchanged directories")
+        g.add_option("--always-lookup", action="store_false", dest = "reuse_names_for_correct_filenames", help = "With --scan-index, look up files even when already named correctly by a previous run")
+
+        g.add_option("--watch", action="store_true", dest = "watch", help = "Keep running, renaming files as they appear in the given directories (requires --batch or --always)")
+
+        g.add_option("--serve", action="store_true", dest = "serve", help = "Keep running, renaming the files sent with tvnamer-client to --server-address (implies --batch)")
+        g.add_option("--server-address", action="store", dest = "server_address", help = "Address to serve on: host:port, port, or the path of a Unix socket")
 
         g.add_option("-m", "--move", action="store_true", dest="move_files_enable", help = "Move files to destination specified in config or with --movedestination argument")
         g.add_option("--not-move", action="store_false", dest="move_files_enable", help = "Files will remain in current directory")
 
+        g.add_option("--metadata-fixture", action="store", dest = "metadata_fixture", help = "Look up names in this JSON file instead of thetvdb.com")
+        g.add_option("--lookup-workers", action="store", type="int", dest = "lookup_workers", help = "Number of concurrent requests to thetvdb.com when looking up several series (0 looks up one at a time)")
+        g.add_option("--lookup-rate", action="store", type="float", dest = "lookup_rate_limit", help = "Maximum number of series loaded from thetvdb.com per second (0 for no limit)")
+        g.add_option("--lookup-retries", action="store", type="int", dest = "lookup_retries", help = "Number of times to retry a failed series lookup")
+        g.add_option("--move-workers", action="store", type="int", dest = "move_workers_per_device", help = "Number of parallel workers per device pair when moving files between disks (0 moves one file at a time)")
+        g.add_option("--verify-copies", action="store_true", dest = "verify_crc_on_copy", help = "Check the CRC32 in anime filenames when copying between partitions, never deleting the original on a mismatch")
+        g.add_option("--warm-cache", action="store_true", dest = "warm_cache", help = "Only load the data for the given series names, ids, or the series of the given files into the cache, then exit")
+        g.add_option("--verify-crc", action="store_true", dest = "verify_crc", help = "Only check files against the CRC32 in their filenames, then exit")
+        g.add_option("--resolve-collisions", action="store_const", const="suffix", dest = "collision_resolution", help = "Add a number to new filenames which would collide with existing or other renamed files, instead of skipping them")
+        g.add_option("--pattern-timeout", action="store", type="float", dest = "pattern_match_timeout", help = "Skip files taking longer than this many seconds to match against a filename pattern (0 for no limit)")
         g.add_option("--force-move", action="store_true", dest = "overwrite_destination_on_move", help = "Force move and potentially overwrite existing files in destination folder")
         g.add_option("--force-rename", action="store_true", dest = "overwrite_destination_on_rename", help = "Force rename source file")
         
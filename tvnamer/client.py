@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+"""Thin client for a tvnamer server (started with tvnamer --serve)
+
+Sends the files to rename to the server, which has the config loaded and
+series data cached already, and prints the resulting events as JSON
+lines (as --output-format jsonl does). Only imports the standard
+library, so starts quickly when run for every completed download:
+
+    tvnamer-client --server /run/tvnamer.sock ~/downloads/scrubs.s01e01.avi
+"""
+
+import os
+import sys
+import json
+import socket
+import optparse
+
+try:
+    import httplib
+except ImportError:
+    import http.client as httplib
+
+
+# Same as the server_address default in config_defaults
+DEFAULT_ADDRESS = "~/.tvnamer.sock"
+
+
+def parseAddress(address):
+    """Returns the path of a Unix socket (with ~ expanded) for addresses
+    containing a "/", otherwise (host, port) for "host:port" or "port"
+    (on 127.0.0.1)
+
+    >>> parseAddress("/run/tvnamer.sock")
+    '/run/tvnamer.sock'
+    >>> parseAddress("8785")
+    ('127.0.0.1', 8785)
+    """
+    if "/" in address:
+        return os.path.expanduser(address)
+    host, _, port = address.rpartition(":")
+    if not port.isdigit():
+        raise ValueError("Invalid server address %r, expected host:port, port, or a socket path" % address)
+    return (host or "127.0.0.1", int(port))
+
+
+class UnixHTTPConnection(httplib.HTTPConnection):
+    """HTTPConnection to a server listening on a Unix socket
+    """
+
+    def __init__(self, path, timeout = None):
+        httplib.HTTPConnection.__init__(self, "localhost")
+        self.socket_path = path
+        self.socket_timeout = timeout
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.socket_timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(address, method, path, body = None, timeout = None):
+    """Sends a request to the server at address, body is JSON encoded if
+    not None. Returns (HTTP status, decoded JSON response)
+    """
+    target = parseAddress(address)
+    if isinstance(target, tuple):
+        connection = httplib.HTTPConnection(target[0], target[1], timeout = timeout)
+    else:
+        connection = UnixHTTPConnection(target, timeout = timeout)
+
+    headers = {}
+    if body is not None:
+        body = json.dumps(body).encode("utf-8")
+        headers['Content-Type'] = "application/json"
+
+    try:
+        connection.request(method, path, body, headers)
+        response = connection.getresponse()
+        data = response.read()
+    finally:
+        connection.close()
+    return response.status, json.loads(data.decode("utf-8"))
+
+
+def rename(address, paths, force_name = None, series_id = None, timeout = None):
+    """Asks the server at address to rename paths (made absolute, as the
+    server may run elsewhere). Returns (HTTP status, response)
+    """
+    body = {'paths': [os.path.abspath(x) for x in paths]}
+    if force_name is not None:
+        body['force_name'] = force_name
+    if series_id is not None:
+        body['series_id'] = series_id
+    return request(address, "POST", "/rename", body, timeout = timeout)
+
+
+def main():
+    """Renames the files given on the command line with a tvnamer server.
+    Exits with 1 if any file was skipped, or 2 if the server could not be
+    reached or rejected the request
+    """
+    opter = optparse.OptionParser(usage = "%prog [options] <files>")
+    opter.add_option("--server", action = "store", dest = "address", default = DEFAULT_ADDRESS, help = "Address of the server: host:port, port, or the path of a Unix socket (default %default)")
+    opter.add_option("-n", "--name", action = "store", dest = "force_name", help = "override the parsed series name with this (applies to all files)")
+    opter.add_option("--series-id", action = "store", dest = "series_id", help = "explicitly set the show id for TVdb to use (applies to all files)")
+    opter.add_option("--status", action = "store_true", dest = "status", help = "Show the server's queue length and counters, then exit")
+    opter.add_option("--timeout", action = "store", type = "float", dest = "timeout", help = "Give up waiting for the server after this many seconds")
+    opts, args = opter.parse_args()
+
+    if not opts.status and len(args) == 0:
+        opter.error("No filenames or directories supplied")
+
+    try:
+        if opts.status:
+            status, response = request(opts.address, "GET", "/status", timeout = opts.timeout)
+        else:
+            status, response = rename(
+                opts.address, args,
+                force_name = opts.force_name,
+                series_id = opts.series_id,
+                timeout = opts.timeout)
+    except ValueError as e:
+        opter.error(e)
+    except (socket.error, httplib.HTTPException) as e:
+        sys.stderr.write("Could not reach tvnamer server at %s: %s\n" % (opts.address, e))
+        sys.exit(2)
+
+    if status != 200:
+        sys.stderr.write("Server error: %s\n" % response.get('error'))
+        sys.exit(2)
+
+    if opts.status:
+        print(json.dumps(response, sort_keys = True, indent = 2))
+        return
+
+    for event in response['events']:
+        sys.stdout.write(json.dumps(event, sort_keys = True) + "\n")
+
+    if response.get('error') is not None:
+        sys.stderr.write("%s\n" % response['error'])
+        sys.exit(1)
+    if any(x['event'] == "skipped" for x in response['events']):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
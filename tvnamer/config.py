@@ -1,8 +1,150 @@
 #!/usr/bin/env python
 
-"""Holds Config singleton
+"""Holds Config singleton, and read-only snapshots of it
+
+Config is the global, mutable dict of the merged config file and command
+line values. The parsing and naming code reads a ConfigSnapshot instead,
+passed explicitly (so pipelines with different configs can run in one
+process), or the snapshot of Config from configSnapshot(). Values
+derived from a snapshot, such as compiled patterns, are worked out once
+per snapshot with ConfigSnapshot.derived
 """
 
+import copy
+import threading
+
+from tvnamer.compat import all_string_types
 from tvnamer.config_defaults import defaults
+from tvnamer.tvnamer_exceptions import ConfigValueError
+
+
+class _VersionedConfig(dict):
+    """dict counting changes, so snapshots are only rebuilt when needed.
+    Values must be replaced, not modified in place, for the change to
+    be seen
+    """
+
+    version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._changed()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default = None):
+        self._changed()
+        return dict.setdefault(self, key, default)
+
+
+Config = _VersionedConfig(defaults)
+
+
+# Values which must be of these types, when set
+_STRING_KEYS = [
+    'extension_pattern', 'episode_single', 'episode_separator',
+    'multiep_join_name_with', 'multiep_format', 'replace_invalid_characters_with',
+    'filename_with_episode', 'filename_without_episode',
+    'filename_with_episode_no_season', 'filename_without_episode_no_season',
+    'filename_with_date_and_episode', 'filename_with_date_without_episode',
+    'filename_anime_with_episode', 'filename_anime_without_episode',
+    'filename_anime_with_episode_without_crc', 'filename_anime_without_episode_without_crc']
+
+_REPLACEMENT_KEYS = [
+    'input_filename_replacements', 'output_filename_replacements',
+    'move_files_fullpath_replacements']
+
+_MAPPING_KEYS = ['input_series_replacements', 'output_series_replacements']
+
+
+def validateConfig(values):
+    """Raises ConfigValueError if the values the parsing and naming code
+    relies on have the wrong type
+    """
+    patterns = values.get('filename_patterns')
+    if patterns is not None and (not isinstance(patterns, list) or not all(isinstance(x, all_string_types) for x in patterns)):
+        raise ConfigValueError("filename_patterns must be a list of strings")
+
+    for key in _STRING_KEYS:
+        if values.get(key) is not None and not isinstance(values[key], all_string_types):
+            raise ConfigValueError("%s must be a string, not %r" % (key, values[key]))
+
+    for key in _REPLACEMENT_KEYS:
+        for rep in values.get(key) or []:
+            if not isinstance(rep, dict) or 'match' not in rep or 'replacement' not in rep:
+                raise ConfigValueError("Each of %s must have 'match' and 'replacement' values, not %r" % (key, rep))
+
+    for key in _MAPPING_KEYS:
+        if values.get(key) is not None and not isinstance(values[key], dict):
+            raise ConfigValueError("%s must be a mapping, not %r" % (key, values[key]))
+
+
+def _readOnly(self, *args, **kwargs):
+    raise TypeError("ConfigSnapshot is read-only")
+
+
+class ConfigSnapshot(dict):
+    """Read-only copy of config values, validated with validateConfig.
+    A dict, so values are looked up as quickly as from Config
+    """
+
+    def __init__(self, values):
+        validateConfig(values)
+        dict.__init__(self, copy.deepcopy(dict(values)))
+        self._derived = {}
+
+    __setitem__ = __delitem__ = update = clear = pop = popitem = setdefault = _readOnly
+
+    def derived(self, build):
+        """Returns build(self), only calling build the first time it is
+        needed for this snapshot
+        """
+        try:
+            return self._derived[build]
+        except KeyError:
+            value = self._derived[build] = build(self)
+            return value
+
+    def __repr__(self):
+        return "<ConfigSnapshot of %d values>" % len(self)
+
+
+# Version of Config the last snapshot was made from, and the snapshot
+_snapshot = (None, None)
+_snapshot_lock = threading.Lock()
+
 
-Config = dict(defaults)
+def configSnapshot():
+    """Returns a ConfigSnapshot of Config, only made again after Config
+    changes
+    """
+    global _snapshot
+    version, snapshot = _snapshot
+    if version == Config.version:
+        return snapshot
+    with _snapshot_lock:
+        version = Config.version
+        snapshot = ConfigSnapshot(Config)
+        _snapshot = (version, snapshot)
+    return snapshot
@@ -92,6 +92,86 @@ defaults = {
     # Search in all possible languages
     'search_all_languages': True,
 
+    # In --watch mode, seconds a new file's size and modification time
+    # must stay the same before it is renamed (so files still being
+    # written are left alone)
+    'watch_debounce': 5,
+
+    # In --watch mode, seconds between directory listings when inotify
+    # is not available
+    'watch_poll_interval': 10,
+
+    # Address the --serve mode listens on, and tvnamer-client sends
+    # requests to: the path of a Unix socket, "host:port", or "port" (on
+    # 127.0.0.1). The server has no authentication: the socket can only
+    # be used by the user running the server, but any local user can
+    # connect to a port
+    'server_address': '~/.tvnamer.sock',
+
+    # Path of a file to store directory listings and parse results in.
+    # Later runs only list directories whose modification time changed,
+    # and only parse new files, which speeds up scans of large libraries
+    'scan_index': None,
+
+    # With scan_index, files whose name matches the output format and the
+    # episode names stored by a previous run are treated as correct
+    # without looking them up on www.thetvdb.com again (so names changed
+    # on thetvdb.com since are not noticed for these files)
+    'reuse_names_for_correct_filenames': True,
+
+    # Path of a JSON file to look up series and episode names in, instead
+    # of www.thetvdb.com. See tvnamer.providers.FixtureProvider for the
+    # format. Mostly useful for testing and benchmarks without network
+    # access
+    'metadata_fixture': None,
+
+    # Maximum average number of series loaded from www.thetvdb.com per
+    # second (0 for no limit), and how many may be loaded at once before
+    # the limit applies. Shared by all lookups, including concurrent ones
+    'lookup_rate_limit': 0,
+    'lookup_rate_burst': 5,
+
+    # Number of times to retry loading a series after a connection or
+    # server error, waiting a random time up to lookup_retry_delay
+    # seconds, doubling for each retry (up to 30 seconds)
+    'lookup_retries': 2,
+    'lookup_retry_delay': 1,
+
+    # Number of concurrent requests to www.thetvdb.com. When above 0 (and
+    # series are not selected interactively), all series are looked up
+    # before processing files, over a pool of kept-alive connections.
+    # Concurrent requests for the same data share one request. Python 3
+    # only
+    'lookup_workers': 0,
+
+    # Path to write the end of run report (time per stage, bytes copied
+    # and renamed, cache hit rates, slowest files) to as JSON. The report
+    # is always printed to stderr
+    'report_path': None,
+
+    # Only show errors and the summary at the end of the run
+    'quiet': False,
+
+    # Show a single line status (files done of total) on stderr, when it
+    # is a terminal
+    'progress': False,
+
+    # "text" for the usual output, or "jsonl" to write one JSON object
+    # per line for each file event (discovered, parsed, resolved,
+    # unchanged, renamed, moved, skipped) and warning to stdout, flushed
+    # as each happens, followed by a summary. Requires batch mode.
+    # Errors and the run report are still written to stderr
+    'output_format': 'text',
+
+    # Number of slowest files listed in the end of run report
+    'report_slowest': 5,
+
+    # Path to write counters and per-file stage latency histograms of
+    # each run to, in the Prometheus text format. Point it at a file
+    # ending in .prom in the node_exporter textfile collector directory.
+    # The file is replaced atomically at the end of the run
+    'metrics_textfile': None,
+
     # Move renamed files to directory?
     'move_files_enable': False,
 
@@ -143,9 +223,46 @@ defaults = {
     # after the original file.
     'leave_symlink': False,
 
+    # When a file is copied to a different partition, calculate its CRC32
+    # during the copy and check it against the CRC in the filename (for
+    # anime filenames such as "[Group] Show - 01 [ABCD1234].mkv"). If the
+    # CRC or size of the copy does not match, the original is never
+    # deleted (even when always_move is True)
+    'verify_crc_on_copy': False,
+
+    # Number of files checked in parallel by --verify-crc
+    'verify_crc_workers': 4,
+
     # Allow user to copy files to specified move location without renaming files.
     'move_files_only': False,
 
+    # When set, batch runs first build the complete rename/move plan for
+    # all files, write it to this journal file (one JSON object per line)
+    # and record each step as it completes. An interrupted run can then be
+    # finished with --resume, or reversed with --undo. Requires always_rename
+    'journal_path': None,
+
+    # Before any file is renamed in a batch run, tvnamer checks for
+    # targets which already exist, or which several files would be renamed
+    # to. By default those files are skipped (or the run exits, depending
+    # on skip_behaviour). If set to "suffix", a number is added to the new
+    # name instead, for example "Show - [01x01] - Name (2).avi"
+    'collision_resolution': None,
+
+    # Number of worker threads per (source device, destination device)
+    # pair used to move files in batch runs. Files being moved between
+    # different disks are grouped by device pair, so copies to several
+    # independent disks run in parallel, while files staying on the same
+    # device are renamed one at a time. 0 moves every file in turn.
+    'move_workers_per_device': 0,
+
+    # Seconds matching one filename against one of filename_patterns may
+    # take before the file is skipped, so a pattern which backtracks
+    # badly on a long filename cannot stall a batch run. 0 disables the
+    # limit. Only available on Unix, in the main thread. Patterns which
+    # may backtrack badly are also warned about when the config is loaded
+    'pattern_match_timeout': 0,
+
     # Patterns to parse input filenames with
     'filename_patterns': [
         # [group] Show - 01-02 [crc]
@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+
+"""Stream of file events for --output-format jsonl
+
+Each event is written as one JSON object per line, and flushed straight
+away so consumers can act on a file while the run continues:
+
+{"event": "renamed", "path": "/tv/scrubs.s01e01.avi", "new_path": "/tv/Scrubs - [01x01] - My First Day.avi", "time": 1300000000.0}
+
+Events are "discovered", "parsed", "resolved", "unchanged", "renamed",
+"moved", "skipped" (with the class name of the exception as "error"),
+"warning" and "summary" (with the end of run report)
+
+capturedEvents collects the events instead, such as for the results of
+each --serve request
+"""
+
+import sys
+import json
+import time
+import threading
+import contextlib
+
+
+class _Events(object):
+    def __init__(self):
+        self.enabled = False
+
+        # Stream events are written to, sys.stdout at the time of each
+        # event if None
+        self.stream = None
+        self.lock = threading.Lock()
+
+
+_events = _Events()
+
+
+def enableEvents(stream = None):
+    """Writes events to stream (stdout at the time of each event if None)
+    """
+    _events.enabled = True
+    _events.stream = stream
+
+
+def disableEvents():
+    _events.enabled = False
+    _events.stream = None
+
+
+def eventsEnabled():
+    return _events.enabled
+
+
+def emit(event, **fields):
+    """Writes an event, if enabled. Values which are not JSON types (such
+    as dates) are written as strings
+    """
+    if not _events.enabled:
+        return
+    fields['event'] = event
+    fields['time'] = time.time()
+    line = json.dumps(fields, sort_keys = True, default = str) + "\n"
+    with _events.lock:
+        stream = _events.stream if _events.stream is not None else sys.stdout
+        stream.write(line)
+        stream.flush()
+
+
+def emitSkipped(path, error):
+    """Emits a "skipped" event for a file skipped because of error, an
+    exception instance
+    """
+    emit("skipped", path = path, error = error.__class__.__name__, message = str(error))
+
+
+class _EventList(object):
+    """Stream keeping each event written to it, as a dict
+    """
+
+    def __init__(self):
+        self.events = []
+
+    def write(self, line):
+        self.events.append(json.loads(line))
+
+    def flush(self):
+        pass
+
+
+@contextlib.contextmanager
+def capturedEvents():
+    """Context manager collecting the events emitted inside it in a list
+    (which it yields) instead of writing them. Events are enabled or
+    disabled as before afterwards
+    """
+    saved = _events.enabled, _events.stream
+    collected = _EventList()
+    enableEvents(collected)
+    try:
+        yield collected.events
+    finally:
+        _events.enabled, _events.stream = saved
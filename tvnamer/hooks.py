@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+"""Callbacks run at the start and end of each stage of processing
+
+Stages are "discovery" (findFiles), "parsing" (FileParser.parse),
+"lookup" (EpisodeInfo.populateFromTvdb), "naming"
+(EpisodeInfo.generateFilename), "filesystem" (Renamer.newPath) and
+"prefetch" (prefetchSeries). Start callbacks are called with the stage
+name and the file path (None for stages not about a single file), end
+callbacks also with the number of seconds the stage took:
+
+>>> def end(name, path, seconds):
+...     print("%s %s" % (name, path))
+>>> hook = addHook(end = end)
+>>> with stage("parsing", "/tv/scrubs.s01e01.avi"):
+...     pass
+parsing /tv/scrubs.s01e01.avi
+>>> removeHook(hook)
+"""
+
+import time
+import functools
+import contextlib
+
+
+# Tuple of (start, end) callbacks, replaced rather than modified so it
+# can be read from several threads without locking
+_hooks = ()
+
+
+def addHook(start = None, end = None):
+    """Registers callbacks, returns a handle for removeHook
+    """
+    global _hooks
+    hook = (start, end)
+    _hooks = _hooks + (hook, )
+    return hook
+
+
+def removeHook(hook):
+    global _hooks
+    _hooks = tuple(x for x in _hooks if x is not hook)
+
+
+@contextlib.contextmanager
+def stage(name, path = None):
+    """Context manager calling the hooks around a stage
+    """
+    hooks = _hooks
+    if not hooks:
+        yield
+        return
+
+    for start, end in hooks:
+        if start is not None:
+            start(name, path)
+    started = time.time()
+    try:
+        yield
+    finally:
+        seconds = time.time() - started
+        for start, end in hooks:
+            if end is not None:
+                end(name, path, seconds)
+
+
+def staged(name, path_attribute = None):
+    """Decorator for methods, running them inside stage(name), with the
+    path taken from path_attribute of the instance
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            if not _hooks:
+                return func(self, *args, **kwargs)
+            path = getattr(self, path_attribute) if path_attribute is not None else None
+            with stage(name, path):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
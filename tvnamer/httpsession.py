@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+
+"""HTTP session used for concurrent www.thetvdb.com lookups
+
+Wraps the requests session tvdb_api uses (Python 3 only), keeping a pool
+of keep-alive connections, limiting how many requests are in flight at
+once, and coalescing identical concurrent requests so several lookups of
+the same series share one response.
+"""
+
+import threading
+import logging
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+class _InFlight(object):
+    """A request being made by one thread, which others are waiting on
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class CoalescingSession(object):
+    """Wraps a requests.Session (or requests_cache.CachedSession), and is
+    used in its place via tvdb_api.Tvdb's cache argument or session
+    attribute.
+
+    At most max_in_flight requests are made at once, over a pool of as many
+    kept-alive connections. A GET for a URL which is already being
+    requested waits for, and returns, the same response. Other attributes
+    (such as the cache of a CachedSession) are those of the wrapped session
+    """
+
+    def __init__(self, session = None, max_in_flight = 4):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        if session is None:
+            session = requests.Session()
+        self.session = session
+
+        adapter = HTTPAdapter(pool_connections = max_in_flight, pool_maxsize = max_in_flight)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._lock = threading.Lock()
+        self._in_flight = {}
+
+        self.requests_made = 0
+        self.requests_coalesced = 0
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def _get(self, url, **kwargs):
+        with self._slots:
+            with self._lock:
+                self.requests_made += 1
+            log().debug("Requesting %s" % url)
+            resp = self.session.get(url, **kwargs)
+            # Read the body before releasing the connection, so the
+            # response can be shared between threads
+            resp.content
+            return resp
+
+    def get(self, url, **kwargs):
+        if kwargs:
+            # Only plain GETs are known to be identical
+            return self._get(url, **kwargs)
+
+        with self._lock:
+            pending = self._in_flight.get(url)
+            leader = pending is None
+            if leader:
+                pending = self._in_flight[url] = _InFlight()
+            else:
+                self.requests_coalesced += 1
+
+        if not leader:
+            log().debug("Waiting for request already in flight: %s" % url)
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.response
+
+        try:
+            pending.response = self._get(url)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+            pending.done.set()
+        return pending.response
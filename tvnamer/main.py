@@ -5,8 +5,12 @@
 
 import os
 import sys
+import time
+import socket
+import cProfile
 import logging
 import warnings
+from multiprocessing.pool import ThreadPool
 
 try:
     import readline
@@ -21,17 +25,31 @@ except ImportError:
 from tvdb_api import Tvdb
 
 from tvnamer import cliarg_parser
-from tvnamer.compat import PY2, raw_input
+from tvnamer.compat import PY2, raw_input, string_type
 from tvnamer.config_defaults import defaults
 
-from tvnamer.unicode_helper import p
+from tvnamer.unicode_helper import p, setQuiet, redirectOutput, flushOutput, bufferedOutput, ProgressLine
+from tvnamer.verify import episodeCrc, verifyFiles
+from tvnamer.watcher import watch
+from tvnamer.scanindex import ScanIndex
+from tvnamer.httpsession import CoalescingSession
+from tvnamer.providers import TvdbProvider, FixtureProvider, ThrottledProvider, seriesKey
+from tvnamer.ratelimit import TokenBucket
+from tvnamer.runstats import Stats, formatReport, writePrometheus
+from tvnamer.hooks import stage
+from tvnamer.regexcheck import checkConfigPatterns
+from tvnamer.events import emit, emitSkipped, enableEvents, capturedEvents
+from tvnamer.server import serve
+from tvnamer.renameplan import (PlannedOperation, Journal, NullJournal,
+executePlan, resumeJournal, undoJournal, findCollisions, resolveCollisions)
+from tvnamer.config import configSnapshot
 from tvnamer.utils import (Config, FileFinder, FileParser, Renamer, warn,
 applyCustomInputReplacements, formatEpisodeNumbers, makeValidFilename,
-DatedEpisodeInfo, NoSeasonEpisodeInfo)
+DatedEpisodeInfo, NoSeasonEpisodeInfo, parseOutputFilename)
 
 from tvnamer.tvnamer_exceptions import (ShowNotFound, SeasonNotFound, EpisodeNotFound,
 EpisodeNameNotFound, UserAbort, InvalidPath, NoValidFilesFoundError, SkipBehaviourAbort,
-InvalidFilename, DataRetrievalError)
+InvalidFilename, DataRetrievalError, JournalError, ConfigValueError, PathCollision)
 
 
 def log():
@@ -43,42 +61,49 @@ def log():
 def getMoveDestination(episode):
     """Constructs the location to move/copy the file
     """
+    config = episode.config
+    if config is None:
+        config = configSnapshot()
+
+    def validfname(fname):
+        return makeValidFilename(
+            fname,
+            normalize_unicode = config['normalize_unicode_filenames'],
+            windows_safe = config['windows_safe_filenames'],
+            custom_blacklist = config['custom_filename_character_blacklist'],
+            replace_with = config['replace_invalid_characters_with'],
+            config = config)
 
     #TODO: Write functional test to ensure this valid'ifying works
     def wrap_validfname(fname):
         """Wrap the makeValidFilename function as it's called twice
         and this is slightly long..
         """
-        if Config['move_files_lowercase_destination']:
+        if config['move_files_lowercase_destination']:
             fname = fname.lower()
-        return makeValidFilename(
-            fname,
-            normalize_unicode = Config['normalize_unicode_filenames'],
-            windows_safe = Config['windows_safe_filenames'],
-            custom_blacklist = Config['custom_filename_character_blacklist'],
-            replace_with = Config['replace_invalid_characters_with'])
+        return validfname(fname)
 
 
     # Calls makeValidFilename on series name, as it must valid for a filename
     if isinstance(episode, DatedEpisodeInfo):
-        destdir = Config['move_files_destination_date'] % {
-            'seriesname': makeValidFilename(episode.seriesname),
+        destdir = config['move_files_destination_date'] % {
+            'seriesname': validfname(episode.seriesname),
             'year': episode.episodenumbers[0].year,
             'month': episode.episodenumbers[0].month,
             'day': episode.episodenumbers[0].day,
             'originalfilename': episode.originalfilename,
             }
     elif isinstance(episode, NoSeasonEpisodeInfo):
-        destdir = Config['move_files_destination'] % {
+        destdir = config['move_files_destination'] % {
             'seriesname': wrap_validfname(episode.seriesname),
-            'episodenumbers': wrap_validfname(formatEpisodeNumbers(episode.episodenumbers)),
+            'episodenumbers': wrap_validfname(formatEpisodeNumbers(episode.episodenumbers, config)),
             'originalfilename': episode.originalfilename,
             }
     else:
-        destdir = Config['move_files_destination'] % {
+        destdir = config['move_files_destination'] % {
             'seriesname': wrap_validfname(episode.seriesname),
             'seasonnumber': episode.seasonnumber,
-            'episodenumbers': wrap_validfname(formatEpisodeNumbers(episode.episodenumbers)),
+            'episodenumbers': wrap_validfname(formatEpisodeNumbers(episode.episodenumbers, config)),
             'originalfilename': episode.originalfilename,
             }
     return destdir
@@ -88,17 +113,23 @@ def doRenameFile(cnamer, newName):
     """Renames the file. cnamer should be Renamer instance,
     newName should be string containing new filename.
     """
+    old_fullpath = cnamer.filename
     try:
         cnamer.newPath(new_fullpath = newName, force = Config['overwrite_destination_on_rename'], leave_symlink = Config['leave_symlink'])
     except OSError as e:
+        Stats.skip(e)
+        emitSkipped(old_fullpath, e)
         if Config['skip_behaviour'] == 'exit':
             warn("Exiting due to error: %s" % e)
             raise SkipBehaviourAbort()
         warn("Skipping file due to error: %s" % e)
+    else:
+        emit("renamed", path = old_fullpath, new_path = cnamer.filename)
 
 
-def doMoveFile(cnamer, destDir = None, destFilepath = None, getPathPreview = False):
-    """Moves file to destDir, or to destFilepath
+def doMoveFile(cnamer, destDir = None, destFilepath = None, getPathPreview = False, expectedCrc = None):
+    """Moves file to destDir, or to destFilepath. expectedCrc is the CRC32
+    parsed from the filename, checked if verify_crc_on_copy is enabled
     """
 
     if (destDir is None and destFilepath is None) or (destDir is not None and destFilepath is not None):
@@ -110,20 +141,29 @@ def doMoveFile(cnamer, destDir = None, destFilepath = None, getPathPreview = Fal
     if Config['move_files_destination'] is None:
         raise ValueError("Config value for move_files_destination cannot be None if move_files_enabled is True")
 
+    old_fullpath = cnamer.filename
     try:
-        return cnamer.newPath(
+        new_fullpath = cnamer.newPath(
             new_path = destDir,
             new_fullpath = destFilepath,
             always_move = Config['always_move'],
             leave_symlink = Config['leave_symlink'],
             getPathPreview = getPathPreview,
-            force = Config['overwrite_destination_on_move'])
+            force = Config['overwrite_destination_on_move'],
+            verify_crc = Config['verify_crc_on_copy'],
+            expected_crc = expectedCrc)
 
     except OSError as e:
+        Stats.skip(e)
+        emitSkipped(old_fullpath, e)
         if Config['skip_behaviour'] == 'exit':
             warn("Exiting due to error: %s" % e)
             raise SkipBehaviourAbort()
         warn("Skipping file due to error: %s" % e)
+    else:
+        if getPathPreview:
+            return new_fullpath
+        emit("moved", path = old_fullpath, new_path = cnamer.filename)
 
 
 def confirm(question, options, default = "y"):
@@ -140,6 +180,7 @@ def confirm(question, options, default = "y"):
             options_str.append(x)
     options_str = "/".join(options_str)
 
+    flushOutput()
     while True:
         p(question)
         p("(%s) " % (options_str), end="")
@@ -155,8 +196,46 @@ def confirm(question, options, default = "y"):
             return default
 
 
-def processFile(tvdb_instance, episode):
-    """Gets episode name, prompts user for input
+def useCachedNames(index, episode):
+    """Fast path for files tvnamer has already named: if the filename
+    parses back through the output templates, and regenerating it from
+    the names stored in the scan index gives the same filename, the file
+    is correct and www.thetvdb.com does not need to be queried.
+
+    Sets the names on episode and returns True if so, otherwise leaves
+    episode untouched and returns False
+    """
+    fields = parseOutputFilename(episode)
+    if fields is None or not fields.get('seriesname'):
+        return False
+
+    names = index.cachedNames(episode, fields['seriesname'])
+    if names is None:
+        return False
+
+    original = (episode.seriesname, episode.episodename)
+    episode.seriesname, episode.episodename = fields['seriesname'], names
+    if episode.generateFilename() != episode.fullfilename:
+        episode.seriesname, episode.episodename = original
+        return False
+    return True
+
+
+def emitResolved(episode):
+    """Emits a "resolved" event with the names found for episode
+    """
+    emit("resolved",
+        path = episode.fullpath,
+        seriesname = episode.seriesname,
+        episodename = episode.episodename)
+
+
+def populateEpisode(provider, episode, index = None):
+    """Prints the detected details of the episode, and gets the episode
+    name. Returns False if the file should be skipped.
+
+    If index is a ScanIndex, names found are stored in it, and files
+    already named correctly are recognised without a lookup
     """
     p("#" * 20)
     p("# Processing file: %s" % episode.fullfilename)
@@ -172,29 +251,52 @@ def processFile(tvdb_instance, episode):
 
     p("# Detected series: %s (%s)" % (episode.seriesname, episode.number_string()))
 
+    if index is not None and Config['reuse_names_for_correct_filenames'] and useCachedNames(index, episode):
+        p("# Filename matches stored episode names, skipping lookup")
+        index.lookups_skipped += 1
+        emitResolved(episode)
+        return True
+
     try:
-        episode.populateFromTvdb(tvdb_instance, force_name=Config['force_name'], series_id=Config['series_id'])
+        episode.populateFromTvdb(provider, force_name=Config['force_name'], series_id=Config['series_id'])
     except (DataRetrievalError, ShowNotFound) as errormsg:
         if Config['always_rename'] and Config['skip_file_on_error'] is True:
+            Stats.skip(errormsg)
+            emitSkipped(episode.fullpath, errormsg)
             if Config['skip_behaviour'] == 'exit':
                 warn("Exiting due to error: %s" % errormsg)
                 raise SkipBehaviourAbort()
             warn("Skipping file due to error: %s" % errormsg)
-            return
+            return False
         else:
             warn(errormsg)
     except (SeasonNotFound, EpisodeNotFound, EpisodeNameNotFound) as errormsg:
         # Show was found, so use corrected series name
         if Config['always_rename'] and Config['skip_file_on_error']:
+            Stats.skip(errormsg)
+            emitSkipped(episode.fullpath, errormsg)
             if Config['skip_behaviour'] == 'exit':
                 warn("Exiting due to error: %s" % errormsg)
                 raise SkipBehaviourAbort()
             warn("Skipping file due to error: %s" % errormsg)
-            return
+            return False
 
         warn(errormsg)
+    else:
+        if index is not None:
+            index.storeNames(episode)
+
+    emitResolved(episode)
+    return True
+
+
+def processFile(provider, episode, index = None):
+    """Gets episode name, prompts user for input
+    """
+    if not populateEpisode(provider, episode, index = index):
+        return
 
-    cnamer = Renamer(episode.fullpath)
+    cnamer = Renamer(episode.fullpath, config = episode.config)
 
 
     shouldRename = False
@@ -210,6 +312,7 @@ def processFile(tvdb_instance, episode):
             p("#" * 20)
             p("Existing filename is correct: %s" % episode.fullfilename)
             p("#" * 20)
+            emit("unchanged", path = episode.fullpath)
 
             shouldRename = True
 
@@ -227,9 +330,9 @@ def processFile(tvdb_instance, episode):
                 doRenameFile(cnamer, newName)
                 if Config['move_files_enable']:
                     if Config['move_files_destination_is_filepath']:
-                        doMoveFile(cnamer = cnamer, destFilepath = getMoveDestination(episode))
+                        doMoveFile(cnamer = cnamer, destFilepath = getMoveDestination(episode), expectedCrc = episodeCrc(episode))
                     else:
-                        doMoveFile(cnamer = cnamer, destDir = getMoveDestination(episode))
+                        doMoveFile(cnamer = cnamer, destDir = getMoveDestination(episode), expectedCrc = episodeCrc(episode))
                 return
 
             elif Config['dry_run']:
@@ -276,14 +379,186 @@ def processFile(tvdb_instance, episode):
 
         if ans == 'y':
             p("Moving file")
-            doMoveFile(cnamer, newPath)
+            doMoveFile(cnamer, newPath, expectedCrc = episodeCrc(episode))
         elif ans == 'q':
             p("Quitting")
             raise UserAbort("user exited with q")
 
 
-def findFiles(paths):
-    """Takes an array of paths, returns all files found
+def planFile(provider, episode, index = None):
+    """Gets episode name, and works out where the file will be renamed
+    and moved to. Returns a PlannedOperation (with operation "none" if the
+    file is already correct), or None if the file was skipped
+    """
+    if not populateEpisode(provider, episode, index = index):
+        return
+
+    source = os.path.abspath(episode.fullpath)
+    cnamer = Renamer(source, config = episode.config)
+
+    if Config["move_files_only"]:
+        intermediate = source
+    else:
+        intermediate = cnamer.resolvePath(new_fullpath = episode.generateFilename())
+
+    if Config['move_files_enable']:
+        mover = Renamer(intermediate, config = episode.config)
+        if Config['move_files_destination_is_filepath']:
+            destination = mover.resolvePath(new_fullpath = getMoveDestination(episode))
+        else:
+            destination = mover.resolvePath(new_path = getMoveDestination(episode))
+    else:
+        destination = intermediate
+
+    op = PlannedOperation.fromPaths(source, intermediate, destination, crc = episodeCrc(episode))
+    if op.operation == "none":
+        p("Existing filename is correct: %s" % episode.fullfilename)
+        emit("unchanged", path = episode.fullpath)
+    else:
+        p("Planned %s: %s" % (op.operation, destination))
+    return op
+
+
+def processPlan(provider, episodes, index = None):
+    """Builds the complete plan for all episodes, then executes it,
+    recording progress in the journal
+    """
+    plan = []
+    for episode in eachEpisode(episodes):
+        op = planFile(provider, episode, index = index)
+        if op is not None and op.operation != "none":
+            plan.append(op)
+        p('')
+
+    p("#" * 20)
+    p("# Planned %d operation" % len(plan) + ("s" * (len(plan) != 1)))
+
+    plan = checkCollisions(plan)
+
+    if Config['dry_run']:
+        for op in plan:
+            p("%s will be renamed to %s" % (op.source, op.intermediate))
+            if op.destination != op.intermediate:
+                p("%s will be moved to %s" % (op.intermediate, op.destination))
+        return
+
+    if Config['journal_path'] is not None:
+        journal = Journal(Config['journal_path'])
+        p("# Writing journal: %s" % journal.path)
+    else:
+        journal = NullJournal()
+    executePlan(plan, journal, workers_per_device = Config['move_workers_per_device'])
+
+
+def processEpisodes(provider, episodes, index = None):
+    """Renames each episode. When files are renamed without asking, the
+    plan for all of them is built first (see processPlan), so collisions
+    are found before any file is touched. Otherwise each file is shown,
+    and confirmed, in turn
+    """
+    if Config['always_rename']:
+        processPlan(provider, episodes, index = index)
+        return
+
+    for episode in eachEpisode(episodes):
+        processFile(provider, episode, index = index)
+        p('')
+
+
+def writePlan(provider, episodes, output, index = None):
+    """Builds the plan for all episodes without touching any files, and
+    writes it to output as one JSON object per file. output is a path,
+    or "-" for stdout (in which case main() sends other messages to
+    stderr)
+    """
+    if output == "-":
+        planfile = sys.stdout
+    else:
+        planfile = open(os.path.expanduser(output), "w")
+
+    try:
+        planned = []
+        skipped = []
+        for episode in eachEpisode(episodes):
+            op = planFile(provider, episode, index = index)
+            if op is None:
+                skipped.append(os.path.abspath(episode.fullpath))
+            else:
+                planned.append((episode, op))
+
+        plan = [op for episode, op in planned]
+        collisions = findCollisions(plan)
+        reasons = dict((id(op), reason) for op, path, reason in collisions)
+        if Config['collision_resolution'] == 'suffix':
+            resolveCollisions(plan, collisions)
+
+        for episode, op in planned:
+            entry = op.as_dict()
+            del entry['id']
+            entry.update({
+                'seriesname': episode.seriesname,
+                'seasonnumber': getattr(episode, 'seasonnumber', None),
+                'episodenumbers': [string_type(x) for x in episode.episodenumbers],
+                'episodename': episode.episodename,
+                'collision': reasons.get(id(op))})
+            planfile.write(json.dumps(entry, sort_keys = True) + "\n")
+
+        for source in skipped:
+            planfile.write(json.dumps({'source': source, 'operation': 'skip'}, sort_keys = True) + "\n")
+
+        planfile.flush()
+    finally:
+        if output != "-":
+            planfile.close()
+
+    p("#" * 20, file = sys.stderr)
+    p("# Planned %d file" % len(plan) + ("s" * (len(plan) != 1)) +
+        ", %d collision" % len(collisions) + ("s" * (len(collisions) != 1)),
+        file = sys.stderr)
+
+
+def checkCollisions(plan):
+    """Reports operations in plan which would fail because their target
+    already exists (or is also the target of another operation), before
+    any file is touched. Returns the plan to execute, with collisions
+    either resolved (collision_resolution is "suffix") or removed. When
+    only the move collides, the file is still renamed, as it would be
+    if the move failed
+    """
+    collisions = findCollisions(plan)
+    if len(collisions) == 0:
+        return plan
+
+    if Config['collision_resolution'] == 'suffix':
+        resolveCollisions(plan, collisions)
+        return plan
+
+    for op, path, reason in collisions:
+        warn("Collision renaming %s to %s: %s" % (op.source, path, reason))
+
+    if Config['skip_behaviour'] == 'exit':
+        warn("Exiting due to %d collision%s, no files were renamed" % (
+            len(collisions), "s" * (len(collisions) != 1)))
+        raise SkipBehaviourAbort()
+
+    warn("Skipping %d colliding file%s" % (len(collisions), "s" * (len(collisions) != 1)))
+    colliding = set()
+    for op, path, reason in collisions:
+        error = PathCollision("Cannot rename %s to %s: %s" % (op.source, path, reason))
+        Stats.skip(error)
+        emitSkipped(op.source, error)
+        if path == op.destination and op.intermediate not in (op.source, op.destination):
+            # Only the move collides, the file is still renamed
+            op.destination = op.intermediate
+            op.operation = "rename"
+        else:
+            colliding.add(id(op))
+    return [op for op in plan if id(op) not in colliding]
+
+
+def findFiles(paths, index = None):
+    """Takes an array of paths, returns all files found. If index is a
+    ScanIndex, unchanged directories are not listed again
     """
     valid_files = []
 
@@ -292,7 +567,8 @@ def findFiles(paths):
             cfile,
             with_extension = Config['valid_extensions'],
             filename_blacklist = Config["filename_blacklist"],
-            recursive = Config['recursive'])
+            recursive = Config['recursive'],
+            index = index)
 
         try:
             valid_files.extend(cur.findFiles())
@@ -302,42 +578,63 @@ def findFiles(paths):
     if len(valid_files) == 0:
         raise NoValidFilesFoundError()
 
-    # Remove duplicate files (all paths from FileFinder are absolute)
-    valid_files = list(set(valid_files))
+    # Remove duplicate files (all paths from FileFinder are absolute),
+    # sorted so which of several colliding files is renamed does not
+    # change from run to run
+    valid_files = sorted(set(valid_files))
 
     return valid_files
 
 
-def tvnamer(paths):
-    """Main tvnamer function, takes an array of paths, does stuff.
+def parseFiles(files, index = None):
+    """Parses each file, returns list of EpisodeInfo instances for the
+    files which could be parsed. If index is a ScanIndex, files parsed
+    on a previous run are not parsed again
     """
-
-    p("#" * 20)
-    p("# Starting tvnamer")
-
     episodes_found = []
 
-    for cfile in findFiles(paths):
-        parser = FileParser(cfile)
+    # The same snapshot is used for all the files
+    config = configSnapshot()
+
+    for cfile in files:
+        parser = FileParser(cfile, config = config)
         try:
-            episode = parser.parse()
+            if index is None:
+                episode = parser.parse()
+            else:
+                episode = index.parse(parser)
+            if episode is None:
+                log().debug("Skipping %s, could not be parsed on a previous run" % cfile)
+                Stats.count('files_invalid')
+                continue
         except InvalidFilename as e:
             warn("Invalid filename: %s" % e)
+            Stats.count('files_invalid')
+            emitSkipped(cfile, e)
+            if index is not None:
+                index.markInvalid(cfile)
         else:
+            Stats.count('files_parsed')
+            emit("parsed",
+                path = cfile,
+                seriesname = episode.seriesname,
+                seasonnumber = getattr(episode, 'seasonnumber', None),
+                episodenumbers = episode.episodenumbers)
             if episode.seriesname is None and Config['force_name'] is None and Config['series_id'] is None:
                 warn("Parsed filename did not contain series name (and --name or --series-id not specified), skipping: %s" % cfile)
 
             else:
                 episodes_found.append(episode)
 
-    if len(episodes_found) == 0:
-        raise NoValidFilesFoundError()
-
-    p("# Found %d episode" % len(episodes_found) + ("s" * (len(episodes_found) > 1)))
-
     # Sort episodes by series name, season and episode number
     episodes_found.sort(key = lambda x: x.sortable_info())
 
+    return episodes_found
+
+
+def getTvdbInstance():
+    """Creates the Tvdb instance, configured from Config
+    """
     # episode sort order
     if Config['order'] == 'dvd':
         dvdorder = True
@@ -360,14 +657,329 @@ def tvnamer(paths):
         cache=cache,
     )
 
-    for episode in episodes_found:
-        processFile(tvdb_instance, episode)
-        p('')
+    if Config['lookup_workers'] > 0:
+        if PY2:
+            # tvdb_api only uses a requests session in Python 3
+            log().info("Concurrent lookups are not supported in Python 2")
+        else:
+            tvdb_instance.session = CoalescingSession(
+                tvdb_instance.session,
+                max_in_flight = Config['lookup_workers'])
+
+    return tvdb_instance
+
+
+def getProvider():
+    """Returns the MetadataProvider episode names are looked up with:
+    the metadata_fixture file if set, otherwise www.thetvdb.com
+    """
+    if Config['metadata_fixture'] is not None:
+        return FixtureProvider.fromFile(
+            os.path.expanduser(Config['metadata_fixture']),
+            interactive = not Config['select_first'])
+
+    if Config['lookup_rate_limit'] > 0:
+        bucket = TokenBucket(Config['lookup_rate_limit'], burst = Config['lookup_rate_burst'])
+    else:
+        bucket = None
+
+    return ThrottledProvider(
+        TvdbProvider(getTvdbInstance()),
+        bucket = bucket,
+        retries = Config['lookup_retries'],
+        retry_delay = Config['lookup_retry_delay'])
+
+
+def prefetchSeries(provider, episodes, index = None):
+    """Loads the data for each series in episodes concurrently (using
+    lookup_workers threads), so processing the files afterwards does not
+    wait on each series in turn. Errors are ignored here, and reported
+    when the file is processed.
+
+    Only used when series are selected without prompting
+    """
+    if Config['series_id'] is not None:
+        return
+
+    names = {}
+    for episode in episodes:
+        if index is not None and Config['reuse_names_for_correct_filenames'] and useCachedNames(index, episode):
+            continue
+        name = Config['force_name'] or episode.seriesname
+        names.setdefault(seriesKey(name), name)
+
+    if len(names) < 2:
+        return
+
+    def load(name):
+        try:
+            provider.getSeries(name = name)
+        except Exception as e:
+            log().debug("Prefetching %s failed: %s" % (name, e))
+
+    p("# Looking up %d series" % len(names))
+    pool = ThreadPool(min(Config['lookup_workers'], len(names)))
+    try:
+        pool.map(load, sorted(names.values(), key = string_type))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def eachEpisode(episodes):
+    """Yields each episode in turn, showing the progress line if enabled.
+    In batch mode (when nothing is asked) the output for each episode is
+    buffered and written in one go
+    """
+    with ProgressLine(len(episodes), enabled = Config['progress']) as progress:
+        for i, episode in enumerate(episodes):
+            progress.update(i, episode.fullfilename)
+            with bufferedOutput(enabled = Config['batch']):
+                yield episode
+        progress.update(len(episodes))
+
+
+def tvnamer(paths):
+    """Main tvnamer function, takes an array of paths, does stuff.
+    """
+
+    p("#" * 20)
+    p("# Starting tvnamer")
+
+    Stats.reset()
+
+    if Config['scan_index'] is not None:
+        index = ScanIndex(Config['scan_index'])
+    else:
+        index = None
+
+    files = findFiles(paths, index = index)
+    Stats.count('files_found', len(files))
+    for cfile in files:
+        emit("discovered", path = cfile)
+    episodes_found = parseFiles(files, index = index)
+
+    if len(episodes_found) == 0:
+        raise NoValidFilesFoundError()
+
+    p("# Found %d episode" % len(episodes_found) + ("s" * (len(episodes_found) > 1)))
+
+    provider = getProvider()
+
+    if Config['lookup_workers'] > 0 and Config['select_first'] and not PY2:
+        with stage('prefetch'):
+            prefetchSeries(provider, episodes_found, index = index)
+
+    try:
+        if Config['plan_output'] is not None:
+            writePlan(provider, episodes_found, Config['plan_output'], index = index)
+        else:
+            processEpisodes(provider, episodes_found, index = index)
+    finally:
+        if index is not None:
+            # Saved even if interrupted, keeping the names already found
+            index.save()
+            p("# Scan index: %s" % index.summary(), summary = True)
+
+        if isinstance(provider, ThrottledProvider) and provider.lookups > 0:
+            p("# Lookups: %s" % provider.summary(), summary = True)
+
+        writeReport(index = index, provider = provider)
 
     p("#" * 20)
     p("# Done")
 
 
+def writeReport(index = None, provider = None):
+    """Prints the counts and timings of the run to stderr, and writes them
+    as JSON to report_path and for Prometheus to metrics_textfile if set
+    """
+    if index is not None:
+        Stats.cache('scan index directory', index.dirs_skipped, index.dirs_listed)
+        Stats.cache('scan index parse', index.files_skipped, index.files_parsed)
+
+    if isinstance(provider, ThrottledProvider):
+        Stats.cache('series', provider.hits, provider.lookups)
+        session = getattr(getattr(provider.provider, 'tvdb', None), 'session', None)
+        if isinstance(session, CoalescingSession):
+            Stats.cache('coalesced request', session.requests_coalesced, session.requests_made)
+
+    report = Stats.report(slowest = Config['report_slowest'])
+    emit("summary", report = report)
+
+    p("#" * 20, file = sys.stderr)
+    for line in formatReport(report):
+        p(line, file = sys.stderr)
+
+    if Config['report_path'] is not None:
+        f = open(os.path.expanduser(Config['report_path']), "w")
+        try:
+            json.dump(report, f, sort_keys = True, indent = 2)
+        finally:
+            f.close()
+
+    if Config['metrics_textfile'] is not None:
+        writePrometheus(report, os.path.expanduser(Config['metrics_textfile']))
+
+
+def watchPaths(paths):
+    """Renames files as they appear in the directories in paths, until
+    interrupted. Files already in the directories are renamed too, once
+    they have stopped changing.
+
+    The Tvdb instance and compiled filename patterns are kept for the
+    life of the process, so each new file only costs the lookups not
+    already cached
+    """
+    p("#" * 20)
+    p("# Watching: %s" % ", ".join(paths))
+
+    provider = getProvider()
+
+    def handle(files):
+        valid_files = []
+        for cfile in files:
+            cur = FileFinder(
+                cfile,
+                with_extension = Config['valid_extensions'],
+                filename_blacklist = Config["filename_blacklist"])
+            try:
+                valid_files.extend(cur.findFiles())
+            except InvalidPath:
+                # Moved away before it could be processed
+                continue
+
+        processEpisodes(provider, parseFiles(valid_files))
+
+    watch(
+        paths,
+        handle,
+        recursive = Config['recursive'],
+        delay = Config['watch_debounce'],
+        poll_interval = Config['watch_poll_interval'],
+        existing = True)
+
+
+def renameRequest(provider, paths, overrides):
+    """Renames the files in paths for a --serve request, with the config
+    values in overrides (restored afterwards). Returns the events for
+    the files, and the error which stopped the request if any
+    """
+    saved = dict((key, Config.get(key)) for key in overrides)
+    Config.update(overrides)
+    error = None
+    try:
+        with capturedEvents() as events:
+            try:
+                files = findFiles(paths)
+                for cfile in files:
+                    emit("discovered", path = cfile)
+                episodes_found = parseFiles(files)
+
+                if Config['lookup_workers'] > 0 and not PY2:
+                    with stage('prefetch'):
+                        prefetchSeries(provider, episodes_found)
+
+                processEpisodes(provider, episodes_found)
+            except NoValidFilesFoundError:
+                error = "No valid files were supplied"
+            except SkipBehaviourAbort as errormsg:
+                error = string_type(errormsg)
+    finally:
+        Config.update(saved)
+
+    return {'events': events, 'error': error}
+
+
+def serveRequests(address, ready = None):
+    """Renames the files sent by tvnamer-client (or any HTTP client, see
+    tvnamer.server) to address, until interrupted. ready is called with
+    the server once it is listening.
+
+    The config is loaded and the filename patterns compiled once, and the
+    series data already looked up is kept between requests, so each
+    request only costs the lookups not already cached. /status reports
+    the statistics of the last request
+    """
+    p("#" * 20)
+    p("# Serving on %s" % address)
+
+    provider = getProvider()
+    last = {'report': None}
+
+    def handler(paths, overrides):
+        # Stats are kept per request, so they do not grow for as long as
+        # the server runs
+        Stats.reset()
+        try:
+            return renameRequest(provider, paths, overrides)
+        finally:
+            last['report'] = Stats.report(slowest = Config['report_slowest'])
+
+    def status():
+        return {'last_request': last['report']}
+
+    serve(address, handler, status = status, ready = ready)
+
+
+def warmCache(targets):
+    """Loads the data for each series into the persistent cache, so later
+    runs do not need to fetch it. targets are series names, series ids,
+    or files/directories whose filenames are parsed for series names.
+    Series are loaded concurrently (lookup_workers threads, or 4 if not
+    set). Returns the number of series which could not be loaded
+    """
+    series = []
+    paths = [x for x in targets if os.path.exists(x)]
+    for target in targets:
+        if target in paths:
+            continue
+        elif target.isdigit():
+            series.append((None, target))
+        else:
+            series.append((target, None))
+
+    if len(paths) > 0:
+        names = {}
+        for episode in parseFiles(findFiles(paths)):
+            name = Config['force_name'] or episode.seriesname
+            if name is not None:
+                names.setdefault(seriesKey(name), name)
+        series.extend((name, None) for name in sorted(names.values(), key = string_type))
+
+    p("#" * 20)
+    p("# Warming cache for %d series" % len(series))
+
+    provider = getProvider()
+
+    def load(target):
+        name, series_id = target
+        start = time.time()
+        try:
+            show = provider.getSeries(name = name, series_id = series_id)
+        except (ShowNotFound, DataRetrievalError) as errormsg:
+            return (target, None, time.time() - start, errormsg)
+        return (target, provider.seriesName(show), time.time() - start, None)
+
+    pool = ThreadPool(max(1, min(Config['lookup_workers'] or 4, len(series))))
+    try:
+        results = pool.map(load, series)
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = 0
+    for (name, series_id), found, elapsed, errormsg in results:
+        if errormsg is None:
+            p("%6.2fs %s" % (elapsed, found))
+        else:
+            warn("FAILED %s: %s" % (name or series_id, errormsg))
+            failed += 1
+
+    p("# Loaded %d series, %d failed" % (len(results) - failed, failed))
+    return failed
+
+
 def main():
     """Parses command line arguments, displays errors from tvnamer in terminal
     """
@@ -375,6 +987,10 @@ def main():
 
     opts, args = opter.parse_args()
 
+    if opts.plan_output == "-":
+        # Keeps stdout for the plan only, for the whole run
+        redirectOutput(sys.stderr)
+
     if opts.verbose:
         logging.basicConfig(
             level = logging.DEBUG,
@@ -421,6 +1037,14 @@ def main():
         del configToSave['saveconfig']
         del configToSave['loadconfig']
         del configToSave['showconfig']
+        del configToSave['verify_crc']
+        del configToSave['plan_output']
+        del configToSave['watch']
+        del configToSave['resume_journal']
+        del configToSave['undo_journal']
+        del configToSave['warm_cache']
+        del configToSave['profile_path']
+        del configToSave['serve']
         json.dump(
             configToSave,
             open(os.path.expanduser(opts.saveconfig), "w+"),
@@ -435,33 +1059,129 @@ def main():
         return
 
     # Process values
-    if opts.batch:
+    if opts.serve:
+        # Nobody to answer prompts
+        opts.batch = True
+
+    if opts.batch or opts.plan_output is not None:
         opts.select_first = True
         opts.always_rename = True
 
+    if opts.warm_cache:
+        # Series are loaded in several threads, so cannot prompt
+        opts.select_first = True
+
     # Update global config object
     Config.update(opts.__dict__)
 
+    if Config['output_format'] == 'jsonl':
+        if not Config['batch']:
+            opter.error("--output-format jsonl can only be used with --batch")
+        # Events replace everything normally written to stdout
+        setQuiet(True, summary = False)
+        enableEvents()
+    else:
+        setQuiet(Config['quiet'])
+
     if Config["move_files_only"] and not Config["move_files_enable"]:
         p("#" * 20)
         p("Parameter move_files_enable cannot be set to false while parameter move_only is set to true.")
         p("#" * 20)
         opter.exit(0)
 
+    try:
+        configSnapshot()
+    except ConfigValueError as errormsg:
+        opter.error(errormsg)
+
     if Config['titlecase_filename'] and Config['lowercase_filename']:
         warnings.warn("Setting 'lowercase_filename' clobbers 'titlecase_filename' option")
 
+    for key, pattern, risks in checkConfigPatterns(Config):
+        warn("WARNING: %s may take very long on some filenames (%s):\n%s" % (
+            key, ", ".join(risks), pattern))
+
+    if Config['undo_journal'] is not None or Config['resume_journal'] is not None:
+        try:
+            if Config['undo_journal'] is not None:
+                undoJournal(Journal(Config['undo_journal']))
+            else:
+                resumeJournal(Journal(Config['resume_journal']))
+        except JournalError as errormsg:
+            opter.error(errormsg)
+        except SkipBehaviourAbort as errormsg:
+            opter.error(errormsg)
+        return
+
+    if Config['journal_path'] is not None and not Config['always_rename']:
+        opter.error("--journal can only be used with --batch or --always")
+
+    if Config['serve']:
+        try:
+            serveRequests(Config['server_address'])
+        except KeyboardInterrupt:
+            p("Stopped serving")
+        except (ValueError, socket.error) as errormsg:
+            opter.error(errormsg)
+        return
+
     if len(args) == 0:
         opter.error("No filenames or directories supplied")
 
+    if Config['watch']:
+        if not Config['always_rename']:
+            opter.error("--watch can only be used with --batch or --always")
+        for cpath in args:
+            if not os.path.isdir(cpath):
+                opter.error("--watch requires directories, %s is not a directory" % cpath)
+        try:
+            watchPaths(paths = sorted(args))
+        except KeyboardInterrupt:
+            p("Stopped watching")
+        except SkipBehaviourAbort as errormsg:
+            opter.error(errormsg)
+        return
+
+    if Config['warm_cache']:
+        try:
+            failed = warmCache(args)
+        except NoValidFilesFoundError:
+            opter.error("No valid files were supplied")
+        if failed > 0:
+            opter.exit(1)
+        return
+
+    if Config['verify_crc']:
+        try:
+            failed = verifyFiles(findFiles(sorted(args)), workers = Config['verify_crc_workers'])
+        except NoValidFilesFoundError:
+            opter.error("No valid files were supplied")
+        if failed > 0:
+            opter.exit(1)
+        return
+
+    if Config['profile_path'] is not None:
+        profiler = cProfile.Profile()
+        run = lambda: profiler.runcall(tvnamer, paths = sorted(args))
+    else:
+        profiler = None
+        run = lambda: tvnamer(paths = sorted(args))
+
     try:
-        tvnamer(paths = sorted(args))
+        run()
     except NoValidFilesFoundError:
         opter.error("No valid files were supplied")
     except UserAbort as errormsg:
         opter.error(errormsg)
     except SkipBehaviourAbort as errormsg:
         opter.error(errormsg)
+    finally:
+        if profiler is not None:
+            # Written even if the run failed, as slow failing runs are
+            # worth profiling too
+            profiler.dump_stats(os.path.expanduser(Config['profile_path']))
+            warn("Wrote profile to %s (view with: python -m pstats %s)" % (
+                Config['profile_path'], Config['profile_path']))
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python
+
+"""Sources of series and episode names
+
+EpisodeInfo.populateFromTvdb looks names up through a MetadataProvider.
+TvdbProvider queries www.thetvdb.com via tvdb_api, FixtureProvider
+answers from data held in memory (or loaded from a JSON file), so the
+whole pipeline can be run without network access.
+"""
+
+import time
+import datetime
+import threading
+import logging
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from tvdb_api import (tvdb_error, tvdb_shownotfound, tvdb_seasonnotfound,
+tvdb_episodenotfound, tvdb_attributenotfound, tvdb_userabort)
+from tvdb_ui import ConsoleUI
+
+from tvnamer.config import Config
+from tvnamer.compat import string_type, all_string_types
+from tvnamer.ratelimit import backoffDelay
+from tvnamer.tvnamer_exceptions import (ShowNotFound, DataRetrievalError,
+SeasonNotFound, EpisodeNotFound, EpisodeNameNotFound, UserAbort)
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+def seriesKey(name):
+    """Returns name lowercased, for telling apart series looked up by
+    name. Series ids given in place of a name (from
+    input_series_replacements) are returned unchanged
+    """
+    if isinstance(name, all_string_types):
+        return name.lower()
+    return name
+
+
+class MetadataProvider(object):
+    """Interface used by EpisodeInfo.populateFromTvdb.
+
+    getSeries returns an object identifying a series, which is passed
+    back to the other methods. Failures are reported with tvnamer's
+    exceptions: ShowNotFound, SeasonNotFound, EpisodeNotFound,
+    EpisodeNameNotFound, DataRetrievalError and UserAbort
+    """
+
+    def getSeries(self, name = None, series_id = None):
+        """Finds a series by name, or by id if series_id is not None
+        """
+        raise NotImplementedError()
+
+    def seriesName(self, series):
+        """Returns the series' name
+        """
+        raise NotImplementedError()
+
+    def episodeName(self, series, seasonnumber, episodenumber):
+        """Returns the name of an episode. Raises SeasonNotFound if the
+        season does not exist, EpisodeNotFound if the episode does not
+        exist in it
+        """
+        raise NotImplementedError()
+
+    def episodesByAbsoluteNumber(self, series, number):
+        """Returns list of dicts with keys 'absolute_number' (int) and
+        'episodename' for episodes which may have the absolute number. The
+        list may include near matches, which the caller filters
+        """
+        raise NotImplementedError()
+
+    def episodesAiredOn(self, series, date):
+        """Returns list of dicts with keys 'seasonnumber' (int) and
+        'episodename' for episodes first aired on date. Raises
+        EpisodeNotFound if there are none
+        """
+        raise NotImplementedError()
+
+
+class TvdbProvider(MetadataProvider):
+    """Looks up names on www.thetvdb.com with a tvdb_api.Tvdb instance
+    """
+
+    def __init__(self, tvdb_instance):
+        self.tvdb = tvdb_instance
+
+    def getSeries(self, name = None, series_id = None):
+        try:
+            if series_id is None:
+                return self.tvdb[name]
+            else:
+                series_id = int(series_id)
+                self.tvdb._getShowData(series_id, Config['language'])
+                return self.tvdb[series_id]
+        except (tvdb_error, IOError) as errormsg:
+            # IOError includes connection errors from requests
+            raise DataRetrievalError("Error with www.thetvdb.com: %s" % errormsg)
+        except tvdb_shownotfound:
+            raise ShowNotFound("Show %s not found on www.thetvdb.com" % name)
+        except tvdb_userabort as error:
+            raise UserAbort(string_type(error))
+
+    def seriesName(self, series):
+        return series['seriesname']
+
+    def episodeName(self, series, seasonnumber, episodenumber):
+        try:
+            return series[seasonnumber][episodenumber]['episodename']
+        except tvdb_seasonnotfound:
+            raise SeasonNotFound("Season %s not found" % seasonnumber)
+        except tvdb_episodenotfound:
+            raise EpisodeNotFound("Episode %s not found" % episodenumber)
+        except tvdb_attributenotfound:
+            raise EpisodeNameNotFound("Could not find episode name for %s" % episodenumber)
+
+    def episodesByAbsoluteNumber(self, series, number):
+        return [
+            {'absolute_number': int(e['absolute_number']), 'episodename': e['episodename']}
+            for e in series.search(number, "absolute_number")]
+
+    def episodesAiredOn(self, series, date):
+        try:
+            found = series.airedOn(date)
+        except tvdb_episodenotfound:
+            raise EpisodeNotFound("No episode aired on %s" % date)
+        return [
+            {'seasonnumber': int(e['seasonnumber']), 'episodename': e['episodename']}
+            for e in found]
+
+
+class FixtureProvider(MetadataProvider):
+    """Answers from a list of series held in memory, each a dict such as:
+
+    {"id": 76156,
+     "seriesname": "Scrubs",
+     "aliases": ["Scrubs (2001)"],
+     "episodes": [
+        {"seasonnumber": 1, "episodenumber": 1, "absolute_number": 1,
+         "episodename": "My First Day", "firstaired": "2001-10-02"}]}
+
+    Series are found by id, or by name or alias ignoring case. Only
+    seriesname and episodes are required. When several series have the
+    name, the first is used, or if interactive is True the user chooses
+    one as with www.thetvdb.com search results
+    """
+
+    def __init__(self, series, interactive = False):
+        self.series = series
+        self.interactive = interactive
+        self.selected = {}
+        self.by_id = {}
+        self.by_name = {}
+        for cur in series:
+            if cur.get('id') is not None:
+                self.by_id[int(cur['id'])] = cur
+            for name in [cur['seriesname']] + cur.get('aliases', []):
+                matches = self.by_name.setdefault(name.lower(), [])
+                if cur not in matches:
+                    matches.append(cur)
+
+    @classmethod
+    def fromFile(cls, path, interactive = False):
+        """Loads a JSON file containing {"series": [...]}
+        """
+        f = open(path)
+        try:
+            data = json.load(f)
+        finally:
+            f.close()
+        return cls(data['series'], interactive = interactive)
+
+    def _selectSeries(self, matches):
+        """Asks which of matches to use, with tvdb_api's console UI
+        """
+        listed = [
+            dict(cur, id = cur.get('id'), language = Config['language'], lid = None)
+            for cur in matches]
+        try:
+            chosen = ConsoleUI(config = {'select_first': False}).selectSeries(listed)
+        except tvdb_userabort as error:
+            raise UserAbort(string_type(error))
+        return matches[[id(x) for x in listed].index(id(chosen))]
+
+    def getSeries(self, name = None, series_id = None):
+        if series_id is None and not isinstance(name, all_string_types):
+            # An id in place of the name (from input_series_replacements),
+            # which tvdb_api also looks up by id
+            series_id = name
+        if series_id is None:
+            matches = self.by_name.get(name.lower(), [])
+            if len(matches) > 1 and self.interactive:
+                # Only asked once per name, as tvdb_api does
+                if name.lower() not in self.selected:
+                    self.selected[name.lower()] = self._selectSeries(matches)
+                found = self.selected[name.lower()]
+            elif len(matches) > 0:
+                found = matches[0]
+            else:
+                found = None
+        else:
+            found = self.by_id.get(int(series_id))
+        if found is None:
+            raise ShowNotFound("Show %s not found in fixture" % (name if series_id is None else series_id))
+        return found
+
+    def seriesName(self, series):
+        return series['seriesname']
+
+    def episodeName(self, series, seasonnumber, episodenumber):
+        in_season = [e for e in series['episodes'] if e['seasonnumber'] == seasonnumber]
+        if len(in_season) == 0:
+            raise SeasonNotFound("Season %s not found" % seasonnumber)
+        for episode in in_season:
+            if episode['episodenumber'] == episodenumber:
+                if episode.get('episodename') is None:
+                    raise EpisodeNameNotFound("Could not find episode name for %s" % episodenumber)
+                return episode['episodename']
+        raise EpisodeNotFound("Episode %s not found" % episodenumber)
+
+    def episodesByAbsoluteNumber(self, series, number):
+        return [
+            {'absolute_number': e['absolute_number'], 'episodename': e['episodename']}
+            for e in series['episodes'] if e.get('absolute_number') == number]
+
+    def episodesAiredOn(self, series, date):
+        if isinstance(date, datetime.date):
+            date = date.isoformat()
+        found = [
+            {'seasonnumber': e['seasonnumber'], 'episodename': e['episodename']}
+            for e in series['episodes'] if e.get('firstaired') == date]
+        if len(found) == 0:
+            raise EpisodeNotFound("No episode aired on %s" % date)
+        return found
+
+
+class ThrottledProvider(MetadataProvider):
+    """Wraps another provider, limiting how often series are loaded with a
+    ratelimit.TokenBucket (or None for no limit), and retrying loads which
+    fail with DataRetrievalError (such as connection errors, or being
+    throttled by the server) up to retries times with exponential backoff.
+
+    Loaded series are kept, so only the first lookup of each series takes
+    a token. The other methods work on the loaded series, and are passed
+    straight through
+    """
+
+    def __init__(self, provider, bucket = None, retries = 0, retry_delay = 1, max_retry_delay = 30, sleep = time.sleep):
+        self.provider = provider
+        self.bucket = bucket
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.sleep = sleep
+
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+        self.lookups = 0
+        self.hits = 0
+        self.retried = 0
+        self.retry_wait = 0.0
+
+    def getSeries(self, name = None, series_id = None):
+        key = (series_id, seriesKey(name))
+        with self.lock:
+            if key in self.loaded:
+                self.hits += 1
+                return self.loaded[key]
+            self.lookups += 1
+
+        attempt = 0
+        while True:
+            if self.bucket is not None:
+                self.bucket.acquire()
+            try:
+                series = self.provider.getSeries(name = name, series_id = series_id)
+            except DataRetrievalError as errormsg:
+                if attempt >= self.retries:
+                    raise
+                delay = backoffDelay(attempt, self.retry_delay, self.max_retry_delay)
+                log().info("Lookup of %s failed (%s), retrying in %.1fs" % (
+                    name if series_id is None else series_id, errormsg, delay))
+                with self.lock:
+                    self.retried += 1
+                    self.retry_wait += delay
+                self.sleep(delay)
+                attempt += 1
+            else:
+                with self.lock:
+                    self.loaded[key] = series
+                return series
+
+    def seriesName(self, series):
+        return self.provider.seriesName(series)
+
+    def episodeName(self, series, seasonnumber, episodenumber):
+        return self.provider.episodeName(series, seasonnumber, episodenumber)
+
+    def episodesByAbsoluteNumber(self, series, number):
+        return self.provider.episodesByAbsoluteNumber(series, number)
+
+    def episodesAiredOn(self, series, date):
+        return self.provider.episodesAiredOn(series, date)
+
+    def summary(self):
+        """Returns a line describing the time spent waiting
+        """
+        if self.bucket is None:
+            rate_wait, rate_waits = 0.0, 0
+        else:
+            rate_wait, rate_waits = self.bucket.waited, self.bucket.waits
+        return "%d series lookup%s, %d rate limited (waited %.1fs), %d retr%s (waited %.1fs)" % (
+            self.lookups,
+            "s" * (self.lookups != 1),
+            rate_waits,
+            rate_wait,
+            self.retried,
+            "ies" if self.retried != 1 else "y",
+            self.retry_wait)
+
+
+def asProvider(source):
+    """Returns source if it is a MetadataProvider, otherwise wraps it (a
+    tvdb_api.Tvdb instance) in a TvdbProvider
+    """
+    if isinstance(source, MetadataProvider):
+        return source
+    return TvdbProvider(source)
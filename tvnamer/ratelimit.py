@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Rate limiting and retrying, for lookups on www.thetvdb.com
+"""
+
+import time
+import random
+import threading
+import logging
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+class TokenBucket(object):
+    """Allows rate calls per second on average, and bursts of up to burst
+    calls. Shared between threads.
+
+    Keeps the total time spent waiting in waited, and the number of calls
+    which had to wait in waits
+    """
+
+    def __init__(self, rate, burst = 1, clock = time.time, sleep = time.sleep):
+        self.rate = float(rate)
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.sleep = sleep
+
+        self.tokens = float(self.burst)
+        self.last = clock()
+        self.lock = threading.Lock()
+
+        self.waited = 0.0
+        self.waits = 0
+
+    def acquire(self):
+        """Takes a token, waiting until one is available. Returns the
+        number of seconds waited
+        """
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+            self.last = now
+
+            # Reserve the token now, so other threads queue behind it
+            self.tokens -= 1
+            if self.tokens >= 0:
+                return 0.0
+            delay = -self.tokens / self.rate
+            self.waited += delay
+            self.waits += 1
+
+        log().debug("Rate limited, waiting %.2fs" % delay)
+        self.sleep(delay)
+        return delay
+
+
+def backoffDelay(attempt, base, maximum, rand = random.random):
+    """Returns the delay before retry number attempt (starting at 0):
+    exponential backoff from base seconds, capped at maximum, with "full
+    jitter" (a random delay between 0 and the cap) so clients retrying at
+    the same time spread out
+
+    >>> backoffDelay(3, 1, 30, rand = lambda: 1.0)
+    8.0
+    >>> backoffDelay(10, 1, 30, rand = lambda: 1.0)
+    30.0
+    """
+    return min(float(maximum), base * (2 ** attempt)) * rand()
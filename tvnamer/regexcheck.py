@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+
+"""Guards against regular expressions prone to catastrophic backtracking:
+backtrackingRisks finds nested or overlapping quantifiers in a pattern,
+checkConfigPatterns runs it on the patterns in a config, and timedMatch
+aborts a match taking too long
+"""
+
+import re
+import signal
+import threading
+
+try:
+    # Python 3.11+
+    import re._parser as sre_parse
+except ImportError:
+    import sre_parse
+
+from tvnamer.compat import PY2
+from tvnamer.tvnamer_exceptions import PatternTimeoutError
+
+if PY2:
+    _char = unichr
+else:
+    _char = chr
+
+
+# Repeats with an upper bound above this are treated as unbounded
+UNBOUNDED = 100
+
+# Characters used to decide whether two parts of a pattern can match the
+# same character
+_SAMPLES = [_char(x) for x in range(32, 127)] + ["\t", "\n", u"\xa0", u"\xe9", u"\u3042"]
+
+_CATEGORIES = {
+    'DIGIT': re.compile(r"\d", re.UNICODE),
+    'NOT_DIGIT': re.compile(r"\D", re.UNICODE),
+    'SPACE': re.compile(r"\s", re.UNICODE),
+    'NOT_SPACE': re.compile(r"\S", re.UNICODE),
+    'WORD': re.compile(r"\w", re.UNICODE),
+    'NOT_WORD': re.compile(r"\W", re.UNICODE),
+    'LINEBREAK': re.compile(r"\n"),
+    'NOT_LINEBREAK': re.compile(r"[^\n]")}
+
+
+def _op(op):
+    """Name of a parser opcode, the same across Python versions
+    """
+    return str(op).upper()
+
+
+def _inCategory(category, ch):
+    name = _op(category).replace("CATEGORY_", "").replace("UNI_", "").replace("LOC_", "")
+    if name not in _CATEGORIES:
+        return True
+    return _CATEGORIES[name].match(ch) is not None
+
+
+def _inSet(items, ch):
+    """Whether ch matches the items of an IN opcode
+    """
+    negate = False
+    found = False
+    for op, av in items:
+        op = _op(op)
+        if op == "NEGATE":
+            negate = True
+        elif op == "LITERAL":
+            found = found or ch.lower() == _char(av).lower()
+        elif op == "RANGE":
+            found = found or av[0] <= ord(ch) <= av[1] or av[0] <= ord(ch.swapcase()) <= av[1]
+        elif op == "CATEGORY":
+            found = found or _inCategory(av, ch)
+        else:
+            # Unknown set member, assume it matches
+            found = True
+    return found != negate
+
+
+def _chars(items):
+    """Returns the set of sample characters the items (a parsed pattern,
+    or a list of (op, av)) can match anywhere. Case is ignored, and
+    anything not understood is assumed to match everything
+    """
+    chars = set()
+    for op, av in items:
+        op = _op(op)
+        if op == "LITERAL":
+            chars.update(x for x in _SAMPLES if x.lower() == _char(av).lower())
+        elif op == "NOT_LITERAL":
+            chars.update(x for x in _SAMPLES if x.lower() != _char(av).lower())
+        elif op == "ANY":
+            chars.update(x for x in _SAMPLES if x != "\n")
+        elif op == "IN":
+            chars.update(x for x in _SAMPLES if _inSet(av, x))
+        elif op in ("MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT"):
+            chars.update(_chars(av[2]))
+        elif op == "SUBPATTERN":
+            chars.update(_chars(av[-1]))
+        elif op == "BRANCH":
+            for alternative in av[1]:
+                chars.update(_chars(alternative))
+        elif op in ("AT", "ASSERT", "ASSERT_NOT"):
+            # Zero width
+            pass
+        else:
+            chars.update(_SAMPLES)
+    return chars
+
+
+def _nullable(item):
+    """Whether a single (op, av) can match the empty string
+    """
+    try:
+        return sre_parse.SubPattern(None, [item]).getwidth()[0] == 0
+    except (AttributeError, TypeError):
+        # Such as back-references, which need the parser state
+        return True
+
+
+def _flatten(items):
+    """Returns items with (non-atomic) groups replaced by their contents
+    """
+    flat = []
+    for op, av in items:
+        if _op(op) == "SUBPATTERN":
+            flat.extend(_flatten(av[-1]))
+        else:
+            flat.append((op, av))
+    return flat
+
+
+def _containsUnbounded(item):
+    """Whether an item is, or contains, an unbounded repeat
+    """
+    op, av = item
+    op = _op(op)
+    if op in ("MAX_REPEAT", "MIN_REPEAT"):
+        return av[1] > UNBOUNDED or any(_containsUnbounded(x) for x in av[2])
+    if op == "SUBPATTERN":
+        return any(_containsUnbounded(x) for x in av[-1])
+    if op == "BRANCH":
+        return any(_containsUnbounded(x) for alternative in av[1] for x in alternative)
+    return False
+
+
+def _firstChars(items):
+    """Sample characters the sequence items can start with
+    """
+    chars = set()
+    for item in items:
+        chars.update(_chars([item]))
+        if not _nullable(item):
+            break
+    return chars
+
+
+def _repeatRisks(body):
+    """Risks of the body of an unbounded repeat
+    """
+    risks = []
+    flat = _flatten(body)
+    for i, item in enumerate(flat):
+        others = flat[:i] + flat[i + 1:]
+        required = [x for x in others if not _nullable(x)]
+
+        if _containsUnbounded(item):
+            # The inner repeat can split what it matches with the outer
+            # repeat in many ways, unless a required part of the outer
+            # body cannot match what the inner repeat matches
+            inner = _chars([item])
+            if all(_chars([x]) & inner for x in required):
+                risks.append("nested quantifiers")
+
+        elif _op(item[0]) == "BRANCH":
+            # Each repetition can take either alternative when they start
+            # with the same character, or can both match nothing
+            alternatives = [
+                (_firstChars(x), all(_nullable(y) for y in x))
+                for x in item[1][1]]
+            for a in range(len(alternatives)):
+                if any((alternatives[a][0] & alternatives[b][0]) or (alternatives[a][1] and alternatives[b][1])
+                       for b in range(a + 1, len(alternatives))):
+                    risks.append("repeated alternatives which can match the same text")
+                    break
+    return risks
+
+
+def _walk(items):
+    risks = []
+    for op, av in items:
+        op = _op(op)
+        if op in ("MAX_REPEAT", "MIN_REPEAT"):
+            if av[1] > 1:
+                risks.extend(_repeatRisks(av[2]))
+            risks.extend(_walk(av[2]))
+        elif op in ("SUBPATTERN", "ASSERT", "ASSERT_NOT"):
+            risks.extend(_walk(av[-1]))
+        elif op == "BRANCH":
+            for alternative in av[1]:
+                risks.extend(_walk(alternative))
+        elif op == "GROUPREF_EXISTS":
+            for alternative in av[1:]:
+                if alternative is not None:
+                    risks.extend(_walk(alternative))
+    return risks
+
+
+def backtrackingRisks(pattern, flags = 0):
+    """Returns list of descriptions of the parts of pattern which may
+    take exponential time on a long string that does not match. Invalid
+    patterns have no risks (they are reported when compiled)
+
+    >>> backtrackingRisks(r"^(\\w+\\s?)*$")
+    ['nested quantifiers']
+    >>> backtrackingRisks(r"^(\\d+[-_])*\\d+$")
+    []
+    """
+    try:
+        parsed = sre_parse.parse(pattern, flags)
+    except (re.error, TypeError, ValueError):
+        return []
+
+    found = []
+    for risk in _walk(parsed):
+        if risk not in found:
+            found.append(risk)
+    return found
+
+
+def checkConfigPatterns(config):
+    """Returns list of (config key, pattern, risks) for each regular
+    expression in config with backtrackingRisks
+    """
+    patterns = []
+    for i, pattern in enumerate(config['filename_patterns']):
+        patterns.append(("filename_patterns[%d]" % i, pattern, re.VERBOSE))
+    patterns.append(("extension_pattern", config['extension_pattern'], 0))
+    for key in ['filename_blacklist', 'input_filename_replacements',
+                'output_filename_replacements', 'move_files_fullpath_replacements']:
+        for i, rep in enumerate(config[key]):
+            # filename_blacklist entries may also be plain filenames
+            if isinstance(rep, dict) and rep.get('is_regex', False):
+                patterns.append(("%s[%d]" % (key, i), rep['match'], 0))
+    for pattern in sorted(config['input_series_replacements']):
+        patterns.append(("input_series_replacements", pattern, 0))
+
+    flagged = []
+    for key, pattern, flags in patterns:
+        risks = backtrackingRisks(pattern, flags)
+        if len(risks) > 0:
+            flagged.append((key, pattern, risks))
+    return flagged
+
+
+class _MatchTimeout(Exception):
+    pass
+
+
+def _raiseMatchTimeout(signum, frame):
+    raise _MatchTimeout()
+
+
+def canTimeMatches():
+    """Whether timedMatch can abort matches here. It relies on SIGALRM,
+    which is only available on Unix, and only in the main thread
+    """
+    return hasattr(signal, 'setitimer') and isinstance(threading.current_thread(), threading._MainThread)
+
+
+def timedMatch(regex, string, timeout, path = None):
+    """regex.match(string), raising PatternTimeoutError if it takes more
+    than timeout seconds. Only call when canTimeMatches() is True
+    """
+    previous = signal.signal(signal.SIGALRM, _raiseMatchTimeout)
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        return regex.match(string)
+    except _MatchTimeout:
+        raise PatternTimeoutError(
+            "Matching %r took over %ss, skipping it. Pattern was:\n%s" % (
+                path if path is not None else string, timeout, regex.pattern))
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
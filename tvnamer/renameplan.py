@@ -0,0 +1,627 @@
+#!/usr/bin/env python
+
+"""Rename plans, and the append-only journal used to execute them
+
+A plan is the complete list of renames/moves for a batch, built before
+any file is touched. Each operation is written to the journal before it
+runs, and its progress is recorded as it happens, so a run that dies
+halfway can be resumed (--resume) or reversed (--undo).
+"""
+
+import os
+import logging
+import threading
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from tvnamer.config import Config
+from tvnamer.unicode_helper import p
+from tvnamer.runstats import Stats
+from tvnamer.events import emit, emitSkipped
+from tvnamer.utils import (Renamer, warn, same_partition, delete_file,
+split_extension)
+from tvnamer.tvnamer_exceptions import JournalError, SkipBehaviourAbort
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+def _existingParent(path):
+    """Returns the closest directory containing path which exists (used
+    to find which device a not-yet-created destination will be on)
+    """
+    path = os.path.dirname(path)
+    while not os.path.isdir(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+class PlannedOperation(object):
+    """A single file's planned rename and (optional) move.
+
+    source is the file's current path, intermediate is the path after
+    the rename (in the source directory) and destination is where the
+    file ends up.
+
+    operation is one of:
+    - "rename", the file is only renamed (intermediate == destination)
+    - "move", the file is renamed then moved, the source is removed
+    - "copy", the file is renamed then copied to another device, the
+      renamed source is left in place (always_move is False)
+    - "none", the file is already correctly named and in place
+    """
+
+    def __init__(self, source, intermediate, destination, operation, id = None, crc = None):
+        self.id = id
+        self.source = source
+        self.intermediate = intermediate
+        self.destination = destination
+        self.operation = operation
+        # CRC32 parsed from the filename, checked when copying if
+        # verify_crc_on_copy is enabled
+        self.crc = crc
+
+    @classmethod
+    def fromPaths(cls, source, intermediate, destination, crc = None):
+        """Creates a PlannedOperation, working out the operation from the
+        paths and the always_move config option
+        """
+        if destination == source:
+            operation = "none"
+        elif destination == intermediate:
+            operation = "rename"
+        elif same_partition(source, _existingParent(destination)) or Config['always_move']:
+            operation = "move"
+        else:
+            operation = "copy"
+
+        return cls(source, intermediate, destination, operation, crc = crc)
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'source': self.source,
+            'intermediate': self.intermediate,
+            'destination': self.destination,
+            'operation': self.operation,
+            'crc': self.crc}
+
+    def __repr__(self):
+        return "<%s %s: %r -> %r -> %r>" % (
+            self.__class__.__name__,
+            self.operation,
+            self.source,
+            self.intermediate,
+            self.destination)
+
+
+class _DirectoryListings(object):
+    """Lists each directory at most once, for checking many paths
+    against the files already on disk
+    """
+
+    def __init__(self):
+        self.listings = {}
+
+    def exists(self, path):
+        dirname, filename = os.path.split(path)
+        if dirname not in self.listings:
+            try:
+                self.listings[dirname] = set(os.listdir(dirname))
+            except OSError:
+                # Directory does not exist yet
+                self.listings[dirname] = set()
+        return filename in self.listings[dirname]
+
+
+def findCollisions(plan):
+    """Finds the operations in plan which would fail because the file they
+    rename or move to already exists, or because an earlier operation in
+    the plan leaves a file at the same path.
+
+    Each destination directory is listed once. Files which earlier
+    operations rename or move away do not count as existing. Existing
+    files are ignored if overwrite_destination_on_rename/
+    overwrite_destination_on_move allow overwriting them.
+
+    Returns a list of (op, path, reason) tuples. If only an operation's
+    move collides, its rename is still counted as happening
+    """
+    listings = _DirectoryListings()
+    # Paths earlier operations leave a file at, and paths they empty
+    occupied = {}
+    vacated = set()
+    collisions = []
+
+    for op in plan:
+        if op.operation == "none":
+            occupied[op.destination] = op
+            continue
+
+        steps = []
+        if op.intermediate != op.source:
+            steps.append((op.source, op.intermediate, Config['overwrite_destination_on_rename']))
+        if op.destination != op.intermediate:
+            steps.append((op.intermediate, op.destination, Config['overwrite_destination_on_move']))
+
+        for current, path, overwrite in steps:
+            if not overwrite:
+                if path in occupied:
+                    collisions.append((op, path, "also the target of %s" % occupied[path].source))
+                    break
+                elif path not in vacated and listings.exists(path):
+                    collisions.append((op, path, "file already exists"))
+                    break
+
+            if not (op.operation == "copy" and current == op.intermediate):
+                # Copies leave the renamed file in place
+                occupied.pop(current, None)
+                vacated.add(current)
+            occupied[path] = op
+            vacated.discard(path)
+
+    return collisions
+
+
+def _suffixedPath(path, number):
+    """Adds " (number)" to the filename in path, before the extension
+    """
+    base, ext = split_extension(path)
+    return "%s (%d)%s" % (base, number, ext)
+
+
+def resolveCollisions(plan, collisions):
+    """Changes the target of each colliding operation to an unused name,
+    by adding a numeric suffix, "Show - [01x01] (2).avi" for example.
+    A file's current name counts as unused, so a file named with a suffix
+    by an earlier run keeps it. Repeated until nothing collides, as
+    moving a renamed file may then collide
+    """
+    while len(collisions) > 0:
+        listings = _DirectoryListings()
+        taken = set()
+        for op in plan:
+            taken.update([op.intermediate, op.destination])
+
+        for op, path, reason in collisions:
+            number = 2
+            while True:
+                new_path = _suffixedPath(path, number)
+                if new_path == op.source:
+                    break
+                if new_path not in taken and not listings.exists(new_path):
+                    break
+                number += 1
+            taken.add(new_path)
+
+            p("Resolving collision (%s): %s -> %s" % (reason, path, new_path))
+            if op.intermediate == path:
+                if op.destination == op.intermediate:
+                    op.destination = new_path
+                op.intermediate = new_path
+            else:
+                op.destination = new_path
+            if op.destination == op.source:
+                op.operation = "none"
+
+        collisions = findCollisions(plan)
+
+
+class Journal(object):
+    """Append-only record of a plan and its progress, stored as one JSON
+    object per line.
+
+    Every operation is first written with state "planned", then one line
+    per step completed: "renamed", "moved" or "copied" (see movedState),
+    then "done", "failed" or "undone". Each line is flushed and fsync'd
+    before the filesystem is touched again, so the journal is never
+    behind the files on disk by more than one step.
+    """
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        # Operations may complete on several move workers at once
+        self._lock = threading.Lock()
+        self._checked = False
+
+    def _removeIncompleteLine(self):
+        """Truncates the journal back to the end of its last complete
+        line, so entries appended after a crash while writing do not
+        continue the incomplete line
+        """
+        try:
+            f = open(self.path, "rb+")
+        except IOError:
+            # Not created yet
+            return
+        try:
+            data = f.read()
+            if len(data) > 0 and not data.endswith(b"\n"):
+                warn("Removing incomplete last line of journal %s" % self.path)
+                f.truncate(data.rfind(b"\n") + 1)
+        finally:
+            f.close()
+
+    def _append(self, entries):
+        self._lock.acquire()
+        try:
+            if not self._checked:
+                self._removeIncompleteLine()
+                self._checked = True
+            f = open(self.path, "a")
+            try:
+                for entry in entries:
+                    f.write(json.dumps(entry, sort_keys = True) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            finally:
+                f.close()
+        finally:
+            self._lock.release()
+
+    def recordPlan(self, plan):
+        """Numbers the operations in plan (continuing from any already in
+        the journal) and writes them all with state "planned"
+        """
+        next_id = len(self.operations())
+        entries = []
+        for op in plan:
+            op.id = next_id
+            next_id += 1
+            entry = op.as_dict()
+            entry['state'] = 'planned'
+            entries.append(entry)
+        self._append(entries)
+
+    def record(self, op, state, **extra):
+        """Records that op has reached state
+        """
+        entry = dict(extra)
+        entry['id'] = op.id
+        entry['state'] = state
+        self._append([entry])
+
+    def read(self):
+        """Returns all entries in the journal. A truncated final line
+        (from a crash while writing it) is ignored
+        """
+        if not os.path.isfile(self.path):
+            raise JournalError("Journal %s does not exist" % self.path)
+
+        entries = []
+        lines = open(self.path).read().splitlines()
+        for lineno, line in enumerate(lines):
+            if line.strip() == "":
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError as e:
+                if lineno == len(lines) - 1:
+                    warn("Ignoring incomplete last line of journal %s" % self.path)
+                else:
+                    raise JournalError("Line %d of journal %s is corrupt: %s" % (
+                        lineno + 1, self.path, e))
+        return entries
+
+    def operations(self):
+        """Returns a list of (PlannedOperation, state) tuples in plan
+        order, where state is the most recent recorded state
+        """
+        if not os.path.isfile(self.path):
+            return []
+
+        ops = []
+        states = {}
+        for entry in self.read():
+            if entry['state'] == 'planned':
+                ops.append(PlannedOperation(
+                    source = entry['source'],
+                    intermediate = entry['intermediate'],
+                    destination = entry['destination'],
+                    operation = entry['operation'],
+                    id = entry['id'],
+                    crc = entry.get('crc')))
+            states[entry['id']] = entry['state']
+
+        return [(op, states[op.id]) for op in ops]
+
+    def steps(self):
+        """Returns a dict of operation id to the set of every state
+        recorded for it
+        """
+        steps = {}
+        for entry in self.read():
+            steps.setdefault(entry['id'], set()).add(entry['state'])
+        return steps
+
+
+class NullJournal(Journal):
+    """Journal which records nothing, for executing a plan when no
+    journal_path is configured
+    """
+
+    def __init__(self):
+        self.path = None
+
+    def _append(self, entries):
+        pass
+
+    def operations(self):
+        return []
+
+    def steps(self):
+        return {}
+
+
+def _handleError(op, journal, error):
+    """Records a failed operation, and skips or exits depending on the
+    skip_behaviour config option (as doRenameFile does)
+    """
+    journal.record(op, 'failed', error = str(error))
+    Stats.skip(error)
+    emitSkipped(op.source, error)
+    if Config['skip_behaviour'] == 'exit':
+        warn("Exiting due to error: %s" % error)
+        raise SkipBehaviourAbort()
+    warn("Skipping file due to error: %s" % error)
+
+
+def movedState(op):
+    """Returns the state recorded once op's file is at its destination:
+    "copied" if the renamed source was left in place, otherwise "moved"
+    """
+    if op.operation == "copy":
+        return 'copied'
+    return 'moved'
+
+
+def _renameStep(op):
+    Renamer(op.source).newPath(
+        new_fullpath = op.intermediate,
+        force = Config['overwrite_destination_on_rename'],
+        leave_symlink = Config['leave_symlink'],
+        apply_replacements = False)
+
+
+def _moveStep(op):
+    Renamer(op.intermediate).newPath(
+        new_fullpath = op.destination,
+        always_move = op.operation == "move",
+        force = Config['overwrite_destination_on_move'],
+        leave_symlink = Config['leave_symlink'],
+        apply_replacements = False,
+        verify_crc = Config['verify_crc_on_copy'],
+        expected_crc = op.crc)
+
+
+def executeOperation(op, journal):
+    """Runs the remaining steps of op, recording each in the journal
+    """
+    try:
+        if op.intermediate != op.source:
+            _renameStep(op)
+            journal.record(op, 'renamed')
+            emit("renamed", path = op.source, new_path = op.intermediate)
+        if op.destination != op.intermediate:
+            _moveStep(op)
+            journal.record(op, movedState(op))
+            emit("moved", path = op.intermediate, new_path = op.destination)
+    except OSError as e:
+        _handleError(op, journal, e)
+    else:
+        journal.record(op, 'done')
+
+
+def _deviceOf(path):
+    return os.stat(path).st_dev
+
+
+def scheduleByDevice(plan, journal):
+    """Splits plan into operations which stay on the source's device,
+    and a dict of operations which cross devices, keyed by the
+    (source device, destination device) pair. Operations whose files
+    have gone since the plan was made are recorded as failed in journal
+    """
+    serial = []
+    groups = {}
+    for op in plan:
+        try:
+            src_dev = _deviceOf(op.source)
+            dst_dev = _deviceOf(_existingParent(op.destination))
+        except OSError as e:
+            _handleError(op, journal, e)
+            continue
+        if src_dev == dst_dev:
+            serial.append(op)
+        else:
+            groups.setdefault((src_dev, dst_dev), []).append(op)
+    return serial, groups
+
+
+class _DeviceWorker(threading.Thread):
+    """Executes operations from a list shared with the other workers for
+    the same device pair, until the list is empty or stop is set
+    """
+
+    def __init__(self, ops, ops_lock, journal, stop):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.ops = ops
+        self.ops_lock = ops_lock
+        self.journal = journal
+        self.stop = stop
+        self.error = None
+
+    def run(self):
+        while not self.stop.is_set():
+            self.ops_lock.acquire()
+            try:
+                if len(self.ops) == 0:
+                    return
+                op = self.ops.pop(0)
+            finally:
+                self.ops_lock.release()
+
+            try:
+                executeOperation(op, self.journal)
+            except Exception as e:
+                # Stop all workers, error is re-raised from executePlan
+                self.error = e
+                self.stop.set()
+                return
+
+
+def executePlan(plan, journal, workers_per_device = 0):
+    """Writes plan to the journal, then executes each operation.
+
+    If workers_per_device is 0, operations are executed in order. Otherwise
+    operations moving files between devices are grouped by (source device,
+    destination device), and each group gets workers_per_device threads, so
+    copies to independent disks run in parallel. Operations staying on one
+    device are just renames, and run in order on the calling thread
+    """
+    journal.recordPlan(plan)
+
+    if workers_per_device < 1:
+        for op in plan:
+            executeOperation(op, journal)
+        return
+
+    serial, groups = scheduleByDevice(plan, journal)
+
+    stop = threading.Event()
+    workers = []
+    for (src_dev, dst_dev), ops in sorted(groups.items()):
+        log().debug("Moving %d files from device %s to %s with %d workers" % (
+            len(ops), src_dev, dst_dev, workers_per_device))
+        ops_lock = threading.Lock()
+        for _ in range(workers_per_device):
+            worker = _DeviceWorker(ops, ops_lock, journal, stop)
+            worker.start()
+            workers.append(worker)
+
+    try:
+        for op in serial:
+            if stop.is_set():
+                break
+            executeOperation(op, journal)
+    except:
+        stop.set()
+        raise
+    finally:
+        for worker in workers:
+            worker.join()
+
+    for worker in workers:
+        if worker.error is not None:
+            raise worker.error
+
+
+def resumeJournal(journal):
+    """Continues every operation in the journal which was not completed,
+    working out from the files on disk which step was reached
+    """
+    for op, state in journal.operations():
+        if state in ('moved', 'copied'):
+            # Interrupted after the last step
+            journal.record(op, 'done')
+            continue
+        if state not in ('planned', 'renamed'):
+            continue
+
+        p("# Resuming: %s" % op.source)
+
+        at_source = os.path.isfile(op.source) and not os.path.islink(op.source)
+        at_intermediate = os.path.isfile(op.intermediate) and not os.path.islink(op.intermediate)
+        at_destination = os.path.isfile(op.destination)
+
+        try:
+            if state == 'planned' and at_source and op.intermediate != op.source:
+                _renameStep(op)
+                journal.record(op, 'renamed')
+                at_intermediate = True
+
+            if op.destination == op.intermediate:
+                if not at_intermediate:
+                    raise JournalError("File for %s not found, it was moved outside tvnamer" % op.source)
+
+            elif at_intermediate:
+                if at_destination:
+                    if os.path.getsize(op.destination) == os.path.getsize(op.intermediate):
+                        # The copy finished but the original was not yet removed
+                        journal.record(op, movedState(op))
+                        if op.operation == "move":
+                            p("Deleting %s" % op.intermediate)
+                            delete_file(op.intermediate)
+                        journal.record(op, 'done')
+                        continue
+                    else:
+                        # Interrupted part way through a copy
+                        p("Removing partial copy %s" % op.destination)
+                        os.unlink(op.destination)
+                _moveStep(op)
+                journal.record(op, movedState(op))
+
+            elif not at_destination:
+                raise JournalError("File for %s not found, it was moved outside tvnamer" % op.source)
+
+        except (OSError, JournalError) as e:
+            _handleError(op, journal, e)
+        else:
+            journal.record(op, 'done')
+
+
+def _restore(current, original):
+    """Moves current back to original, removing any symlink left behind
+    by leave_symlink
+    """
+    if os.path.islink(original):
+        os.unlink(original)
+    Renamer(current).newPath(
+        new_fullpath = original,
+        always_move = True,
+        apply_replacements = False)
+
+
+def undoJournal(journal):
+    """Reverses every completed (or partially completed) operation in
+    the journal, most recent first. Only the steps recorded in the
+    journal are reversed, so files tvnamer did not write (such as a
+    destination which already existed) are never touched
+    """
+    steps = journal.steps()
+    for op, state in reversed(journal.operations()):
+        done = steps[op.id]
+        if state == 'undone' or not done & set(['renamed', 'moved', 'copied']):
+            continue
+
+        p("# Undoing: %s" % op.source)
+
+        try:
+            if movedState(op) in done and os.path.isfile(op.destination):
+                if op.operation == "copy" and os.path.isfile(op.intermediate):
+                    # Renamed original was left in place, remove the copy
+                    p("Deleting copy %s" % op.destination)
+                    os.unlink(op.destination)
+                else:
+                    _restore(op.destination, op.intermediate)
+
+            if 'renamed' in done:
+                if os.path.isfile(op.intermediate) and not os.path.islink(op.intermediate):
+                    _restore(op.intermediate, op.source)
+                elif not os.path.isfile(op.source):
+                    raise JournalError("File for %s not found, it was moved outside tvnamer" % op.source)
+
+        except (OSError, JournalError) as e:
+            _handleError(op, journal, e)
+        else:
+            journal.record(op, 'undone')
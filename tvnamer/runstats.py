@@ -0,0 +1,262 @@
+#!/usr/bin/env python
+
+"""Holds RunStats singleton, the counts and timings reported at the end
+of a run
+"""
+
+import os
+import time
+import threading
+import contextlib
+
+from tvnamer.hooks import addHook
+
+
+# Stages, in the order they are reported
+STAGES = ['discovery', 'parsing', 'prefetch', 'lookup', 'naming', 'filesystem']
+
+# Upper bounds, in seconds, of the per-file latency histogram buckets
+LATENCY_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30]
+
+
+def formatSize(size):
+    """Formats a number of bytes for display
+
+    >>> formatSize(1536)
+    '1.5 KB'
+    """
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if size < 1024 or unit == 'GB':
+            break
+        size /= 1024.0
+    if unit == 'B':
+        return "%d B" % size
+    return "%.1f %s" % (size, unit)
+
+
+class RunStats(object):
+    """Times spent in each stage, per stage and per file, and counters
+    such as bytes copied. Shared between threads
+    """
+
+    def __init__(self, clock = time.time):
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clears everything, and restarts the wall clock
+        """
+        with self.lock:
+            self.started = self.clock()
+            self.stages = {}
+            self.files = {}
+            self.counters = {}
+            self.caches = {}
+            self.skipped = {}
+            self.histograms = {}
+
+    def add(self, stage, seconds, path = None):
+        """Records seconds spent in stage, on the file at path if given
+        """
+        with self.lock:
+            calls, total = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (calls + 1, total + seconds)
+            if path is not None:
+                self.files[path] = self.files.get(path, 0.0) + seconds
+
+                # Last bucket is for anything above the largest bound
+                counts, total = self.histograms.get(stage, ([0] * (len(LATENCY_BUCKETS) + 1), 0.0))
+                for i, bound in enumerate(LATENCY_BUCKETS):
+                    if seconds <= bound:
+                        break
+                else:
+                    i = len(LATENCY_BUCKETS)
+                counts[i] += 1
+                self.histograms[stage] = (counts, total + seconds)
+
+    def stageEnded(self, stage, path, seconds):
+        """End callback for tvnamer.hooks
+        """
+        self.add(stage, seconds, path = path)
+
+    @contextlib.contextmanager
+    def timed(self, stage, path = None):
+        """Context manager recording the time spent in the block
+        """
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.add(stage, self.clock() - start, path = path)
+
+    def count(self, name, amount = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def skip(self, error):
+        """Records a file skipped because of error, an exception
+        """
+        name = error.__class__.__name__
+        with self.lock:
+            self.skipped[name] = self.skipped.get(name, 0) + 1
+
+    def cache(self, name, hits, misses):
+        """Records the hits and misses of a cache used during the run
+        """
+        with self.lock:
+            self.caches[name] = (hits, misses)
+
+    def report(self, slowest = 5):
+        """Returns the report as a dict, with the slowest files first.
+        Histogram buckets are cumulative, as in Prometheus
+        """
+        with self.lock:
+            slow = sorted(self.files.items(), key = lambda x: (-x[1], x[0]))[:slowest]
+            histograms = {}
+            for name, (counts, seconds) in self.histograms.items():
+                buckets = []
+                total = 0
+                for bound, count in zip(LATENCY_BUCKETS + ["+Inf"], counts):
+                    total += count
+                    buckets.append([bound, total])
+                histograms[name] = {'buckets': buckets, 'sum': seconds, 'count': total}
+            return {
+                'wall_time': self.clock() - self.started,
+                'stages': dict(
+                    (name, {'calls': calls, 'seconds': total})
+                    for name, (calls, total) in self.stages.items()),
+                'counters': dict(self.counters),
+                'caches': dict(
+                    (name, {'hits': hits, 'misses': misses})
+                    for name, (hits, misses) in self.caches.items()),
+                'skipped': dict(self.skipped),
+                'histograms': histograms,
+                'slowest_files': [{'path': path, 'seconds': seconds} for path, seconds in slow]}
+
+
+def formatReport(report):
+    """Returns the lines of a report dict for display
+    """
+    lines = ["# Run report, %.2fs wall time" % report['wall_time']]
+
+    stages = report['stages']
+    for name in STAGES + sorted(set(stages) - set(STAGES)):
+        if name in stages:
+            lines.append("#   %-12s %6d call%s %9.3fs" % (
+                name,
+                stages[name]['calls'],
+                "s" if stages[name]['calls'] != 1 else " ",
+                stages[name]['seconds']))
+
+    counters = report['counters']
+    if counters.get('files_renamed') or counters.get('files_copied'):
+        lines.append("#   renamed %d file%s (%s), copied %d file%s (%s)" % (
+            counters.get('files_renamed', 0),
+            "s" * (counters.get('files_renamed', 0) != 1),
+            formatSize(counters.get('bytes_renamed', 0)),
+            counters.get('files_copied', 0),
+            "s" * (counters.get('files_copied', 0) != 1),
+            formatSize(counters.get('bytes_copied', 0))))
+
+    for name in sorted(report['caches']):
+        cache = report['caches'][name]
+        total = cache['hits'] + cache['misses']
+        if total > 0:
+            lines.append("#   %s cache: %d/%d hits (%d%%)" % (
+                name, cache['hits'], total, 100 * cache['hits'] // total))
+
+    skipped = report['skipped']
+    if skipped:
+        lines.append("#   skipped: %s" % ", ".join(
+            "%d %s" % (skipped[name], name) for name in sorted(skipped)))
+
+    for cur in report['slowest_files']:
+        lines.append("#   slow: %7.3fs %s" % (cur['seconds'], cur['path']))
+
+    return lines
+
+
+# Prometheus counters, and the report counter each is read from
+PROMETHEUS_COUNTERS = [
+    ('tvnamer_files_found_total', "Files found", 'files_found'),
+    ('tvnamer_files_parsed_total', "Files with a parseable filename", 'files_parsed'),
+    ('tvnamer_files_invalid_total', "Files with an unparseable filename", 'files_invalid'),
+    ('tvnamer_files_renamed_total', "Files renamed within their directory", 'renames'),
+    ('tvnamer_files_moved_total', "Files moved to another directory", 'moves'),
+    ('tvnamer_bytes_copied_total', "Bytes copied between partitions", 'bytes_copied')]
+
+
+def formatPrometheus(report, timestamp = None):
+    """Returns a report dict in the Prometheus text exposition format, as
+    read by the node_exporter textfile collector. Counters are for the
+    run the report is of
+
+    >>> print(formatPrometheus({'counters': {'files_found': 2},
+    ...     'skipped': {}, 'histograms': {}, 'wall_time': 1.5}, timestamp = 10))
+    ... # doctest: +ELLIPSIS
+    # HELP tvnamer_files_found_total Files found
+    # TYPE tvnamer_files_found_total counter
+    tvnamer_files_found_total 2
+    ...
+    tvnamer_last_run_timestamp_seconds 10
+    <BLANKLINE>
+    """
+    lines = []
+
+    def metric(name, description, kind, samples):
+        lines.append("# HELP %s %s" % (name, description))
+        lines.append("# TYPE %s %s" % (name, kind))
+        for suffix, labels, value in samples:
+            if labels:
+                labels = "{%s}" % ",".join(
+                    '%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+                    for k, v in labels)
+            else:
+                labels = ""
+            lines.append("%s%s%s %s" % (name, suffix, labels, value))
+
+    counters = report['counters']
+    for name, description, key in PROMETHEUS_COUNTERS:
+        metric(name, description, "counter", [("", [], counters.get(key, 0))])
+
+    metric("tvnamer_files_skipped_total", "Files skipped, by error", "counter", [
+        ("", [("error", error)], count)
+        for error, count in sorted(report['skipped'].items())])
+
+    samples = []
+    for stage in sorted(report['histograms']):
+        histogram = report['histograms'][stage]
+        for bound, count in histogram['buckets']:
+            samples.append(("_bucket", [("stage", stage), ("le", bound)], count))
+        samples.append(("_sum", [("stage", stage)], repr(histogram['sum'])))
+        samples.append(("_count", [("stage", stage)], histogram['count']))
+    metric("tvnamer_stage_file_seconds", "Time spent on each file per stage", "histogram", samples)
+
+    metric("tvnamer_run_seconds", "Wall time of the run", "gauge", [
+        ("", [], repr(report['wall_time']))])
+
+    if timestamp is None:
+        timestamp = time.time()
+    metric("tvnamer_last_run_timestamp_seconds", "When the run finished", "gauge", [
+        ("", [], int(timestamp))])
+
+    return "\n".join(lines) + "\n"
+
+
+def writePrometheus(report, path):
+    """Writes formatPrometheus(report) to path, replacing the file
+    atomically so the textfile collector never reads a partial file
+    """
+    # Temporary file must not end in .prom, or the collector may read it
+    tmp_path = "%s.%d.tmp" % (path, os.getpid())
+    f = open(tmp_path, "w")
+    try:
+        f.write(formatPrometheus(report))
+    finally:
+        f.close()
+    os.rename(tmp_path, path)
+
+
+Stats = RunStats()
+addHook(end = Stats.stageEnded)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+"""Persistent index of directory listings and filename parse results
+
+Used with the scan_index config option, so repeated runs over a large
+library only list directories whose modification time has changed, and
+only parse files which are new or were renamed since the last run.
+
+The episode names found on www.thetvdb.com are also kept, so files which
+are already named correctly can be recognised without looking them up
+again.
+"""
+
+import os
+import time
+import datetime
+import hashlib
+import logging
+
+try:
+    import json
+except ImportError:
+    import simplejson as json
+
+from tvnamer.config import Config
+from tvnamer.utils import (listDirectory, EpisodeInfo, DatedEpisodeInfo,
+NoSeasonEpisodeInfo, AnimeEpisodeInfo)
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+# Config values which change how filenames are parsed. If any of these
+# differ from the run which saved the index, saved parse results are
+# discarded
+PARSE_CONFIG_KEYS = [
+    'filename_patterns',
+    'input_filename_replacements',
+    'input_series_replacements',
+    'extension_pattern']
+
+# Listings of directories modified less than this many seconds before
+# they were listed are not kept: a file added later within the
+# filesystem's timestamp resolution (2 seconds on FAT, and on some SMB
+# and NAS mounts) would leave the mtime unchanged, and never be seen
+MTIME_SETTLE_SECONDS = 2
+
+_EPISODE_CLASSES = dict((cls.__name__, cls) for cls in [
+    EpisodeInfo, DatedEpisodeInfo, NoSeasonEpisodeInfo, AnimeEpisodeInfo])
+
+
+def parseFingerprint():
+    """Returns a hash of the config values affecting parsing
+    """
+    values = [Config[key] for key in PARSE_CONFIG_KEYS]
+    return hashlib.sha1(json.dumps(values, sort_keys = True).encode("utf-8")).hexdigest()
+
+
+def episodeToDict(episode):
+    """Serialises the parsed values of an EpisodeInfo to a dict
+    """
+    if isinstance(episode, DatedEpisodeInfo):
+        episodenumbers = [x.isoformat() for x in episode.episodenumbers]
+    else:
+        episodenumbers = episode.episodenumbers
+
+    return {
+        'class': episode.__class__.__name__,
+        'seriesname': episode.seriesname,
+        'seasonnumber': getattr(episode, 'seasonnumber', None),
+        'episodenumbers': episodenumbers,
+        'extra': episode.extra}
+
+
+def episodeFromDict(data, filename, config = None):
+    """Recreates an EpisodeInfo from the output of episodeToDict, using
+    the ConfigSnapshot config
+    """
+    cls = _EPISODE_CLASSES[data['class']]
+
+    if cls is DatedEpisodeInfo:
+        episodenumbers = [
+            datetime.datetime.strptime(x, "%Y-%m-%d").date() for x in data['episodenumbers']]
+    else:
+        episodenumbers = data['episodenumbers']
+
+    kwargs = {
+        'seriesname': data['seriesname'],
+        'episodenumbers': episodenumbers,
+        'filename': filename,
+        'extra': data['extra'],
+        'config': config}
+    if cls is EpisodeInfo:
+        kwargs['seasonnumber'] = data['seasonnumber']
+    return cls(**kwargs)
+
+
+def namesKey(episode, seriesname):
+    """Returns the key episode names are stored under, from the corrected
+    series name and the parsed season and episode numbers
+    """
+    if isinstance(episode, DatedEpisodeInfo):
+        episodenumbers = [x.isoformat() for x in episode.episodenumbers]
+    else:
+        episodenumbers = episode.episodenumbers
+
+    return json.dumps([
+        Config['language'],
+        Config['order'],
+        episode.__class__.__name__,
+        seriesname,
+        getattr(episode, 'seasonnumber', None),
+        episodenumbers])
+
+
+class ScanIndex(object):
+    """Maps directory paths to their modification time and entries, and
+    file paths to their parse result, and episodes to the names last
+    found for them.
+
+    Counts how much work was skipped in dirs_listed, dirs_skipped,
+    files_parsed, files_skipped and lookups_skipped
+    """
+
+    VERSION = 2
+
+    def __init__(self, path):
+        self.path = os.path.abspath(os.path.expanduser(path))
+        self.dirs = {}
+        self.parsed = {}
+        self.names = {}
+
+        self.dirs_listed = 0
+        self.dirs_skipped = 0
+        self.files_parsed = 0
+        self.files_skipped = 0
+        self.lookups_skipped = 0
+
+        self.fingerprint = parseFingerprint()
+        self._load()
+
+    def _load(self):
+        if not os.path.isfile(self.path):
+            return
+
+        try:
+            data = json.load(open(self.path))
+        except ValueError as e:
+            log().warning("Ignoring unreadable scan index %s: %s" % (self.path, e))
+            return
+
+        if data.get('version') != self.VERSION:
+            return
+
+        self.dirs = data['dirs']
+        self.names = data['names']
+        if data['fingerprint'] == self.fingerprint:
+            self.parsed = data['parsed']
+        else:
+            log().info("Parsing config changed, discarding saved parse results")
+
+    def save(self):
+        """Writes the index, replacing the old file atomically
+        """
+        tmp_path = self.path + ".tmp"
+        f = open(tmp_path, "w")
+        try:
+            json.dump({
+                'version': self.VERSION,
+                'fingerprint': self.fingerprint,
+                'dirs': self.dirs,
+                'parsed': self.parsed,
+                'names': self.names},
+                f,
+                separators = (',', ':'))
+        finally:
+            f.close()
+        os.rename(tmp_path, self.path)
+
+    def listDirectory(self, path):
+        """Returns (files, others) as utils.listDirectory does, only
+        listing the directory if its mtime has changed. Listings of
+        directories modified within MTIME_SETTLE_SECONDS are not kept
+        """
+        path = os.path.abspath(path)
+        mtime = os.stat(path).st_mtime
+        cached = self.dirs.get(path)
+        if cached is not None and cached['mtime'] == mtime:
+            self.dirs_skipped += 1
+            return cached['files'], cached['others']
+
+        self.dirs_listed += 1
+        files, others = listDirectory(path)
+
+        if cached is not None:
+            # Forget parse results of files removed or renamed away
+            for removed in set(cached['files']) - set(files):
+                self.parsed.pop(os.path.join(path, removed), None)
+
+        if abs(time.time() - mtime) < MTIME_SETTLE_SECONDS:
+            self.dirs.pop(path, None)
+        else:
+            self.dirs[path] = {'mtime': mtime, 'files': files, 'others': others}
+        return files, others
+
+    def parse(self, parser):
+        """Returns parser.parse() for a FileParser, reusing the result saved
+        for the same path if there is one. Returns None for files which
+        previously could not be parsed
+        """
+        path = os.path.abspath(parser.path)
+        if path in self.parsed:
+            self.files_skipped += 1
+            data = self.parsed[path]
+            if data is None:
+                return None
+            return episodeFromDict(data, parser.path, config = parser.config)
+
+        self.files_parsed += 1
+        episode = parser.parse()
+        self.parsed[path] = episodeToDict(episode)
+        return episode
+
+    def markInvalid(self, path):
+        """Records that path could not be parsed
+        """
+        self.parsed[os.path.abspath(path)] = None
+
+    def storeNames(self, episode):
+        """Records the series and episode names of an episode populated
+        from www.thetvdb.com
+        """
+        if episode.episodename is None:
+            return
+        self.names[namesKey(episode, episode.seriesname)] = episode.episodename
+
+    def cachedNames(self, episode, seriesname):
+        """Returns the episode name(s) stored for the episode under the
+        corrected series name, or None
+        """
+        return self.names.get(namesKey(episode, seriesname))
+
+    def summary(self):
+        return "listed %d director%s (%d unchanged skipped), parsed %d file%s (%d reused), %d lookup%s skipped" % (
+            self.dirs_listed,
+            "ies" if self.dirs_listed != 1 else "y",
+            self.dirs_skipped,
+            self.files_parsed,
+            "s" * (self.files_parsed != 1),
+            self.files_skipped,
+            self.lookups_skipped,
+            "s" * (self.lookups_skipped != 1))
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+
+"""Rename service, for the --serve mode
+
+Listens for HTTP requests on a Unix socket, only accessible to the user
+running the server, or a localhost port (see client.parseAddress). Files
+are renamed by POSTing JSON (with Content-Type application/json) to
+/rename:
+
+    {"paths": ["/tv/scrubs.s01e01.avi"], "force_name": "Scrubs"}
+
+where paths must be absolute, and force_name and series_id are
+optional (see OVERRIDES). The response is the events (as written by
+--output-format jsonl) for the files:
+
+    {"events": [{"event": "renamed", "path": ...}, ...], "error": null}
+
+Requests with an Origin header (sent by browsers) are rejected, so web
+pages cannot make the server rename files. GET /status returns the
+number of queued and processed requests, and the report of the last
+request.
+
+Requests are queued and processed one at a time by a single worker, so
+the config and the cached series data are shared by all requests
+without locking
+"""
+
+import os
+import stat
+import signal
+import json
+import logging
+import threading
+
+try:
+    import Queue as queue
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn, UnixStreamServer
+except ImportError:
+    import queue
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn, UnixStreamServer
+
+from tvnamer.client import parseAddress
+from tvnamer.compat import all_string_types
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+# Config values a request may override, for the files in that request
+OVERRIDES = ['force_name', 'series_id']
+
+
+class RenameJob(object):
+    """A request waiting for, or being processed by, the worker
+    """
+
+    def __init__(self, paths, overrides):
+        self.paths = paths
+        self.overrides = overrides
+        self.result = None
+        self.done = threading.Event()
+
+
+class RenameService(object):
+    """Processes jobs one at a time in a worker thread. handler is called
+    with the paths and overrides of each job, returning the result
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.jobs = queue.Queue()
+        self.processed = 0
+        self.worker = threading.Thread(target = self._work, name = "tvnamer-worker")
+        self.worker.daemon = True
+
+    def start(self):
+        self.worker.start()
+
+    def stop(self):
+        """Finishes the jobs already queued, then stops the worker
+        """
+        self.jobs.put(None)
+        self.worker.join()
+
+    def submit(self, paths, overrides = None):
+        """Queues a job, returning it. Its result is set when job.done is
+        """
+        job = RenameJob(paths, overrides or {})
+        self.jobs.put(job)
+        return job
+
+    def _work(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            try:
+                job.result = self.handler(job.paths, job.overrides)
+            except Exception as e:
+                # Reported to the requester, the service keeps running
+                log().exception("Request failed")
+                job.result = {'events': [], 'error': "%s: %s" % (e.__class__.__name__, e)}
+            finally:
+                self.processed += 1
+                job.done.set()
+
+
+def parseRequest(data):
+    """Checks the JSON body of a /rename request, returning (paths,
+    overrides). Raises ValueError if it is invalid
+    """
+    request = json.loads(data.decode("utf-8"))
+    if not isinstance(request, dict):
+        raise ValueError("Request must be a JSON object")
+
+    paths = request.pop('paths', None)
+    if not isinstance(paths, list) or len(paths) == 0 or not all(isinstance(x, all_string_types) for x in paths):
+        raise ValueError("'paths' must be a list of paths")
+    for path in paths:
+        if not os.path.isabs(path):
+            raise ValueError("Paths must be absolute: %s" % path)
+
+    for key, value in request.items():
+        if key not in OVERRIDES:
+            raise ValueError("Unknown key %r, expected paths or one of %s" % (key, ", ".join(OVERRIDES)))
+        if value is not None and not isinstance(value, all_string_types):
+            raise ValueError("%r must be a string" % key)
+    return paths, request
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    """Handles the HTTP requests, waiting on the server's service for
+    the results of /rename
+    """
+
+    def log_message(self, format, *args):
+        # Also avoids the address lookup, which fails for Unix sockets
+        log().debug(format % args)
+
+    def _reply(self, code, response):
+        data = json.dumps(response, sort_keys = True).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/status":
+            self._reply(404, {'error': "Unknown path %s" % self.path})
+            return
+        self._reply(200, self.server.status())
+
+    def do_POST(self):
+        # The body is read before replying, even to rejected requests, so
+        # the client is not cut off while still sending it
+        try:
+            data = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        except ValueError:
+            self._reply(400, {'error': "Invalid Content-Length"})
+            return
+
+        if self.path != "/rename":
+            self._reply(404, {'error': "Unknown path %s" % self.path})
+            return
+
+        # Browsers send Origin with cross-site requests, and can only send
+        # JSON to another site after asking with a preflight request
+        # (which is not answered), so web pages cannot rename files
+        if self.headers.get("Origin") is not None:
+            self._reply(403, {'error': "Cross-origin requests are not allowed"})
+            return
+        content_type = self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self._reply(415, {'error': "Content-Type must be application/json"})
+            return
+
+        try:
+            paths, overrides = parseRequest(data)
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+
+        job = self.server.service.submit(paths, overrides)
+        job.done.wait()
+        self._reply(200, job.result)
+
+
+class _ServerMixin(ThreadingMixIn):
+    # Connection threads only wait for the worker
+    daemon_threads = True
+
+    service = None
+    status = None
+
+
+class TCPRenameServer(_ServerMixin, HTTPServer):
+    pass
+
+
+class UnixRenameServer(_ServerMixin, UnixStreamServer):
+    def server_bind(self):
+        # Remove the socket left by a previous server which was killed,
+        # but nothing else
+        try:
+            if stat.S_ISSOCK(os.stat(self.server_address).st_mode):
+                os.unlink(self.server_address)
+        except OSError:
+            pass
+
+        # Only the user running the server may connect
+        umask = os.umask(0o077)
+        try:
+            UnixStreamServer.server_bind(self)
+        finally:
+            os.umask(umask)
+        os.chmod(self.server_address, 0o600)
+
+    def server_close(self):
+        UnixStreamServer.server_close(self)
+        try:
+            os.unlink(self.server_address)
+        except OSError:
+            pass
+
+
+def makeServer(address, service, status):
+    """Returns the server listening at address (see client.parseAddress),
+    which queues requests with service. status is called for the
+    response to /status
+    """
+    target = parseAddress(address)
+    if isinstance(target, tuple):
+        server = TCPRenameServer(target, RequestHandler)
+    else:
+        server = UnixRenameServer(target, RequestHandler)
+    server.service = service
+    server.status = lambda: dict(status(), queued = service.jobs.qsize(), processed = service.processed)
+    return server
+
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt()
+
+
+def serve(address, handler, status = dict, ready = None):
+    """Serves requests at address until interrupted (by Ctrl-C, or
+    SIGTERM when run in the main thread), calling handler in the worker
+    thread with the paths and overrides of each request. ready is called
+    with the server once it is listening
+    """
+    service = RenameService(handler)
+    server = makeServer(address, service, status)
+    service.start()
+    if isinstance(threading.current_thread(), threading._MainThread):
+        signal.signal(signal.SIGTERM, _interrupt)
+    try:
+        if ready is not None:
+            ready(server)
+        server.serve_forever()
+    finally:
+        server.server_close()
+        service.stop()
@@ -34,6 +34,13 @@ class InvalidFilename(BaseTvnamerException):
     pass
 
 
+class PatternTimeoutError(InvalidFilename):
+    """Raised when matching a filename against a pattern takes longer
+    than pattern_match_timeout
+    """
+    pass
+
+
 class UserAbort(BaseTvnamerException):
     """Base exception for config errors
     """
@@ -80,3 +87,17 @@ class EpisodeNameNotFound(DataRetrievalError):
     """Raised when the name of the episode cannot be found
     """
     pass
+
+
+class PathCollision(BaseTvnamerException):
+    """Raised for a file skipped because the path it would be renamed or
+    moved to already exists, or is the target of another file
+    """
+    pass
+
+
+class JournalError(BaseTvnamerException):
+    """Raised when a rename journal cannot be read, or does not match
+    the files on disk
+    """
+    pass
@@ -3,36 +3,198 @@
 """Helpers to deal with strings, unicode objects and terminal output
 """
 
+from __future__ import print_function
+
 import sys
+import time
 from tvnamer.compat import PY2, string_type
 
 
+class _Output(object):
+    """State of the console output shared by p() and the helpers below
+    """
+
+    def __init__(self):
+        # When True, p() drops everything for stdout not marked summary
+        # (or everything, if summary is also False)
+        self.quiet = False
+        self.summary = True
+
+        # Stream written to instead of stdout, or None
+        self.stream = None
+
+        # List of strings while a block is being buffered, otherwise None
+        self.block = None
+
+        # ProgressLine currently shown, or None
+        self.progress = None
+
+
+_output = _Output()
+
+
+def setQuiet(quiet, summary = True):
+    """Only errors (written to stderr) and summary lines are shown when
+    quiet is True. If summary is False, nothing goes to stdout
+    """
+    _output.quiet = quiet
+    _output.summary = summary
+
+
+def redirectOutput(stream):
+    """Everything p() would write to stdout goes to stream instead, so
+    stdout can be kept for machine-readable output. None restores stdout
+    """
+    _output.stream = stream
+
+
+def _stdout():
+    if _output.stream is not None:
+        return _output.stream
+    return sys.stdout
+
+
+def _write(out, file):
+    if _output.progress is not None:
+        _output.progress.clear()
+    file.write(out)
+    if _output.progress is not None:
+        file.flush()
+        _output.progress.draw()
+
+
+def flushOutput():
+    """Writes any buffered block to stdout
+    """
+    if _output.block:
+        block, _output.block = _output.block, []
+        _write("".join(block), _stdout())
+
+
+class bufferedOutput(object):
+    """Context manager collecting everything p() writes to stdout, which
+    is written in one call at the end of the block (or before anything is
+    written to another stream, keeping the order of stdout and stderr).
+    Used around the output for each file, does nothing if enabled is False
+    """
+
+    def __init__(self, enabled = True):
+        self.enabled = enabled and _output.block is None
+
+    def __enter__(self):
+        if self.enabled:
+            _output.block = []
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            flushOutput()
+            _output.block = None
+
+
+class ProgressLine(object):
+    """Single line status for terminals, showing how many of total items
+    are done, redrawn in place on stream (stderr by default). Does nothing
+    unless enabled, and stream is a terminal
+    """
+
+    def __init__(self, total, enabled = True, stream = None, interval = 0.1, clock = time.time):
+        self.total = total
+        self.stream = stream if stream is not None else sys.stderr
+        self.enabled = enabled and hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.interval = interval
+        self.clock = clock
+        self.done = 0
+        self.text = ""
+        self.last_draw = None
+
+    def __enter__(self):
+        if self.enabled:
+            _output.progress = self
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.enabled:
+            # Leaves the last status drawn on screen
+            self.stream.write("\n")
+            self.stream.flush()
+            _output.progress = None
+
+    def update(self, done, current = ""):
+        """Sets the number of items done, and the name of the current one.
+        Redrawn at most every interval seconds
+        """
+        self.done = done
+        percent = 100 * done // self.total if self.total > 0 else 100
+        self.text = "[%d/%d] %3d%% %s" % (done, self.total, percent, current)
+        now = self.clock()
+        if self.enabled and (self.last_draw is None or now - self.last_draw >= self.interval or done == self.total):
+            self.last_draw = now
+            self.clear()
+            self.draw()
+
+    def clear(self):
+        self.stream.write("\r\x1b[K")
+
+    def draw(self):
+        width = _terminalWidth() - 1
+        text = self.text
+        if len(text) > width:
+            text = text[:width - 3] + "..."
+        if PY2 and isinstance(text, unicode):
+            text = text.encode("utf-8")
+        self.stream.write(text)
+        self.stream.flush()
+
+
+def _terminalWidth():
+    try:
+        import shutil
+        return shutil.get_terminal_size().columns
+    except (ImportError, AttributeError, OSError):
+        return 80
+
+
 def p(*args, **kw):
     """Rough implementation of the Python 3 print function,
     http://www.python.org/dev/peps/pep-3105/
 
     def print(*args, sep=' ', end='\n', file=None)
+
+    Lines for stdout are dropped in quiet mode unless summary=True, held
+    back inside a bufferedOutput block, and written to the stream set
+    with redirectOutput if any
     """
 
     kw.setdefault('encoding', 'utf-8')
     kw.setdefault('sep', ' ')
     kw.setdefault('end', '\n')
     kw.setdefault('file', sys.stdout)
+    kw.setdefault('summary', False)
 
-    if not PY2:
-        print(kw['sep'].join(string_type(x) for x in args))
+    to_stdout = kw['file'] is sys.stdout
+    if to_stdout and _output.quiet and not (kw['summary'] and _output.summary):
         return
 
-    new_args = []
-    for x in args:
-        if not isinstance(x, basestring):
-            new_args.append(repr(x))
-        else:
-            if kw['encoding'] is not None:
-                new_args.append(x.encode(kw['encoding']))
+    if not PY2:
+        out = kw['sep'].join(string_type(x) for x in args) + kw['end']
+    else:
+        new_args = []
+        for x in args:
+            if not isinstance(x, basestring):
+                new_args.append(repr(x))
             else:
-                new_args.append(x)
+                if kw['encoding'] is not None:
+                    new_args.append(x.encode(kw['encoding']))
+                else:
+                    new_args.append(x)
 
-    out = kw['sep'].join(new_args)
+        out = kw['sep'].join(new_args) + kw['end']
+
+    if to_stdout and _output.block is not None:
+        _output.block.append(out)
+        return
 
-    kw['file'].write(out + kw['end'])
+    # Anything buffered for stdout goes first, keeping output in order
+    flushOutput()
+    _write(out, _stdout() if to_stdout else kw['file'])
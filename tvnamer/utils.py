@@ -11,14 +11,17 @@ import shutil
 import logging
 import platform
 import errno
-
-from tvdb_api import (tvdb_error, tvdb_shownotfound, tvdb_seasonnotfound,
-tvdb_episodenotfound, tvdb_attributenotfound, tvdb_userabort)
+import zlib
 
 from tvnamer.unicode_helper import p
 from tvnamer.compat import string_type
+from tvnamer.providers import asProvider
 
-from tvnamer.config import Config
+from tvnamer.config import Config, configSnapshot
+from tvnamer.runstats import Stats
+from tvnamer.hooks import stage, staged
+from tvnamer.events import emit
+from tvnamer.regexcheck import canTimeMatches, timedMatch
 from tvnamer.tvnamer_exceptions import (InvalidPath, InvalidFilename,
 ShowNotFound, DataRetrievalError, SeasonNotFound, EpisodeNotFound,
 EpisodeNameNotFound, ConfigValueError, UserAbort)
@@ -30,38 +33,63 @@ def log():
     return logging.getLogger(__name__)
 
 
+# Size of chunks read when copying a file while calculating its CRC32
+COPY_BUFFER_SIZE = 1024 * 1024
+
+
 def warn(text):
-    """Displays message to sys.stderr
+    """Displays message to sys.stderr, and emits it as a "warning" event
     """
     p(text, file = sys.stderr)
+    emit("warning", message = string_type(text))
 
 
-def split_extension(filename):
-    base = re.sub(Config["extension_pattern"], "", filename)
-    ext = filename.replace(base, "")
-    return base, ext
+def _config(config):
+    """Returns config, or the snapshot of the global Config if None
+    """
+    if config is None:
+        return configSnapshot()
+    return config
 
 
-def _applyReplacements(cfile, replacements):
-    """Applies custom replacements.
+def _extensionRegex(config):
+    return re.compile(config['extension_pattern'])
 
-    Argument cfile is string.
 
-    Argument replacements is a list of dicts, with keys "match",
-    "replacement", and (optional) "is_regex"
+def split_extension(filename, config = None):
+    if config is None:
+        config = configSnapshot()
+    base = config.derived(_extensionRegex).sub("", filename)
+    ext = filename.replace(base, "")
+    return base, ext
+
+
+def _compileReplacements(replacements):
+    """Returns custom replacements as a list of (with_extension, compiled
+    regex or None, match, replacement)
     """
+    compiled = []
     for rep in replacements:
-        if not rep.get('with_extension', False):
+        if 'is_regex' in rep and rep['is_regex']:
+            regex = re.compile(rep['match'])
+        else:
+            regex = None
+        compiled.append((rep.get('with_extension', False), regex, rep['match'], rep['replacement']))
+    return compiled
+
+
+def _applyCompiledReplacements(cfile, compiled, config = None):
+    for with_extension, regex, match, replacement in compiled:
+        if not with_extension:
             # By default, preserve extension
-            cfile, cext = split_extension(cfile)
+            cfile, cext = split_extension(cfile, config)
         else:
-            cfile = cfile
             cext = ""
 
-        if 'is_regex' in rep and rep['is_regex']:
-            cfile = re.sub(rep['match'], rep['replacement'], cfile)
+        if regex is not None:
+            cfile = regex.sub(replacement, cfile)
         else:
-            cfile = cfile.replace(rep['match'], rep['replacement'])
+            cfile = cfile.replace(match, replacement)
 
         # Rejoin extension (cext might be empty-string)
         cfile = cfile + cext
@@ -69,22 +97,48 @@ def _applyReplacements(cfile, replacements):
     return cfile
 
 
-def applyCustomInputReplacements(cfile):
+def _applyReplacements(cfile, replacements, config = None):
+    """Applies custom replacements.
+
+    Argument cfile is string.
+
+    Argument replacements is a list of dicts, with keys "match",
+    "replacement", and (optional) "is_regex"
+    """
+    return _applyCompiledReplacements(cfile, _compileReplacements(replacements), config)
+
+
+def _inputReplacements(config):
+    return _compileReplacements(config['input_filename_replacements'])
+
+
+def _outputReplacements(config):
+    return _compileReplacements(config['output_filename_replacements'])
+
+
+def _fullpathReplacements(config):
+    return _compileReplacements(config['move_files_fullpath_replacements'])
+
+
+def applyCustomInputReplacements(cfile, config = None):
     """Applies custom input filename replacements, wraps _applyReplacements
     """
-    return _applyReplacements(cfile, Config['input_filename_replacements'])
+    config = _config(config)
+    return _applyCompiledReplacements(cfile, config.derived(_inputReplacements), config)
 
 
-def applyCustomOutputReplacements(cfile):
+def applyCustomOutputReplacements(cfile, config = None):
     """Applies custom output filename replacements, wraps _applyReplacements
     """
-    return _applyReplacements(cfile, Config['output_filename_replacements'])
+    config = _config(config)
+    return _applyCompiledReplacements(cfile, config.derived(_outputReplacements), config)
 
 
-def applyCustomFullpathReplacements(cfile):
+def applyCustomFullpathReplacements(cfile, config = None):
     """Applies custom replacements to full path, wraps _applyReplacements
     """
-    return _applyReplacements(cfile, Config['move_files_fullpath_replacements'])
+    config = _config(config)
+    return _applyCompiledReplacements(cfile, config.derived(_fullpathReplacements), config)
 
 
 def cleanRegexedSeriesName(seriesname):
@@ -108,7 +162,42 @@ def cleanRegexedSeriesName(seriesname):
     return seriesname.strip()
 
 
-def replaceInputSeriesName(seriesname):
+# Maximum number of raw series names kept by resolveSeriesName
+SERIES_NAME_MEMO_SIZE = 4096
+
+# Snapshot the series name memo was last checked against, the
+# input_series_replacements the compiled patterns and memo were made
+# from, the compiled (pattern, replacement) pairs, and the memo of raw
+# series name to resolved name
+_series_replacements_config = None
+_series_replacements_key = None
+_series_replacements = []
+_series_name_memo = {}
+
+
+def _compiledSeriesReplacements(config = None):
+    """Returns input_series_replacements as a list of (compiled regex,
+    replacement), recompiling (and clearing the series name memo) when
+    they differ from the last config used
+    """
+    global _series_replacements_config, _series_replacements_key, _series_replacements
+
+    config = _config(config)
+    if config is _series_replacements_config:
+        return _series_replacements
+
+    key = tuple(config['input_series_replacements'].items())
+    if key != _series_replacements_key:
+        _series_replacements = [
+            (re.compile(pat, re.IGNORECASE|re.UNICODE), replacement)
+            for pat, replacement in key]
+        _series_replacements_key = key
+        _series_name_memo.clear()
+    _series_replacements_config = config
+    return _series_replacements
+
+
+def replaceInputSeriesName(seriesname, config = None):
     """allow specified replacements of series names
 
     in cases where default filenames match the wrong series,
@@ -116,13 +205,35 @@ def replaceInputSeriesName(seriesname):
 
     This helps the TVDB query get the right match.
     """
-    for pat, replacement in Config['input_series_replacements'].items():
-        if re.match(pat, seriesname, re.IGNORECASE|re.UNICODE):
+    for pat, replacement in _compiledSeriesReplacements(config):
+        if pat.match(seriesname):
             return replacement
     return seriesname
 
 
-def replaceOutputSeriesName(seriesname):
+def resolveSeriesName(seriesname, config = None):
+    """Cleans (cleanRegexedSeriesName) and replaces
+    (replaceInputSeriesName) a series name captured by a filename pattern.
+
+    Every file in a season folder usually has the same raw series name,
+    so results are memoised. The memo is cleared when it reaches
+    SERIES_NAME_MEMO_SIZE names, or input_series_replacements changes
+    """
+    config = _config(config)
+    _compiledSeriesReplacements(config)
+    try:
+        return _series_name_memo[seriesname]
+    except KeyError:
+        pass
+
+    resolved = replaceInputSeriesName(cleanRegexedSeriesName(seriesname), config)
+    if len(_series_name_memo) >= SERIES_NAME_MEMO_SIZE:
+        _series_name_memo.clear()
+    _series_name_memo[seriesname] = resolved
+    return resolved
+
+
+def replaceOutputSeriesName(seriesname, config = None):
     """transform TVDB series names
 
     after matching from TVDB, transform the series name for desired abbreviation, etc.
@@ -130,7 +241,7 @@ def replaceOutputSeriesName(seriesname):
     This affects the output filename.
     """
 
-    return Config['output_series_replacements'].get(seriesname, seriesname)
+    return _config(config)['output_series_replacements'].get(seriesname, seriesname)
 
 
 def handleYear(year):
@@ -154,6 +265,20 @@ def handleYear(year):
         return 1900 + year
 
 
+def listDirectory(path):
+    """Returns a tuple of two lists, the names of the files in directory
+    path, and the names of all other entries (directories etc)
+    """
+    files = []
+    others = []
+    for subf in os.listdir(string_type(path)):
+        if os.path.isfile(os.path.join(path, subf)):
+            files.append(subf)
+        else:
+            others.append(subf)
+    return files, others
+
+
 class FileFinder(object):
     """Given a file, it will verify it exists. Given a folder it will descend
     one level into it and return a list of files, unless the recursive argument
@@ -167,10 +292,14 @@ class FileFinder(object):
     the filename (minus the extension). If a match is found, the file is skipped
     (e.g. for filtering out "sample" files). If [] or None is supplied, no
     filtering is done
+
+    The index argument is an optional tvnamer.scanindex.ScanIndex, used to
+    skip listing directories which have not changed since the last run
     """
 
-    def __init__(self, path, with_extension = None, filename_blacklist = None, recursive = False):
+    def __init__(self, path, with_extension = None, filename_blacklist = None, recursive = False, index = None):
         self.path = path
+        self.index = index
         if with_extension is None:
             self.with_extension = []
         else:
@@ -181,6 +310,7 @@ class FileFinder(object):
             self.with_blacklist = filename_blacklist
         self.recursive = recursive
 
+    @staged('discovery')
     def findFiles(self):
         """Returns list of files found at path
         """
@@ -275,57 +405,110 @@ class FileFinder(object):
             log().info("Skipping inaccessible path %s" % startpath)
             return allfiles
 
-        for subf in os.listdir(string_type(startpath)):
-            newpath = os.path.join(startpath, subf)
-            newpath = os.path.abspath(newpath)
-            if os.path.isfile(newpath):
-                if not self._checkExtension(subf):
-                    continue
-                elif self._blacklistedFilename(subf):
-                    continue
-                else:
-                    allfiles.append(newpath)
+        if self.index is not None:
+            files, others = self.index.listDirectory(startpath)
+        else:
+            files, others = listDirectory(startpath)
+
+        for subf in files:
+            newpath = os.path.abspath(os.path.join(startpath, subf))
+            if not self._checkExtension(subf):
+                continue
+            elif self._blacklistedFilename(subf):
+                continue
             else:
-                if self.recursive:
-                    allfiles.extend(self._findFilesInPath(newpath))
-                #end if recursive
-            #end if isfile
-        #end for sf
+                allfiles.append(newpath)
+
+        if self.recursive:
+            for subf in others:
+                newpath = os.path.abspath(os.path.join(startpath, subf))
+                allfiles.extend(self._findFilesInPath(newpath))
+
         return allfiles
 
 
+def _compileRegexs(config):
+    """Takes episode_patterns from config, returns them compiled
+    """
+    key = tuple(config['filename_patterns'])
+    if key in FileParser._compiled_cache:
+        return FileParser._compiled_cache[key]
+
+    compiled_regexs = []
+    for cpattern in config['filename_patterns']:
+        try:
+            cregex = re.compile(cpattern, re.VERBOSE)
+        except re.error as errormsg:
+            warn("WARNING: Invalid episode_pattern (error: %s)\nPattern:\n%s" % (
+                errormsg, cpattern))
+        else:
+            compiled_regexs.append(cregex)
+
+    FileParser._compiled_cache[key] = compiled_regexs
+    return compiled_regexs
+
+
+def _patternGroups(config):
+    """Returns the names of the groups in the filename patterns
+    """
+    names = set()
+    for cregex in config.derived(_compileRegexs):
+        names.update(cregex.groupindex)
+    return frozenset(names)
+
+
+class _TemplateValues(dict):
+    """Values for an output filename template. Groups of the filename
+    patterns which did not match are not kept in EpisodeInfo.extra, so
+    are looked up here as None
+    """
+
+    def __init__(self, values, groups):
+        dict.__init__(self, values)
+        self.groups = groups
+
+    def __missing__(self, key):
+        if key in self.groups:
+            return None
+        raise KeyError(key)
+
+
 class FileParser(object):
     """Deals with parsing of filenames
     """
 
-    def __init__(self, path):
+    # Compiled filename_patterns, keyed by the tuple of pattern strings,
+    # so the patterns are compiled once per process rather than per file
+    _compiled_cache = {}
+
+    def __init__(self, path, config = None):
         self.path = path
-        self.compiled_regexs = []
-        self._compileRegexs()
+        self.config = _config(config)
+        self.compiled_regexs = self.config.derived(_compileRegexs)
 
-    def _compileRegexs(self):
-        """Takes episode_patterns from config, compiles them all
-        into self.compiled_regexs
+    def _matchPatterns(self, filename):
+        """Yields each compiled pattern with its match against filename
+        (or None), raising PatternTimeoutError if one takes longer than
+        pattern_match_timeout
         """
-        for cpattern in Config['filename_patterns']:
-            try:
-                cregex = re.compile(cpattern, re.VERBOSE)
-            except re.error as errormsg:
-                warn("WARNING: Invalid episode_pattern (error: %s)\nPattern:\n%s" % (
-                    errormsg, cpattern))
-            else:
-                self.compiled_regexs.append(cregex)
+        timeout = self.config['pattern_match_timeout']
+        if not timeout or not canTimeMatches():
+            for cmatcher in self.compiled_regexs:
+                yield cmatcher, cmatcher.match(filename)
+        else:
+            for cmatcher in self.compiled_regexs:
+                yield cmatcher, timedMatch(cmatcher, filename, timeout, path = self.path)
 
+    @staged('parsing', 'path')
     def parse(self):
         """Runs path via configured regex, extracting data from groups.
         Returns an EpisodeInfo instance containing extracted data.
         """
         _, filename = os.path.split(self.path)
 
-        filename = applyCustomInputReplacements(filename)
+        filename = applyCustomInputReplacements(filename, self.config)
 
-        for cmatcher in self.compiled_regexs:
-            match = cmatcher.match(filename)
+        for cmatcher, match in self._matchPatterns(filename):
             if match:
                 namedgroups = match.groupdict().keys()
 
@@ -382,8 +565,7 @@ class FileParser(object):
                         "Regex must contain seriesname. Pattern was:\n" + cmatcher.pattern)
 
                 if seriesname != None:
-                    seriesname = cleanRegexedSeriesName(seriesname)
-                    seriesname = replaceInputSeriesName(seriesname)
+                    seriesname = resolveSeriesName(seriesname, self.config)
 
                 extra_values = match.groupdict()
 
@@ -395,31 +577,35 @@ class FileParser(object):
                         seasonnumber = seasonnumber,
                         episodenumbers = episodenumbers,
                         filename = self.path,
-                        extra = extra_values)
+                        extra = extra_values,
+                        config = self.config)
                 elif 'year' in namedgroups and 'month' in namedgroups and 'day' in namedgroups:
                     episode = DatedEpisodeInfo(
                         seriesname = seriesname,
                         episodenumbers = episodenumbers,
                         filename = self.path,
-                        extra = extra_values)
+                        extra = extra_values,
+                        config = self.config)
                 elif 'group' in namedgroups:
                     episode = AnimeEpisodeInfo(
                         seriesname = seriesname,
                         episodenumbers = episodenumbers,
                         filename = self.path,
-                        extra = extra_values)
+                        extra = extra_values,
+                        config = self.config)
                 else:
                     # No season number specified, usually for Anime
                     episode = NoSeasonEpisodeInfo(
                         seriesname = seriesname,
                         episodenumbers = episodenumbers,
                         filename = self.path,
-                        extra = extra_values)
+                        extra = extra_values,
+                        config = self.config)
 
                 return episode
         else:
             emsg = "Cannot parse %r" % self.path
-            if len(Config['input_filename_replacements']) > 0:
+            if len(self.config['input_filename_replacements']) > 0:
                 emsg += " with replacements: %r" % filename
             raise InvalidFilename(emsg)
 
@@ -458,7 +644,7 @@ def formatEpisodeName(names, join_with, multiep_format):
     return multiep_format % {'epname': found_name, 'episodemin': min(numbers), 'episodemax': max(numbers)}
 
 
-def makeValidFilename(value, normalize_unicode = False, windows_safe = False, custom_blacklist = None, replace_with = "_"):
+def makeValidFilename(value, normalize_unicode = False, windows_safe = False, custom_blacklist = None, replace_with = "_", config = None):
     """
     Takes a string and makes it into a valid filename.
 
@@ -473,30 +659,32 @@ def makeValidFilename(value, normalize_unicode = False, windows_safe = False, cu
         >>> makeValidFilename("T.est.avi", custom_blacklist=".")
         'T_est.avi'
     """
+    sysname, blacklist = _filenameBlacklist(windows_safe, custom_blacklist)
+    return _makeValidFilename(value, sysname, blacklist, normalize_unicode, replace_with, config)
 
+
+_blacklist_cache = {}
+
+
+def _filenameBlacklist(windows_safe, custom_blacklist):
+    """Returns the name of the system filenames are made valid for, and
+    the compiled regex of characters not allowed in them
+    """
+    key = (windows_safe, custom_blacklist)
+    if key not in _blacklist_cache:
+        _blacklist_cache[key] = _makeFilenameBlacklist(windows_safe, custom_blacklist)
+    return _blacklist_cache[key]
+
+
+def _makeFilenameBlacklist(windows_safe, custom_blacklist):
+    """Works out the value of _filenameBlacklist
+    """
     if windows_safe:
         # Allow user to make Windows-safe filenames, if they so choose
         sysname = "Windows"
     else:
         sysname = platform.system()
 
-    # If the filename starts with a . prepend it with an underscore, so it
-    # doesn't become hidden.
-
-    # This is done before calling splitext to handle filename of ".", as
-    # splitext acts differently in python 2.5 and 2.6 - 2.5 returns ('', '.')
-    # and 2.6 returns ('.', ''), so rather than special case '.', this
-    # special-cases all files starting with "." equally (since dotfiles have
-    # no extension)
-    if value.startswith("."):
-        value = "_" + value
-
-    # Treat extension seperatly
-    value, extension = split_extension(value)
-
-    # Remove any null bytes
-    value = value.replace("\0", "")
-
     # Blacklist of characters
     if sysname == 'Darwin':
         # : is technically allowed, but Finder will treat it as / and will
@@ -514,8 +702,31 @@ def makeValidFilename(value, normalize_unicode = False, windows_safe = False, cu
     if custom_blacklist is not None:
         blacklist += custom_blacklist
 
+    return sysname, re.compile("[%s]" % re.escape(blacklist))
+
+
+def _makeValidFilename(value, sysname, blacklist, normalize_unicode, replace_with, config):
+    """makeValidFilename, with the blacklist from _filenameBlacklist
+    """
+    # If the filename starts with a . prepend it with an underscore, so it
+    # doesn't become hidden.
+
+    # This is done before calling splitext to handle filename of ".", as
+    # splitext acts differently in python 2.5 and 2.6 - 2.5 returns ('', '.')
+    # and 2.6 returns ('.', ''), so rather than special case '.', this
+    # special-cases all files starting with "." equally (since dotfiles have
+    # no extension)
+    if value.startswith("."):
+        value = "_" + value
+
+    # Treat extension seperatly
+    value, extension = split_extension(value, config)
+
+    # Remove any null bytes
+    value = value.replace("\0", "")
+
     # Replace every blacklisted character with a underscore
-    value = re.sub("[%s]" % re.escape(blacklist), replace_with, value)
+    value = blacklist.sub(replace_with, value)
 
     # Remove any trailing whitespace
     value = value.strip()
@@ -555,23 +766,150 @@ def makeValidFilename(value, normalize_unicode = False, windows_safe = False, cu
     return value + extension
 
 
-def formatEpisodeNumbers(episodenumbers):
+def formatEpisodeNumbers(episodenumbers, config = None):
     """Format episode number(s) into string, using configured values
     """
+    if config is None:
+        config = configSnapshot()
+    episode_single = config['episode_single']
     if len(episodenumbers) == 1:
-        epno = Config['episode_single'] % episodenumbers[0]
+        epno = episode_single % episodenumbers[0]
     else:
-        epno = Config['episode_separator'].join(
-            Config['episode_single'] % x for x in episodenumbers)
+        epno = config['episode_separator'].join(
+            episode_single % x for x in episodenumbers)
 
     return epno
 
 
+def _filenameSanitiser(config):
+    """Returns a function applying makeValidFilename with the configured
+    options, with the blacklist worked out once
+    """
+    sysname, blacklist = _filenameBlacklist(
+        config['windows_safe_filenames'],
+        config['custom_filename_character_blacklist'])
+    normalize_unicode = config['normalize_unicode_filenames']
+    replace_with = config['replace_invalid_characters_with']
+
+    def sanitise(value):
+        return _makeValidFilename(value, sysname, blacklist, normalize_unicode, replace_with, config)
+    return sanitise
+
+
+_TEMPLATE_FIELD = re.compile(r"%(?:\((?P<name>[^)]+)\))?[-#0 +]*[0-9]*(?:\.[0-9]+)?(?P<conv>[a-zA-Z%])")
+
+_template_regex_cache = {}
+
+
+def outputTemplateRegex(template):
+    """Returns a compiled regex matching filenames generated from an
+    output template such as Config['filename_with_episode'], with a named
+    group for each mapping key in the template
+
+    >>> outputTemplateRegex("%(seriesname)s - [%(seasonnumber)02dx%(episode)s]%(ext)s").match(
+    ...     "Scrubs - [01x02].avi").group("seriesname")
+    'Scrubs'
+    """
+    if template in _template_regex_cache:
+        return _template_regex_cache[template]
+
+    parts = []
+    seen = set()
+    pos = 0
+    for field in _TEMPLATE_FIELD.finditer(template):
+        parts.append(re.escape(template[pos:field.start()]))
+        pos = field.end()
+
+        name, conv = field.group("name"), field.group("conv")
+        if conv == "%":
+            parts.append("%")
+            continue
+
+        if conv in "di":
+            value = "[0-9]+"
+        elif name == "ext":
+            # Stops lazy fields before it swallowing the extension
+            value = "(?:\\.[^.\\s]+)*"
+        else:
+            value = ".+?"
+
+        if name is None:
+            parts.append("(?:%s)" % value)
+        elif name in seen:
+            parts.append("(?P=%s)" % name)
+        else:
+            seen.add(name)
+            parts.append("(?P<%s>%s)" % (name, value))
+    parts.append(re.escape(template[pos:]))
+
+    regex = re.compile("^%s$" % "".join(parts), re.DOTALL)
+    _template_regex_cache[template] = regex
+    return regex
+
+
+def parseOutputFilename(episode, config = None):
+    """Parses the episode's filename back through the output templates
+    for its type (filename_with_episode etc). Returns a dict of the
+    template fields if one matches, otherwise None. config defaults to
+    the episode's
+    """
+    if config is None:
+        config = _config(episode.config)
+    cfgkeys = [
+        episode.CFG_KEY_WITH_EP,
+        episode.CFG_KEY_WITHOUT_EP,
+        getattr(episode, "CFG_KEY_WITH_EP_NO_CRC", None),
+        getattr(episode, "CFG_KEY_WITHOUT_EP_NO_CRC", None)]
+
+    for cfgkey in cfgkeys:
+        if cfgkey is None:
+            continue
+        match = outputTemplateRegex(config[cfgkey]).match(episode.fullfilename)
+        if match is not None:
+            return match.groupdict()
+    return None
+
+
+# Maximum number of strings kept by internString. Cleared when full, so
+# long running processes (--watch, --serve) do not keep every value seen
+INTERN_TABLE_SIZE = 16384
+
+_interned = {}
+
+
+def internString(value):
+    """Returns a single shared copy of value, for strings repeated across
+    many episodes (series names, directories, extensions). Unlike the
+    intern builtin, works for unicode strings in Python 2
+    """
+    if value is None:
+        return None
+    try:
+        return _interned[value]
+    except KeyError:
+        if len(_interned) >= INTERN_TABLE_SIZE:
+            _interned.clear()
+        _interned[value] = value
+        return value
+
+
 class EpisodeInfo(object):
     """Stores information (season, episode number, episode name), and contains
     logic to generate new name
+
+    Uses __slots__ to keep large numbers of instances small: series names,
+    directories and extensions are interned, only regex groups which
+    matched are kept in extra, and fullpath and originalfilename are only
+    stored when they cannot be worked out from the other attributes.
+
+    config is the ConfigSnapshot used for the extension and the new name,
+    the snapshot of the global Config at the time it is needed if None
     """
 
+    __slots__ = ('_seriesname', 'seasonnumber', 'episodenumbers', 'episodename',
+        'filepath', 'filename', 'extension', '_fullpath', '_originalfilename', 'extra',
+        'config')
+
     CFG_KEY_WITH_EP = "filename_with_episode"
     CFG_KEY_WITHOUT_EP = "filename_without_episode"
 
@@ -581,36 +919,87 @@ class EpisodeInfo(object):
         episodenumbers,
         episodename = None,
         filename = None,
-        extra = None):
+        extra = None,
+        config = None):
 
         self.seriesname = seriesname
         self.seasonnumber = seasonnumber
         self.episodenumbers = episodenumbers
         self.episodename = episodename
+        self._setFile(filename, extra, config)
+
+    def _setFile(self, filename, extra, config):
+        """Sets the config, path and extra values, shared by the
+        subclasses' constructors
+        """
+        self.config = config
+        # originalfilename remains untouched, for use when renaming
+        # file. Until fullpath changes, it is the current filename
+        self._originalfilename = None
+        self.filename = None
         self.fullpath = filename
-        if filename is not None:
-            # Remains untouched, for use when renaming file
-            self.originalfilename = os.path.basename(filename)
-        else:
-            self.originalfilename = None
 
         if extra is None:
-            extra = {}
-        self.extra = extra
+            self.extra = {}
+        else:
+            # Values of the regex groups repeat for every file of a
+            # series or season, so are interned (except the crc, which
+            # differs for every file)
+            self.extra = dict(
+                (k, v if k == 'crc' else internString(v))
+                for k, v in extra.items() if v is not None)
+
+    def seriesname_get(self):
+        return self._seriesname
+
+    def seriesname_set(self, value):
+        self._seriesname = internString(value)
+
+    seriesname = property(seriesname_get, seriesname_set)
 
     def fullpath_get(self):
+        if self._fullpath is None and self.filename is not None:
+            return os.path.join(self.filepath, self.fullfilename)
         return self._fullpath
 
     def fullpath_set(self, value):
-        self._fullpath = value
+        if self.filename is not None and self._originalfilename is None:
+            # Keep the name the file had before the path first changes
+            self._originalfilename = self.fullfilename
+
         if value is None:
-            self.filename, self.extension = None, None
+            self.filepath, self.filename, self.extension = None, None, None
+            self._fullpath = None
+            return
+
+        filepath, filename = os.path.split(value)
+        filename, extension = split_extension(filename, self.config)
+        self.filepath = internString(filepath)
+        self.filename = filename
+        self.extension = internString(extension)
+
+        if self._originalfilename is None and self.fullfilename != os.path.basename(value):
+            # split_extension did not split the name cleanly
+            self._originalfilename = os.path.basename(value)
+
+        if os.path.join(self.filepath, self.fullfilename) == value:
+            # Rebuilt from the parts when needed
+            self._fullpath = None
         else:
-            self.filepath, self.filename = os.path.split(value)
-            self.filename, self.extension = split_extension(self.filename)
+            self._fullpath = value
 
     fullpath = property(fullpath_get, fullpath_set)
 
+    def originalfilename_get(self):
+        if self._originalfilename is None and self.filename is not None:
+            return self.fullfilename
+        return self._originalfilename
+
+    def originalfilename_set(self, value):
+        self._originalfilename = value
+
+    originalfilename = property(originalfilename_get, originalfilename_set)
+
     @property
     def fullfilename(self):
         return u"%s%s" % (self.filename, self.extension)
@@ -627,51 +1016,41 @@ class EpisodeInfo(object):
             self.seasonnumber,
             ", ".join([str(x) for x in self.episodenumbers]))
 
+    @staged('lookup', 'fullpath')
     def populateFromTvdb(self, tvdb_instance, force_name=None, series_id=None):
-        """Queries the tvdb_api.Tvdb instance for episode name and corrected
-        series name.
+        """Looks up the episode name and corrected series name, using a
+        tvnamer.providers.MetadataProvider, or a tvdb_api.Tvdb instance.
         If series cannot be found, it will warn the user. If the episode is not
         found, it will use the corrected show name and not set an episode name.
         If the site is unreachable, it will warn the user. If the user aborts
         it will catch tvdb_api's user abort error and raise tvnamer's
         """
-        try:
-            if series_id is None:
-                show = tvdb_instance[force_name or self.seriesname]
-            else:
-                series_id = int(series_id)
-                tvdb_instance._getShowData(series_id, Config['language'])
-                show = tvdb_instance[series_id]
-        except tvdb_error as errormsg:
-            raise DataRetrievalError("Error with www.thetvdb.com: %s" % errormsg)
-        except tvdb_shownotfound:
-            # No such series found.
-            raise ShowNotFound("Show %s not found on www.thetvdb.com" % self.seriesname)
-        except tvdb_userabort as error:
-            raise UserAbort(string_type(error))
-        else:
-            # Series was found, use corrected series name
-            self.seriesname = replaceOutputSeriesName(show['seriesname'])
+        provider = asProvider(tvdb_instance)
+
+        show = provider.getSeries(name = force_name or self.seriesname, series_id = series_id)
+
+        # Series was found, use corrected series name
+        self.seriesname = replaceOutputSeriesName(provider.seriesName(show), self.config)
 
         if isinstance(self, DatedEpisodeInfo):
             # Date-based episode
             epnames = []
             for cepno in self.episodenumbers:
                 try:
-                    sr = show.airedOn(cepno)
-                    if len(sr) > 1:
-                        # filter out specials if multiple episodes aired on the day
-                        sr = [ s for s in sr if s['seasonnumber'] != '0' ]
-                    
-                    if len(sr) > 1:
-                        raise EpisodeNotFound(
-                            "Ambigious air date %s, there were %s episodes on that day" % (
-                            cepno, len(sr)))
-                    epnames.append(sr[0]['episodename'])
-                except tvdb_episodenotfound:
+                    sr = provider.episodesAiredOn(show, cepno)
+                except EpisodeNotFound:
                     raise EpisodeNotFound(
                         "Episode that aired on %s could not be found" % (
                         cepno))
+                if len(sr) > 1:
+                    # filter out specials if multiple episodes aired on the day
+                    sr = [ s for s in sr if s['seasonnumber'] != 0 ]
+
+                if len(sr) > 1:
+                    raise EpisodeNotFound(
+                        "Ambigious air date %s, there were %s episodes on that day" % (
+                        cepno, len(sr)))
+                epnames.append(sr[0]['episodename'])
             self.episodename = epnames
             return
 
@@ -684,22 +1063,22 @@ class EpisodeInfo(object):
         epnames = []
         for cepno in self.episodenumbers:
             try:
-                episodeinfo = show[seasonnumber][cepno]
+                episodename = provider.episodeName(show, seasonnumber, cepno)
 
-            except tvdb_seasonnotfound:
+            except SeasonNotFound:
                 raise SeasonNotFound(
                     "Season %s of show %s could not be found" % (
                     seasonnumber,
                     self.seriesname))
 
-            except tvdb_episodenotfound:
+            except EpisodeNotFound:
                 # Try to search by absolute_number
-                sr = show.search(cepno, "absolute_number")
+                sr = provider.episodesByAbsoluteNumber(show, cepno)
                 if len(sr) > 1:
                     # For multiple results try and make sure there is a direct match
                     unsure = True
                     for e in sr:
-                        if int(e['absolute_number']) == cepno:
+                        if e['absolute_number'] == cepno:
                             epnames.append(e['episodename'])
                             unsure = False
                     # If unsure error out
@@ -715,11 +1094,11 @@ class EpisodeInfo(object):
                             self.seriesname,
                             seasonnumber))
 
-            except tvdb_attributenotfound:
+            except EpisodeNameNotFound:
                 raise EpisodeNameNotFound(
                     "Could not find episode name for %s" % cepno)
             else:
-                epnames.append(episodeinfo['episodename'])
+                epnames.append(episodename)
 
         self.episodename = epnames
 
@@ -732,7 +1111,7 @@ class EpisodeInfo(object):
         episode_separator # used to join multiple episode numbers
         """
         # Format episode number into string, or a list
-        epno = formatEpisodeNumbers(self.episodenumbers)
+        epno = formatEpisodeNumbers(self.episodenumbers, self.config)
 
         # Data made available to config'd output file format
         if self.extension is None:
@@ -750,44 +1129,41 @@ class EpisodeInfo(object):
 
         return epdata
 
+    @staged('naming', 'fullpath')
     def generateFilename(self, lowercase = False, preview_orig_filename = False):
+        config = _config(self.config)
         epdata = self.getepdata()
 
         # Add in extra dict keys, without clobbering existing values in epdata
-        extra = self.extra.copy()
+        extra = _TemplateValues(self.extra, config.derived(_patternGroups))
         extra.update(epdata)
         epdata = extra
 
         if self.episodename is None:
-            fname = Config[self.CFG_KEY_WITHOUT_EP] % epdata
+            fname = config[self.CFG_KEY_WITHOUT_EP] % epdata
         else:
             if isinstance(self.episodename, list):
                 epdata['episodename'] = formatEpisodeName(
                     self.episodename,
-                    join_with = Config['multiep_join_name_with'],
-                    multiep_format = Config['multiep_format'])
-            fname = Config[self.CFG_KEY_WITH_EP] % epdata
+                    join_with = config['multiep_join_name_with'],
+                    multiep_format = config['multiep_format'])
+            fname = config[self.CFG_KEY_WITH_EP] % epdata
 
-        if Config['titlecase_filename']:
+        if config['titlecase_filename']:
             from tvnamer._titlecase import titlecase
             fname = titlecase(fname)
 
-        if lowercase or Config['lowercase_filename']:
+        if lowercase or config['lowercase_filename']:
             fname = fname.lower()
 
         if preview_orig_filename:
             # Return filename without custom replacements or filesystem-validness
             return fname
 
-        if len(Config['output_filename_replacements']) > 0:
-            fname = applyCustomOutputReplacements(fname)
+        if len(config['output_filename_replacements']) > 0:
+            fname = applyCustomOutputReplacements(fname, config)
 
-        return makeValidFilename(
-            fname,
-            normalize_unicode = Config['normalize_unicode_filenames'],
-            windows_safe = Config['windows_safe_filenames'],
-            custom_blacklist = Config['custom_filename_character_blacklist'],
-            replace_with = Config['replace_invalid_characters_with'])
+        return config.derived(_filenameSanitiser)(fname)
 
     def __repr__(self):
         return u"<%s: %r>" % (
@@ -796,6 +1172,8 @@ class EpisodeInfo(object):
 
 
 class DatedEpisodeInfo(EpisodeInfo):
+    __slots__ = ()
+
     CFG_KEY_WITH_EP = "filename_with_date_and_episode"
     CFG_KEY_WITHOUT_EP = "filename_with_date_without_episode"
 
@@ -804,28 +1182,13 @@ class DatedEpisodeInfo(EpisodeInfo):
         episodenumbers,
         episodename = None,
         filename = None,
-        extra = None):
+        extra = None,
+        config = None):
 
         self.seriesname = seriesname
         self.episodenumbers = episodenumbers
         self.episodename = episodename
-        self.fullpath = filename
-
-        if filename is not None:
-            # Remains untouched, for use when renaming file
-            self.originalfilename = os.path.basename(filename)
-        else:
-            self.originalfilename = None
-
-        if filename is not None:
-            # Remains untouched, for use when renaming file
-            self.originalfilename = os.path.basename(filename)
-        else:
-            self.originalfilename = None
-
-        if extra is None:
-            extra = {}
-        self.extra = extra
+        self._setFile(filename, extra, config)
 
     def sortable_info(self):
         """Returns a tuple of sortable information
@@ -842,10 +1205,11 @@ class DatedEpisodeInfo(EpisodeInfo):
         # Format episode number into string, or a list
         dates = str(self.episodenumbers[0])
         if isinstance(self.episodename, list):
+            config = _config(self.config)
             prep_episodename = formatEpisodeName(
                 self.episodename,
-                join_with = Config['multiep_join_name_with'],
-                multiep_format = Config['multiep_format'])
+                join_with = config['multiep_join_name_with'],
+                multiep_format = config['multiep_format'])
         else:
             prep_episodename = self.episodename
 
@@ -865,6 +1229,8 @@ class DatedEpisodeInfo(EpisodeInfo):
 
 
 class NoSeasonEpisodeInfo(EpisodeInfo):
+    __slots__ = ()
+
     CFG_KEY_WITH_EP = "filename_with_episode_no_season"
     CFG_KEY_WITHOUT_EP = "filename_without_episode_no_season"
 
@@ -873,22 +1239,13 @@ class NoSeasonEpisodeInfo(EpisodeInfo):
         episodenumbers,
         episodename = None,
         filename = None,
-        extra = None):
+        extra = None,
+        config = None):
 
         self.seriesname = seriesname
         self.episodenumbers = episodenumbers
         self.episodename = episodename
-        self.fullpath = filename
-
-        if filename is not None:
-            # Remains untouched, for use when renaming file
-            self.originalfilename = os.path.basename(filename)
-        else:
-            self.originalfilename = None
-
-        if extra is None:
-            extra = {}
-        self.extra = extra
+        self._setFile(filename, extra, config)
 
     def sortable_info(self):
         """Returns a tuple of sortable information
@@ -902,7 +1259,7 @@ class NoSeasonEpisodeInfo(EpisodeInfo):
             ", ".join([str(x) for x in self.episodenumbers]))
 
     def getepdata(self):
-        epno = formatEpisodeNumbers(self.episodenumbers)
+        epno = formatEpisodeNumbers(self.episodenumbers, self.config)
 
         # Data made available to config'd output file format
         if self.extension is None:
@@ -920,17 +1277,21 @@ class NoSeasonEpisodeInfo(EpisodeInfo):
 
 
 class AnimeEpisodeInfo(NoSeasonEpisodeInfo):
+    __slots__ = ()
+
     CFG_KEY_WITH_EP = "filename_anime_with_episode"
     CFG_KEY_WITHOUT_EP = "filename_anime_without_episode"
 
     CFG_KEY_WITH_EP_NO_CRC = "filename_anime_with_episode_without_crc"
     CFG_KEY_WITHOUT_EP_NO_CRC = "filename_anime_without_episode_without_crc"
 
+    @staged('naming', 'fullpath')
     def generateFilename(self, lowercase = False, preview_orig_filename = False):
+        config = _config(self.config)
         epdata = self.getepdata()
 
         # Add in extra dict keys, without clobbering existing values in epdata
-        extra = self.extra.copy()
+        extra = _TemplateValues(self.extra, config.derived(_patternGroups))
         extra.update(epdata)
         epdata = extra
 
@@ -952,28 +1313,23 @@ class AnimeEpisodeInfo(NoSeasonEpisodeInfo):
             if isinstance(self.episodename, list):
                 epdata['episodename'] = formatEpisodeName(
                     self.episodename,
-                    join_with = Config['multiep_join_name_with'],
-                    multiep_format = Config['multiep_format'])
+                    join_with = config['multiep_join_name_with'],
+                    multiep_format = config['multiep_format'])
 
-        fname = Config[cfgkey] % epdata
+        fname = config[cfgkey] % epdata
 
 
-        if lowercase or Config['lowercase_filename']:
+        if lowercase or config['lowercase_filename']:
             fname = fname.lower()
 
         if preview_orig_filename:
             # Return filename without custom replacements or filesystem-validness
             return fname
 
-        if len(Config['output_filename_replacements']) > 0:
-            fname = applyCustomOutputReplacements(fname)
+        if len(config['output_filename_replacements']) > 0:
+            fname = applyCustomOutputReplacements(fname, config)
 
-        return makeValidFilename(
-            fname,
-            normalize_unicode = Config['normalize_unicode_filenames'],
-            windows_safe = Config['windows_safe_filenames'],
-            custom_blacklist = Config['custom_filename_character_blacklist'],
-            replace_with = Config['replace_invalid_characters_with'])
+        return config.derived(_filenameSanitiser)(fname)
 
 
 def same_partition(f1, f2):
@@ -1006,6 +1362,8 @@ def rename_file(old, new):
     p("rename %s to %s" % (old, new))
     stat = os.stat(old)
     os.rename(old, new)
+    Stats.count('files_renamed')
+    Stats.count('bytes_renamed', stat.st_size)
     try:
         os.utime(new, (stat.st_atime, stat.st_mtime))
     except OSError as ex:
@@ -1015,10 +1373,37 @@ def rename_file(old, new):
         else:
             raise
 
-def copy_file(old, new):
+def copy_file(old, new, compute_crc = False):
+    """Copies old to new, preserving times and permissions.
+
+    If compute_crc is True the CRC32 of the data is calculated as it is
+    copied (avoiding a second read of the file) and returned
+    """
     p("copy %s to %s" % (old, new))
-    shutil.copyfile(old, new)
+    Stats.count('files_copied')
+    Stats.count('bytes_copied', os.path.getsize(old))
+    if not compute_crc:
+        shutil.copyfile(old, new)
+        shutil.copystat(old, new)
+        return None
+
+    crc = 0
+    fsrc = open(old, "rb")
+    try:
+        fdst = open(new, "wb")
+        try:
+            while True:
+                buf = fsrc.read(COPY_BUFFER_SIZE)
+                if not buf:
+                    break
+                crc = zlib.crc32(buf, crc)
+                fdst.write(buf)
+        finally:
+            fdst.close()
+    finally:
+        fsrc.close()
     shutil.copystat(old, new)
+    return crc & 0xffffffff
 
 
 def symlink_file(target, name):
@@ -1027,26 +1412,20 @@ def symlink_file(target, name):
 
 
 class Renamer(object):
-    """Deals with renaming of files
+    """Deals with renaming of files. config is the ConfigSnapshot the
+    move_files_fullpath_replacements are taken from (the snapshot of the
+    global Config at the time if None)
     """
 
-    def __init__(self, filename):
+    def __init__(self, filename, config = None):
         self.filename = os.path.abspath(filename)
+        self.config = config
 
-    def newPath(self, new_path = None, new_fullpath = None, force = False, always_copy = False, always_move = False, leave_symlink = False, create_dirs = True, getPathPreview = False):
-        """Moves the file to a new path.
-
-        If it is on the same partition, it will be moved (unless always_copy is True)
-        If it is on a different partition, it will be copied, and the original
-        only deleted if always_move is True.
-        If the target file already exists, it will raise OSError unless force is True.
-        If it was moved, a symlink will be left behind with the original name
-        pointing to the file's new destination if leave_symlink is True.
+    def _joinNewPath(self, new_path = None, new_fullpath = None):
+        """Returns the absolute destination path, from either a new
+        directory (new_path) or a new filename/filepath (new_fullpath).
+        Relative values are relative to the file's current directory
         """
-
-        if always_copy and always_move:
-            raise ValueError("Both always_copy and always_move cannot be specified")
-
         if (new_path is None and new_fullpath is None) or (new_path is not None and new_fullpath is not None):
             raise ValueError("Specify only new_dir or new_fullpath")
 
@@ -1056,62 +1435,121 @@ class Renamer(object):
             new_dir = os.path.abspath(os.path.join(old_dir, new_path))
 
             # Join new filename onto new filepath
-            new_fullpath = os.path.join(new_dir, old_filename)
+            return os.path.join(new_dir, old_filename)
 
         else:
             # Join new filepath to old one (to handle realtive dirs)
-            new_fullpath = os.path.abspath(os.path.join(old_dir, new_fullpath))
+            return os.path.abspath(os.path.join(old_dir, new_fullpath))
+
+    def resolvePath(self, new_path = None, new_fullpath = None):
+        """Returns the path newPath would move the file to (including
+        move_files_fullpath_replacements), without touching the filesystem
+        """
+        config = _config(self.config)
+        new_fullpath = self._joinNewPath(new_path = new_path, new_fullpath = new_fullpath)
+        if len(config['move_files_fullpath_replacements']) > 0:
+            new_fullpath = applyCustomFullpathReplacements(new_fullpath, config)
+        return new_fullpath
+
+    def newPath(self, new_path = None, new_fullpath = None, force = False, always_copy = False, always_move = False, leave_symlink = False, create_dirs = True, getPathPreview = False, apply_replacements = True, verify_crc = False, expected_crc = None):
+        """Moves the file to a new path.
+
+        If it is on the same partition, it will be moved (unless always_copy is True)
+        If it is on a different partition, it will be copied, and the original
+        only deleted if always_move is True.
+        If the target file already exists, it will raise OSError unless force is True.
+        If it was moved, a symlink will be left behind with the original name
+        pointing to the file's new destination if leave_symlink is True.
+        If apply_replacements is False, move_files_fullpath_replacements are
+        not applied (used when the path came from resolvePath already)
+
+        If verify_crc is True, the CRC32 of a file copied to a different
+        partition is calculated during the copy and compared against
+        expected_crc (an integer, usually parsed from an anime filename),
+        and the size of the copy is checked against the original. On a
+        mismatch, OSError is raised and the original is never deleted.
+        """
 
-            new_dir = os.path.dirname(new_fullpath)
+        if always_copy and always_move:
+            raise ValueError("Both always_copy and always_move cannot be specified")
 
+        new_fullpath = self._joinNewPath(new_path = new_path, new_fullpath = new_fullpath)
 
-        if len(Config['move_files_fullpath_replacements']) > 0:
+        config = _config(self.config)
+        if apply_replacements and len(config['move_files_fullpath_replacements']) > 0:
             p("Before custom full path replacements: %s" % (new_fullpath))
-            new_fullpath = applyCustomFullpathReplacements(new_fullpath)
-            new_dir = os.path.dirname(new_fullpath)
+            new_fullpath = applyCustomFullpathReplacements(new_fullpath, config)
+
+        new_dir = os.path.dirname(new_fullpath)
 
         p("New path: %s" % new_fullpath)
 
         if getPathPreview:
             return new_fullpath
 
-        if create_dirs:
-            try:
-                os.makedirs(new_dir)
-            except OSError as e:
-                if e.errno != 17:
-                    raise
-            else:
-                p("Created directory %s" % new_dir)
+        with stage('filesystem', self.filename):
+            if create_dirs:
+                try:
+                    os.makedirs(new_dir)
+                except OSError as e:
+                    if e.errno != 17:
+                        raise
+                else:
+                    p("Created directory %s" % new_dir)
 
 
-        if os.path.isfile(new_fullpath):
-            # If the destination exists, raise exception unless force is True
-            if not force:
-                raise OSError("File %s already exists, not forcefully moving %s" % (
-                    new_fullpath, self.filename))
+            if os.path.isfile(new_fullpath):
+                # If the destination exists, raise exception unless force is True
+                if not force:
+                    raise OSError("File %s already exists, not forcefully moving %s" % (
+                        new_fullpath, self.filename))
 
-        if same_partition(self.filename, new_dir):
-            if always_copy:
-                # Same partition, but forced to copy
-                copy_file(self.filename, new_fullpath)
-            else:
-                # Same partition, just rename the file to move it
-                rename_file(self.filename, new_fullpath)
+            if same_partition(self.filename, new_dir):
+                if always_copy:
+                    # Same partition, but forced to copy
+                    copy_file(self.filename, new_fullpath)
+                else:
+                    # Same partition, just rename the file to move it
+                    rename_file(self.filename, new_fullpath)
 
-                # Leave a symlink behind if configured to do so
-                if leave_symlink:
-                    symlink_file(new_fullpath, self.filename)
+                    # Leave a symlink behind if configured to do so
+                    if leave_symlink:
+                        symlink_file(new_fullpath, self.filename)
+            else:
+                # File is on different partition (different disc), copy it
+                crc = copy_file(self.filename, new_fullpath, compute_crc = verify_crc)
+                if verify_crc:
+                    self._verifyCopy(new_fullpath, crc, expected_crc)
+                if always_move:
+                    # Forced to move file, we just trash old file
+                    p("Deleting %s" % (self.filename))
+                    delete_file(self.filename)
+
+                    # Leave a symlink behind if configured to do so
+                    if leave_symlink:
+                        symlink_file(new_fullpath, self.filename)
+
+        if new_dir == os.path.dirname(self.filename):
+            Stats.count('renames')
         else:
-            # File is on different partition (different disc), copy it
-            copy_file(self.filename, new_fullpath)
-            if always_move:
-                # Forced to move file, we just trash old file
-                p("Deleting %s" % (self.filename))
-                delete_file(self.filename)
-
-                # Leave a symlink behind if configured to do so
-                if leave_symlink:
-                    symlink_file(new_fullpath, self.filename)
-
+            Stats.count('moves')
         self.filename = new_fullpath
+
+    def _verifyCopy(self, new_fullpath, crc, expected_crc):
+        """Checks a copy made by newPath, raising OSError if the copy is
+        incomplete, or the data copied does not match expected_crc
+        """
+        if os.path.getsize(new_fullpath) != os.path.getsize(self.filename):
+            # Copy is incomplete, so remove it
+            delete_file(new_fullpath)
+            raise OSError("Copy of %s to %s is incomplete, not deleting original" % (
+                self.filename, new_fullpath))
+
+        if expected_crc is not None and crc != expected_crc:
+            # Otherwise later runs would find the destination taken, and
+            # never replace the bad copy
+            delete_file(new_fullpath)
+            raise OSError("CRC of %s is %08X, expected %08X, not deleting original" % (
+                self.filename, crc, expected_crc))
+
+        p("Verified copy (CRC %08X)" % crc)
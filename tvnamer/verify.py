@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""Checks files against the CRC32 value in their filename, for example
+"[Group] Show - 01 [ABCD1234].mkv"
+"""
+
+import os
+import re
+import mmap
+import zlib
+import logging
+from multiprocessing.pool import ThreadPool
+
+from tvnamer.unicode_helper import p
+from tvnamer.utils import FileParser, warn
+from tvnamer.tvnamer_exceptions import InvalidFilename
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+def parseCrc(value):
+    """Returns the CRC32 in a string such as "ABCD1234" as an integer, or
+    None if the string is not a CRC (the anime patterns capture any
+    [bracketed] value, so this might be "720p" for example)
+
+    >>> parseCrc("3811CBB5") == 0x3811CBB5
+    True
+    >>> parseCrc("720p") is None
+    True
+    """
+    if value is None or re.match("^[0-9a-fA-F]{8}$", value) is None:
+        return None
+    return int(value, 16)
+
+
+def episodeCrc(episode):
+    """Returns the CRC parsed from the episode's filename, or None
+    """
+    return parseCrc(episode.extra.get('crc'))
+
+
+def crc32File(path):
+    """Calculates the CRC32 of a file, reading it via mmap
+    """
+    f = open(path, "rb")
+    try:
+        if os.fstat(f.fileno()).st_size == 0:
+            # Empty files cannot be mapped
+            return 0
+        mapped = mmap.mmap(f.fileno(), 0, access = mmap.ACCESS_READ)
+        try:
+            # crc32 releases the GIL for large buffers, so files are
+            # checked in parallel when called from several threads
+            return zlib.crc32(mapped) & 0xffffffff
+        finally:
+            mapped.close()
+    finally:
+        f.close()
+
+
+def _checkFile(path):
+    """Returns (path, expected crc, actual crc, error) for a file, with
+    expected as None if the filename contains no CRC, and error set (and
+    actual None) if the file could not be read
+    """
+    try:
+        episode = FileParser(path).parse()
+    except InvalidFilename:
+        return (path, None, None, None)
+
+    expected = episodeCrc(episode)
+    if expected is None:
+        return (path, None, None, None)
+
+    try:
+        return (path, expected, crc32File(path), None)
+    except (IOError, OSError) as e:
+        return (path, expected, None, e)
+
+
+def verifyFiles(paths, workers = 4):
+    """Checks the CRC32 of each file against the value in its filename,
+    using workers threads. Returns the number of files which did not
+    match or could not be read
+    """
+    pool = ThreadPool(max(1, workers))
+    try:
+        results = pool.map(_checkFile, paths)
+    finally:
+        pool.close()
+        pool.join()
+
+    failed = 0
+    for path, expected, actual, error in sorted(results, key = lambda x: x[0]):
+        if expected is None:
+            log().debug("No CRC in filename %s" % path)
+        elif error is not None:
+            warn("FAILED to read %s: %s" % (path, error))
+            failed += 1
+        elif expected == actual:
+            p("OK %08X %s" % (actual, path))
+        else:
+            warn("FAILED %08X (expected %08X) %s" % (actual, expected, path))
+            failed += 1
+
+    checked = len([r for r in results if r[1] is not None])
+    p("# Checked %d file%s, %d failed" % (checked, "s" * (checked != 1), failed))
+
+    return failed
@@ -0,0 +1,269 @@
+#!/usr/bin/env python
+
+"""Watches directories for new files, for the --watch mode
+
+Uses Linux's inotify (via ctypes) when available, otherwise falls back to
+periodically listing the directories. New files are only reported once
+they have stopped changing, so files still being written (by a download
+client, for example) are not renamed halfway through.
+"""
+
+import os
+import sys
+import time
+import errno
+import struct
+import select
+import logging
+
+from tvnamer.compat import string_type
+
+
+def log():
+    """Returns the logger for current file
+    """
+    return logging.getLogger(__name__)
+
+
+# Event masks from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _listDirectories(paths, recursive):
+    """Returns the directories to watch for the paths given
+    """
+    dirs = []
+    for path in paths:
+        path = os.path.abspath(path)
+        dirs.append(path)
+        if recursive:
+            for walkroot, walkdirs, walkfiles in os.walk(path):
+                dirs.extend(os.path.join(walkroot, d) for d in walkdirs)
+    return dirs
+
+
+def _listFiles(directory):
+    """Returns the files directly inside directory
+    """
+    try:
+        names = os.listdir(string_type(directory))
+    except OSError:
+        return []
+    found = []
+    for name in names:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            found.append(path)
+    return found
+
+
+class PollingWatcher(object):
+    """Finds new or changed files by listing the directories every
+    interval seconds
+    """
+
+    def __init__(self, paths, recursive = False, interval = 10):
+        self.paths = paths
+        self.recursive = recursive
+        self.interval = interval
+        self.known = {}
+        self._scan()
+
+    def _scan(self):
+        """Returns files which are new or changed since the last scan
+        """
+        changed = []
+        current = {}
+        for directory in _listDirectories(self.paths, self.recursive):
+            for path in _listFiles(directory):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                current[path] = (st.st_size, st.st_mtime)
+                if self.known.get(path) != current[path]:
+                    changed.append(path)
+        self.known = current
+        return changed
+
+    def read(self, timeout):
+        """Waits up to timeout seconds (or the polling interval, whichever
+        is shorter), returns list of new or changed files
+        """
+        time.sleep(min(timeout, self.interval))
+        return self._scan()
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher(object):
+    """Receives IN_CLOSE_WRITE and IN_MOVED_TO events from inotify. In
+    recursive mode, directories created after starting are also watched
+    """
+
+    def __init__(self, paths, recursive = False):
+        import ctypes
+        import ctypes.util
+
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        self.libc = ctypes.CDLL(libc_name, use_errno = True)
+        if not hasattr(self.libc, "inotify_init"):
+            raise OSError("inotify is not available")
+
+        self.recursive = recursive
+        self.fd = self.libc.inotify_init()
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init failed")
+
+        self.watches = {}
+        for directory in _listDirectories(paths, recursive):
+            self._addWatch(directory)
+
+    def _addWatch(self, directory):
+        import ctypes
+
+        mask = IN_CLOSE_WRITE | IN_MOVED_TO
+        if self.recursive:
+            mask |= IN_CREATE
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory) if hasattr(os, "fsencode") else directory, mask)
+        if wd < 0:
+            log().warning("Could not watch %s: %s" % (directory, os.strerror(ctypes.get_errno())))
+            return
+        log().debug("Watching %s" % directory)
+        self.watches[wd] = directory
+
+    def read(self, timeout):
+        """Waits up to timeout seconds for events, returns list of paths
+        which were written or moved into a watched directory
+        """
+        try:
+            ready, _, _ = select.select([self.fd], [], [], timeout)
+        except select.error as e:
+            if e.args[0] == errno.EINTR:
+                return []
+            raise
+        if not ready:
+            return []
+
+        data = os.read(self.fd, 64 * 1024)
+        found = []
+        offset = 0
+        while offset + _EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+
+            if mask & IN_Q_OVERFLOW:
+                log().warning("inotify queue overflowed, some files may have been missed")
+                continue
+            if wd not in self.watches or not name:
+                continue
+
+            if hasattr(os, "fsdecode"):
+                name = os.fsdecode(name)
+            else:
+                name = name.decode(sys.getfilesystemencoding())
+            path = os.path.join(self.watches[wd], name)
+
+            if mask & IN_ISDIR:
+                if self.recursive:
+                    # Watch the new directory, and pick up anything
+                    # created in it before the watch was added
+                    for directory in _listDirectories([path], True):
+                        self._addWatch(directory)
+                        found.extend(_listFiles(directory))
+            elif mask & (IN_CLOSE_WRITE | IN_MOVED_TO):
+                found.append(path)
+
+        return found
+
+    def close(self):
+        os.close(self.fd)
+
+
+def makeWatcher(paths, recursive = False, poll_interval = 10):
+    """Returns an InotifyWatcher, or a PollingWatcher if inotify is not
+    available
+    """
+    try:
+        return InotifyWatcher(paths, recursive = recursive)
+    except (OSError, AttributeError) as e:
+        log().info("Using polling to watch for files (%s)" % e)
+        return PollingWatcher(paths, recursive = recursive, interval = poll_interval)
+
+
+class Debouncer(object):
+    """Holds paths until they have stopped changing.
+
+    A path is ready once its size and modification time have been the
+    same for delay seconds. Files which disappear (deleted or moved away
+    while pending) are dropped
+    """
+
+    def __init__(self, delay, clock = time.time):
+        self.delay = delay
+        self.clock = clock
+        self.pending = {}
+
+    def add(self, path):
+        self.pending[path] = (None, self.clock())
+
+    def ready(self):
+        """Returns sorted list of paths which have stopped changing
+        """
+        now = self.clock()
+        done = []
+        for path, (last_stat, since) in list(self.pending.items()):
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self.pending[path]
+                continue
+
+            cur_stat = (st.st_size, st.st_mtime)
+            if cur_stat != last_stat:
+                self.pending[path] = (cur_stat, now)
+            elif now - since >= self.delay:
+                del self.pending[path]
+                done.append(path)
+        return sorted(done)
+
+
+def watch(paths, handler, recursive = False, delay = 5, poll_interval = 10, watcher = None, existing = False):
+    """Watches paths until interrupted, calling handler with the list of
+    files which have appeared and stopped changing. If existing is True,
+    files already in the directories are handled too, once they have
+    stopped changing
+    """
+    if watcher is None:
+        watcher = makeWatcher(paths, recursive = recursive, poll_interval = poll_interval)
+    debouncer = Debouncer(delay)
+
+    if existing:
+        # Listed after the watcher is started, so files written meanwhile
+        # are not missed (if seen twice, they are only handled once)
+        for directory in _listDirectories(paths, recursive):
+            for path in _listFiles(directory):
+                debouncer.add(path)
+
+    try:
+        while True:
+            for path in watcher.read(timeout = max(delay, 1) if debouncer.pending else 3600):
+                debouncer.add(path)
+
+            ready = debouncer.ready()
+            if ready:
+                handler(ready)
+    finally:
+        watcher.close()